@@ -0,0 +1,168 @@
+# =================================================================
+# TABLES D'AGRÉGATS (ventes pré-agrégées pour le notebook d'analyse)
+# =================================================================
+# Les analyses du notebook (tendance mensuelle, employés, catégories, pays,
+# produits, totaux de vérification) lisent ces petites tables au lieu de
+# refaire un GROUP BY sur FactSales à chaque ouverture.
+#
+# Rafraîchissement incrémental : en mode incrémental, une commande touchée est
+# rechargée EN ENTIER (toutes ses lignes). Chaque mesure est donc additive à la
+# maille commande, y compris le nombre de commandes distinctes d'un groupe :
+#     agrégat = agrégat précédent - contribution des anciennes versions
+#                                 + contribution des nouvelles versions
+# Les comptages non additifs (produits par catégorie, clients par pays, première
+# et dernière date) sont dérivés d'agrégats plus fins, eux-mêmes additifs.
+
+import os
+
+import pandas as pd
+
+import dim_date
+
+AGGREGATES_DIR = 'data/state/aggregates/'
+# Attributs de regroupement utilisés au run précédent (catégorie par produit, pays par client)
+ATTRIBUTES_FILE = 'GroupAttributes'
+
+# Agrégats de base, maintenus de façon incrémentale : nom -> colonnes de regroupement
+BASE_AGGREGATES = {
+    'AggSalesByDay': ['OrderDateKey'],
+    'AggSalesByEmployee': ['EmployeeKey'],
+    'AggSalesByProduct': ['ProductKey', 'CategoryName'],
+    'AggSalesByCategory': ['CategoryName'],
+    'AggSalesByCustomer': ['CustomerKey', 'CustomerCountry'],
+    'AggSalesByCountry': ['CustomerCountry'],
+}
+# Comptages dérivés : agrégat -> (agrégat plus fin, colonne du comptage)
+MEMBER_COUNTS = {
+    'AggSalesByCategory': ('AggSalesByProduct', 'ProductCount'),
+    'AggSalesByCountry': ('AggSalesByCustomer', 'CustomerCount'),
+}
+MEASURES = ['SalesAmount', 'Quantity', 'SumUnitPrice', 'LineCount', 'OrderCount']
+
+# Tables chargées dans le Data Warehouse (AggSalesByDay sert uniquement à dériver le mois)
+DW_AGGREGATES = [
+    'AggSalesByMonth', 'AggSalesByEmployee', 'AggSalesByProduct',
+    'AggSalesByCategory', 'AggSalesByCustomer', 'AggSalesByCountry',
+]
+
+
+def group_attributes(dim_products, dim_customers):
+    """Attributs de regroupement portés par les dimensions : {nom: Series clé -> valeur}."""
+    return {
+        'CategoryName': dim_products.set_index('ProductKey')['CategoryName'].astype(object),
+        'CustomerCountry': dim_customers.set_index('CustomerKey')['CustomerCountry'].astype(object),
+    }
+
+
+def attributes_changed(previous, current):
+    """Vrai si un membre déjà connu a changé de catégorie ou de pays : l'ancienne
+    contribution de ses lignes ne peut plus être retirée du bon groupe."""
+    for name, mapping in current.items():
+        before = previous.get(name)
+        if before is None:
+            return True
+        common = before.index.intersection(mapping.index)
+        old, new = before.loc[common], mapping.loc[common]
+        if not (old.eq(new) | (old.isna() & new.isna())).all():
+            return True
+    return False
+
+
+def enrich(fact, attributes):
+    """Ajoute aux lignes de faits les attributs de regroupement (catégorie, pays)."""
+    fact = fact.reset_index(drop=True)
+    return pd.DataFrame({
+        'OrderID': fact['OrderID'],
+        'OrderDateKey': fact['OrderDateKey'],
+        'EmployeeKey': fact['EmployeeKey'],
+        'ProductKey': fact['ProductKey'],
+        'CustomerKey': fact['CustomerKey'],
+        'CategoryName': fact['ProductKey'].map(attributes['CategoryName']),
+        'CustomerCountry': fact['CustomerKey'].map(attributes['CustomerCountry']),
+        'SalesAmount': fact['SalesAmount'].astype('float64').fillna(0.0),
+        'Quantity': fact['OrderQuantity'].astype('float64').fillna(0.0),
+        'SumUnitPrice': fact['SaleUnitPrice'].astype('float64').fillna(0.0),
+    })
+
+
+def contributions(enriched, by):
+    """Mesures additives d'un ensemble de lignes de faits, par groupe `by`."""
+    grouped = enriched.groupby(by, dropna=False, sort=False)
+    result = grouped[['SalesAmount', 'Quantity', 'SumUnitPrice']].sum()
+    result['LineCount'] = grouped.size()
+    result['OrderCount'] = grouped['OrderID'].nunique()
+    return result
+
+
+def refresh(previous, added, removed, by):
+    """Agrégat mis à jour : précédent - retiré + ajouté (groupes vides supprimés)."""
+    result = contributions(added, by)
+    if previous is not None:
+        result = previous.set_index(by)[MEASURES].add(result, fill_value=0)
+    if removed is not None and len(removed):
+        result = result.sub(contributions(removed, by), fill_value=0)
+    result = result[result['LineCount'] > 0]
+    result[['LineCount', 'OrderCount']] = result[['LineCount', 'OrderCount']].round().astype('int64')
+    result[['SalesAmount', 'SumUnitPrice']] = result[['SalesAmount', 'SumUnitPrice']].round(4)
+    return result.reset_index()
+
+
+def by_month(by_day):
+    """Ventes par année/mois, dérivées de l'agrégat journalier (une date par commande)."""
+    by_day = by_day[by_day['OrderDateKey'].notna()]
+    keys = by_day['OrderDateKey'].astype('int64')
+    monthly = by_day.assign(Year=keys // 10_000, Month=keys // 100 % 100)
+    grouped = monthly.groupby(['Year', 'Month'], sort=True)
+    result = grouped[MEASURES].sum()
+    result['FirstOrderDateKey'] = grouped['OrderDateKey'].min()
+    result['LastOrderDateKey'] = grouped['OrderDateKey'].max()
+    result = result.reset_index()
+    result.insert(2, 'MonthName', dim_date.MONTH_NAMES[result['Month'].to_numpy() - 1])
+    return result
+
+
+def load_previous(attributes, directory=AGGREGATES_DIR):
+    """Agrégats de base du run précédent.
+
+    Retourne {} (reconstruction complète) si l'état est absent, incomplet, ou si
+    les attributs de regroupement des dimensions ont changé depuis.
+    """
+    previous = {}
+    for name in list(BASE_AGGREGATES) + [ATTRIBUTES_FILE]:
+        path = os.path.join(directory, f'{name}.pkl')
+        if not os.path.exists(path):
+            return {}
+        previous[name] = pd.read_pickle(path)
+    if attributes_changed(previous.pop(ATTRIBUTES_FILE), attributes):
+        print("  - Catégorie ou pays d'un membre modifié : agrégats recalculés entièrement.")
+        return {}
+    return previous
+
+
+def save(base, attributes, directory=AGGREGATES_DIR):
+    os.makedirs(directory, exist_ok=True)
+    for name, df in base.items():
+        df.to_pickle(os.path.join(directory, f'{name}.pkl'))
+    pd.to_pickle(attributes, os.path.join(directory, f'{ATTRIBUTES_FILE}.pkl'))
+
+
+def build(added, removed=None, previous=None):
+    """Construit (ou met à jour) les agrégats à partir des lignes enrichies.
+
+    - added   : lignes de faits nouvelles (ou toutes les lignes si reconstruction)
+    - removed : anciennes versions des commandes rechargées (mode incrémental)
+    - previous: agrégats de base du run précédent (None = reconstruction complète)
+    Retourne (agrégats de base, tables à charger dans le DW).
+    """
+    previous = previous or {}
+    base = {
+        name: refresh(previous.get(name), added, removed, by)
+        for name, by in BASE_AGGREGATES.items()
+    }
+    tables = {name: base[name] for name in BASE_AGGREGATES if name in DW_AGGREGATES}
+    for name, (members_table, count_column) in MEMBER_COUNTS.items():
+        by = BASE_AGGREGATES[name]
+        counts = base[members_table].groupby(by, dropna=False).size().rename(count_column)
+        tables[name] = base[name].merge(counts.reset_index(), on=by, how='left')
+    tables['AggSalesByMonth'] = by_month(base['AggSalesByDay'])
+    return base, {name: tables[name] for name in DW_AGGREGATES}
@@ -0,0 +1,509 @@
+# =================================================================
+# MOTEUR D'ANALYSE EN MÉMOIRE SUR LA COUCHE CLEAN (mode hors ligne)
+# =================================================================
+# Exécute les requêtes en étoile du notebook directement sur les exports
+# `data/clean/` (Parquet), sans SQL Server :
+#   - élagage des colonnes : seules les colonnes utiles à la requête sont lues ;
+#   - filtre poussé sur OrderDateKey : une période ne lit que les row groups
+#     (un par mois) concernés de FactSales, et de DimDate sur DateKey ;
+#   - jointures par hachage : la dimension (petite, clé unique) sert de table
+#     de hachage, les lignes de faits y sont cherchées en un seul appel vectorisé ;
+#   - group-by vectorisé, avec la sémantique SQL (groupe NULL conservé,
+#     SUM de valeurs toutes NULL = NULL, COUNT DISTINCT sans les NULL).
+# Chaque requête est décrite par une spécification déclarative (QUERIES) et
+# renvoie les mêmes colonnes que la requête SQL équivalente (SQL_QUERIES) sur
+# le DW, où seules les versions courantes des dimensions (IsCurrent = 1) sont
+# jointes — la couche CLEAN ne contient que celles-ci.
+#
+# Comptages distincts (commandes, clients) sur n'importe quel regroupement de
+# (MonthKey, EmployeeKey, CategoryName, CustomerCountry) et n'importe quelle
+# période : par mois et un axe (pays, employé ou catégorie), fusion des
+# esquisses de SketchSales, SketchSalesByEmployee ou SketchSalesByCategory
+# (voir sketches.py) ; en croisant deux axes, ou avec --exact, COUNT(DISTINCT)
+# exact sur FactSales.
+#   python scripts/analytics.py --distinct CustomerCountry --date-from 19970101
+#
+# Benchmark (latence moteur en mémoire vs requêtes sur le DW) :
+#   python scripts/analytics.py --benchmark --dw-sqlite dw.db
+
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+import aggregates
+import schema
+import sketches
+import storage
+
+CLEAN_DIR = 'data/clean/'
+FACT_TABLE = 'FactSales'
+DATE_COLUMN = 'OrderDateKey'
+# Colonne de la dimension filtrée avec la même période que FactSales
+DATE_DIMENSION_KEYS = {'DimDate': 'DateKey'}
+# Regroupements des comptages distincts (esquisses pour ceux d'une maille de sketches.SKETCH_TABLES)
+DISTINCT_COLUMNS = ['MonthKey', 'EmployeeKey', 'CategoryName', 'CustomerCountry']
+DW_CONN_STRING = 'mssql+pyodbc://DESKTOP-F8N2M8C\\SQLEXPRESS/NorthwindDW?driver=ODBC Driver 17 for SQL Server'
+
+# Spécification de chaque requête :
+#   - 'joins'    : (dimension, clé de FactSales, clé de la dimension, colonnes ramenées)
+#   - 'compute'  : colonnes calculées avant regroupement {nom: (colonnes lues, fonction)}
+#   - 'group_by' : colonnes de regroupement ([] = agrégat global, une ligne)
+#   - 'aggregates': {colonne résultat: (colonne source, fonction)}
+#   - 'derived'  : colonnes calculées après regroupement {nom: fonction}
+#   - 'select'   : colonnes et ordre du résultat (défaut : group_by + aggregates)
+#   - 'order_by' : [(colonne, croissant ?)]
+QUERIES = {
+    'sales_trend': {
+        'joins': [('DimDate', 'OrderDateKey', 'DateKey', ['Year', 'Month', 'MonthName'])],
+        'group_by': ['Year', 'Month', 'MonthName'],
+        'aggregates': {'MonthlySales': ('SalesAmount', 'sum'), 'TotalOrders': ('OrderID', 'nunique')},
+        'order_by': [('Year', True), ('Month', True)],
+    },
+    'top_employees': {
+        'joins': [('DimEmployees', 'EmployeeKey', 'EmployeeKey',
+                   ['FirstName', 'LastName', 'Title', 'City', 'Country'])],
+        'group_by': ['FirstName', 'LastName', 'Title', 'City', 'Country'],
+        'aggregates': {
+            'TotalSales': ('SalesAmount', 'sum'), 'TotalOrders': ('OrderID', 'nunique'),
+            'AvgOrderValue': ('SalesAmount', 'mean'),
+        },
+        'derived': {'EmployeeName': lambda df: df['FirstName'].astype('string') + ' ' + df['LastName'].astype('string')},
+        'select': ['EmployeeName', 'Title', 'City', 'Country', 'TotalSales', 'TotalOrders', 'AvgOrderValue'],
+        'order_by': [('TotalSales', False)],
+    },
+    'category_volume': {
+        'joins': [('DimProducts', 'ProductKey', 'ProductKey', ['CategoryName'])],
+        'group_by': ['CategoryName'],
+        'aggregates': {
+            'TotalQuantity': ('OrderQuantity', 'sum'), 'TotalSales': ('SalesAmount', 'sum'),
+            'TotalOrders': ('OrderID', 'nunique'), 'TotalProducts': ('ProductKey', 'nunique'),
+        },
+        'order_by': [('TotalQuantity', False)],
+    },
+    'verification': {
+        'group_by': [],
+        'aggregates': {
+            'TotalOrders': ('OrderID', 'nunique'), 'TotalOrderDetails': ('SalesAmount', 'count'),
+            'TotalRevenue': ('SalesAmount', 'sum'), 'AvgOrderValue': ('SalesAmount', 'mean'),
+            'FirstOrderDateKey': ('OrderDateKey', 'min'), 'LastOrderDateKey': ('OrderDateKey', 'max'),
+        },
+    },
+    'sales_by_country': {
+        'joins': [('DimCustomers', 'CustomerKey', 'CustomerKey', ['CustomerCountry'])],
+        'group_by': ['CustomerCountry'],
+        'aggregates': {
+            'TotalSales': ('SalesAmount', 'sum'), 'TotalOrders': ('OrderID', 'nunique'),
+            'TotalCustomers': ('CustomerKey', 'nunique'), 'AvgOrderValue': ('SalesAmount', 'mean'),
+        },
+        'derived': {'Country': lambda df: df['CustomerCountry']},
+        'select': ['Country', 'TotalSales', 'TotalOrders', 'TotalCustomers', 'AvgOrderValue'],
+        'order_by': [('TotalSales', False)],
+    },
+    'shipping_status': {
+        'compute': {
+            # Catégoriel construit à partir des codes : pas de chaîne matérialisée par ligne
+            'ShippingStatus': (['ShippedDateKey'], lambda df: pd.Categorical.from_codes(
+                df['ShippedDateKey'].isna().to_numpy().astype('int8'), ['Livré', 'Non Livré'])),
+        },
+        'group_by': ['ShippingStatus'],
+        'aggregates': {
+            'OrderCount': (None, 'size'), 'TotalSales': ('SalesAmount', 'sum'),
+            'UniqueOrders': ('OrderID', 'nunique'),
+        },
+    },
+    'top_products': {
+        'joins': [('DimProducts', 'ProductKey', 'ProductKey', ['ProductName', 'CategoryName'])],
+        'group_by': ['ProductName', 'CategoryName'],
+        'aggregates': {
+            'TotalQuantity': ('OrderQuantity', 'sum'), 'TotalSales': ('SalesAmount', 'sum'),
+            'TotalOrders': ('OrderID', 'nunique'), 'AvgPrice': ('SaleUnitPrice', 'mean'),
+        },
+        'order_by': [('TotalSales', False)],
+    },
+}
+
+# Requêtes équivalentes sur le DW (FS = FactSales). {concat} : opérateur de
+# concaténation du dialecte ; {where} : filtre de période éventuel.
+SQL_QUERIES = {
+    'sales_trend': """
+        SELECT DD.Year, DD.Month, DD.MonthName,
+               SUM(FS.SalesAmount) AS MonthlySales, COUNT(DISTINCT FS.OrderID) AS TotalOrders
+        FROM FactSales FS
+        JOIN DimDate DD ON FS.OrderDateKey = DD.DateKey AND DD.IsCurrent = 1
+        {where}
+        GROUP BY DD.Year, DD.Month, DD.MonthName
+        ORDER BY DD.Year, DD.Month""",
+    'top_employees': """
+        SELECT DE.FirstName {concat} ' ' {concat} DE.LastName AS EmployeeName,
+               DE.Title, DE.City, DE.Country,
+               SUM(FS.SalesAmount) AS TotalSales, COUNT(DISTINCT FS.OrderID) AS TotalOrders,
+               AVG(FS.SalesAmount) AS AvgOrderValue
+        FROM FactSales FS
+        JOIN DimEmployees DE ON FS.EmployeeKey = DE.EmployeeKey AND DE.IsCurrent = 1
+        {where}
+        GROUP BY DE.FirstName, DE.LastName, DE.Title, DE.City, DE.Country
+        ORDER BY TotalSales DESC""",
+    'category_volume': """
+        SELECT DP.CategoryName,
+               SUM(FS.OrderQuantity) AS TotalQuantity, SUM(FS.SalesAmount) AS TotalSales,
+               COUNT(DISTINCT FS.OrderID) AS TotalOrders, COUNT(DISTINCT FS.ProductKey) AS TotalProducts
+        FROM FactSales FS
+        JOIN DimProducts DP ON FS.ProductKey = DP.ProductKey AND DP.IsCurrent = 1
+        {where}
+        GROUP BY DP.CategoryName
+        ORDER BY TotalQuantity DESC""",
+    'verification': """
+        SELECT COUNT(DISTINCT FS.OrderID) AS TotalOrders, COUNT(FS.SalesAmount) AS TotalOrderDetails,
+               SUM(FS.SalesAmount) AS TotalRevenue, AVG(FS.SalesAmount) AS AvgOrderValue,
+               MIN(FS.OrderDateKey) AS FirstOrderDateKey, MAX(FS.OrderDateKey) AS LastOrderDateKey
+        FROM FactSales FS
+        {where}""",
+    'sales_by_country': """
+        SELECT DC.CustomerCountry AS Country,
+               SUM(FS.SalesAmount) AS TotalSales, COUNT(DISTINCT FS.OrderID) AS TotalOrders,
+               COUNT(DISTINCT DC.CustomerKey) AS TotalCustomers, AVG(FS.SalesAmount) AS AvgOrderValue
+        FROM FactSales FS
+        JOIN DimCustomers DC ON FS.CustomerKey = DC.CustomerKey AND DC.IsCurrent = 1
+        {where}
+        GROUP BY DC.CustomerCountry
+        ORDER BY TotalSales DESC""",
+    'shipping_status': """
+        SELECT CASE WHEN FS.ShippedDateKey IS NULL THEN 'Non Livré' ELSE 'Livré' END AS ShippingStatus,
+               COUNT(*) AS OrderCount, SUM(FS.SalesAmount) AS TotalSales,
+               COUNT(DISTINCT FS.OrderID) AS UniqueOrders
+        FROM FactSales FS
+        {where}
+        GROUP BY CASE WHEN FS.ShippedDateKey IS NULL THEN 'Non Livré' ELSE 'Livré' END""",
+    'top_products': """
+        SELECT DP.ProductName, DP.CategoryName,
+               SUM(FS.OrderQuantity) AS TotalQuantity, SUM(FS.SalesAmount) AS TotalSales,
+               COUNT(DISTINCT FS.OrderID) AS TotalOrders, AVG(FS.SaleUnitPrice) AS AvgPrice
+        FROM FactSales FS
+        JOIN DimProducts DP ON FS.ProductKey = DP.ProductKey AND DP.IsCurrent = 1
+        {where}
+        GROUP BY DP.ProductName, DP.CategoryName
+        ORDER BY TotalSales DESC""",
+}
+
+
+def date_filters(column, date_from=None, date_to=None):
+    """Filtres pyarrow (bornes incluses) sur une clé de date AAAAMMJJ."""
+    filters = []
+    if date_from is not None:
+        filters.append((column, '>=', int(date_from)))
+    if date_to is not None:
+        filters.append((column, '<=', int(date_to)))
+    return filters or None
+
+
+def _shift_month(month_key, months):
+    period = pd.Period(year=month_key // 100, month=month_key % 100, freq='M') + months
+    return period.year * 100 + period.month
+
+
+def split_months(date_from=None, date_to=None):
+    """Découpe une période (AAAAMMJJ, bornes incluses) en mois entièrement
+    couverts (premier, dernier : AAAAMM, None = non borné) et tranches
+    partielles [(du, au)] en début et fin de période."""
+    first = last = None
+    partial = []
+    if date_from is not None:
+        first = int(date_from) // 100
+        month_start = first * 100 + 1
+        month_end = int((pd.Timestamp(str(month_start)) + pd.offsets.MonthEnd(0)).strftime('%Y%m%d'))
+        if date_from > month_start:
+            partial.append((int(date_from), month_end if date_to is None else min(month_end, int(date_to))))
+            first = _shift_month(first, 1)
+    if date_to is not None:
+        last = int(date_to) // 100
+        month_start = last * 100 + 1
+        if not pd.Timestamp(str(int(date_to))).is_month_end:
+            # Même mois que date_from et déjà partiel : tranche déjà retenue
+            if not (partial and int(date_from) // 100 == last):
+                partial.append((month_start if date_from is None else max(month_start, int(date_from)), int(date_to)))
+            last = _shift_month(last, -1)
+    return first, last, partial
+
+
+def fact_columns(spec):
+    """Colonnes de FactSales réellement utilisées par la requête (élagage)."""
+    columns = [left_key for _, left_key, _, _ in spec.get('joins', [])]
+    for inputs, _ in spec.get('compute', {}).values():
+        columns += inputs
+    columns += [source for source, _ in spec['aggregates'].values() if source]
+    return list(dict.fromkeys(columns))
+
+
+def hash_join(fact, dim, left_on, right_on, columns):
+    """Jointure interne FactSales ⋈ dimension.
+
+    La clé de la dimension (unique) est indexée une fois ; `get_indexer`
+    cherche toutes les clés de faits dans cette table de hachage en un appel.
+    Les lignes sans correspondance (ou à clé NULL) sont écartées, comme en SQL.
+    """
+    index = pd.Index(dim[right_on])
+    if not index.is_unique:
+        return fact.merge(dim[[right_on] + columns], left_on=left_on, right_on=right_on, how='inner')
+    positions = index.get_indexer(fact[left_on])
+    matched = positions >= 0
+    if not matched.all():
+        fact, positions = fact[matched], positions[matched]
+    fact = fact.reset_index(drop=True)
+    for col in columns:
+        fact[col] = dim[col].take(positions).reset_index(drop=True)
+    return fact
+
+
+def _aggregate(source, column, func):
+    """Agrégat à la sémantique SQL sur une série ou un groupby."""
+    if func == 'size':
+        return source.size() if hasattr(source, 'ngroups') else len(source)
+    values = source[column]
+    if func == 'sum':
+        return values.sum(min_count=1)  # SUM de valeurs toutes NULL = NULL
+    if func == 'mean' and schema.is_money(getattr(values, 'obj', values)):
+        # AVG d'un montant : somme exacte / nombre, en float (non tronqué à 4 décimales)
+        total, count = values.sum(min_count=1), values.count()
+        if hasattr(source, 'ngroups'):
+            return (total.astype('float64') / count).astype('float64')
+        return float(total) / count if count else float('nan')
+    return getattr(values, func)()
+
+
+class AnalyticsEngine:
+    """Requêtes du notebook exécutées en mémoire sur la couche CLEAN."""
+
+    def __init__(self, directory=CLEAN_DIR):
+        self.directory = directory
+        self._dimensions = {}
+
+    def available(self):
+        return storage.table_exists(self.directory, FACT_TABLE)
+
+    def scan(self, table, columns, date_from=None, date_to=None):
+        """Lecture élaguée (colonnes) et filtrée (période) d'une table CLEAN."""
+        date_column = DATE_COLUMN if table == FACT_TABLE else DATE_DIMENSION_KEYS.get(table)
+        filters = date_filters(date_column, date_from, date_to) if date_column else None
+        return storage.read_table(self.directory, table, columns=list(columns), filters=filters)
+
+    def dimension(self, table, columns, date_from=None, date_to=None):
+        """Dimension mise en cache (petites tables relues une seule fois par période)."""
+        key = (table, tuple(columns), date_from, date_to)
+        if key not in self._dimensions:
+            self._dimensions[key] = self.scan(table, columns, date_from, date_to)
+        return self._dimensions[key]
+
+    def grain_rows(self, date_from=None, date_to=None):
+        """Lignes de FactSales portant la maille des esquisses (catégorie et pays du membre)."""
+        fact = self.scan(FACT_TABLE, ['OrderID', 'OrderDateKey', 'EmployeeKey', 'ProductKey', 'CustomerKey'],
+                         date_from, date_to)
+        attributes = aggregates.group_attributes(
+            self.dimension('DimProducts', ['ProductKey', 'CategoryName']),
+            self.dimension('DimCustomers', ['CustomerKey', 'CustomerCountry']),
+        )
+        return fact.assign(
+            CategoryName=fact['ProductKey'].map(attributes['CategoryName']),
+            CustomerCountry=fact['CustomerKey'].map(attributes['CustomerCountry']),
+        )
+
+    def distinct_counts(self, by, date_from=None, date_to=None, exact=False):
+        """Commandes et clients distincts par `by` (sous-ensemble de DISTINCT_COLUMNS).
+
+        Par défaut, fusion des esquisses (exacte pour les petites mailles,
+        sinon erreur type sketches.error_bound()) : les mois entièrement
+        couverts sont lus dans la table d'esquisses dont la maille contient
+        `by`, les mois partiels de la période sont esquissés à la volée depuis
+        FactSales. exact=True, ou un regroupement croisant deux axes :
+        COUNT(DISTINCT) sur FactSales.
+        """
+        by = list(by)
+        unknown = [column for column in by if column not in DISTINCT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Regroupement non disponible : {', '.join(unknown)} ({', '.join(DISTINCT_COLUMNS)})")
+        table = sketches.table_for(by)
+        if exact or table is None:
+            rows = self.grain_rows(date_from, date_to).assign(MonthKey=lambda df: df['OrderDateKey'] // 100)
+            source = rows.groupby(by, dropna=False, observed=True, sort=False) if by else rows
+            counts = {name: source[column].nunique() for name, column in sketches.SKETCHES.items()}
+            result = pd.DataFrame(counts).reset_index() if by else pd.DataFrame([counts])
+        else:
+            first, last, partial = split_months(date_from, date_to)
+            grain = sketches.SKETCH_TABLES[table]
+            parts = [sketches.build_table(self.grain_rows(start, end), grain) for start, end in partial]
+            if first is None or last is None or first <= last:
+                if storage.table_exists(self.directory, table):
+                    filters = [f for f in [('MonthKey', '>=', first), ('MonthKey', '<=', last)] if f[2] is not None]
+                    parts.append(storage.read_table(self.directory, table, filters=filters or None))
+                else:
+                    # Couche CLEAN antérieure à cette table d'esquisses : construite depuis FactSales
+                    parts.append(sketches.build_table(self.grain_rows(
+                        None if first is None else first * 100 + 1, None if last is None else last * 100 + 31), grain))
+            result = sketches.distinct_counts(pd.concat(parts, ignore_index=True), by)
+        if by:
+            result = result.sort_values(by, kind='stable', na_position='last')
+        return result[by + list(sketches.SKETCHES)].reset_index(drop=True)
+
+    def run(self, name, date_from=None, date_to=None):
+        """Exécute la requête `name` de QUERIES ; bornes de période sur OrderDateKey."""
+        spec = QUERIES[name]
+        df = self.scan(FACT_TABLE, fact_columns(spec), date_from, date_to)
+        for table, left_on, right_on, columns in spec.get('joins', []):
+            dim = self.dimension(table, [right_on] + columns, date_from, date_to)
+            df = hash_join(df, dim, left_on, right_on, columns)
+        for column, (_, func) in spec.get('compute', {}).items():
+            df[column] = func(df)
+
+        agg_spec = spec['aggregates']
+        if spec['group_by']:
+            grouped = df.groupby(spec['group_by'], dropna=False, observed=True, sort=False)
+            result = pd.DataFrame({
+                name: _aggregate(grouped, source, func) for name, (source, func) in agg_spec.items()
+            }).reset_index()
+        else:
+            result = pd.DataFrame([{
+                name: _aggregate(df, source, func) for name, (source, func) in agg_spec.items()
+            }])
+            # Somme d'un montant (decimal.Decimal) : colonne 'money' comme en groupant
+            for name, (source, func) in agg_spec.items():
+                if func == 'sum' and schema.is_money(df[source]):
+                    result[name] = schema.to_money(result[name])
+
+        for column, func in spec.get('derived', {}).items():
+            result[column] = func(result)
+        if spec.get('order_by'):
+            by = [c for c, _ in spec['order_by']]
+            ascending = [asc for _, asc in spec['order_by']]
+            result = result.sort_values(by, ascending=ascending, kind='stable', na_position='last')
+        select = spec.get('select', spec['group_by'] + list(agg_spec))
+        return result[select].reset_index(drop=True)
+
+
+def sql_query(name, dialect, date_from=None, date_to=None):
+    """Texte SQL de la requête `name` pour le dialecte SQLAlchemy `dialect`."""
+    conditions = []
+    if date_from is not None:
+        conditions.append(f'FS.OrderDateKey >= {int(date_from)}')
+    if date_to is not None:
+        conditions.append(f'FS.OrderDateKey <= {int(date_to)}')
+    where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+    concat = '+' if dialect == 'mssql' else '||'
+    return SQL_QUERIES[name].format(concat=concat, where=where)
+
+
+def run_sql(engine, name, date_from=None, date_to=None):
+    return pd.read_sql(text(sql_query(name, engine.dialect.name, date_from, date_to)), engine)
+
+
+def same_result(left, right, decimals=6):
+    """Compare deux résultats aux arrondis près (ordre des ex aequo ignoré)."""
+    if list(left.columns) != list(right.columns) or len(left) != len(right):
+        return False
+
+    def normalized(df):
+        out = pd.DataFrame({
+            col: (df[col].astype('float64').round(decimals) if pd.api.types.is_numeric_dtype(df[col].dtype)
+                  else df[col].astype(object).where(df[col].notna(), None))
+            for col in df.columns
+        })
+        return out.sort_values(list(out.columns), na_position='last', key=lambda s: s.astype(str)).reset_index(drop=True)
+
+    a, b = normalized(left), normalized(right)
+    return all(
+        np.allclose(a[c].to_numpy(float), b[c].to_numpy(float), equal_nan=True)
+        if a[c].dtype == 'float64' else (a[c].fillna('∅') == b[c].fillna('∅')).all()
+        for c in a.columns
+    )
+
+
+def _median_seconds(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def benchmark(engine, dw_engine, repeat=5, date_from=None, date_to=None):
+    """Latence médiane par requête : moteur en mémoire (sans cache de dimensions,
+    comme un premier appel) vs requête SQL sur le DW ; vérifie l'égalité des résultats."""
+    rows = []
+    for name in QUERIES:
+        def in_process():
+            return AnalyticsEngine(engine.directory).run(name, date_from, date_to)
+        engine_seconds, engine_result = _median_seconds(in_process, repeat)
+        db_seconds, db_result = _median_seconds(lambda: run_sql(dw_engine, name, date_from, date_to), repeat)
+        rows.append({
+            'query': name,
+            'engine_ms': round(engine_seconds * 1000, 2),
+            'database_ms': round(db_seconds * 1000, 2),
+            'speedup': round(db_seconds / engine_seconds, 2) if engine_seconds else None,
+            'rows': len(engine_result),
+            'same_result': same_result(engine_result, db_result),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Requêtes d'analyse en mémoire sur la couche CLEAN")
+    parser.add_argument('query', nargs='?', choices=sorted(QUERIES), help="Requête à exécuter")
+    parser.add_argument('--clean-dir', default=CLEAN_DIR, help="Dossier de la couche CLEAN (défaut : %(default)s)")
+    parser.add_argument('--date-from', type=int, help="Première OrderDateKey incluse (AAAAMMJJ)")
+    parser.add_argument('--date-to', type=int, help="Dernière OrderDateKey incluse (AAAAMMJJ)")
+    parser.add_argument('--distinct', nargs='*', metavar='COLONNE',
+                        help="Commandes et clients distincts par ces colonnes (aucune = total) ; "
+                             "par mois et un axe (pays, employé, catégorie) : fusion des esquisses "
+                             "HyperLogLog, sinon comptage exact")
+    parser.add_argument('--exact', action='store_true', help="Avec --distinct : COUNT(DISTINCT) exact sur FactSales")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Compare la latence du moteur en mémoire à celle du DW")
+    parser.add_argument('--dw-sqlite', help="Data Warehouse SQLite pour le benchmark (défaut : SQL Server)")
+    parser.add_argument('--dw-conn', help="Chaîne de connexion SQLAlchemy du DW pour le benchmark")
+    parser.add_argument('--repeat', type=int, default=5, help="Exécutions par requête (défaut : %(default)s)")
+    args = parser.parse_args()
+
+    engine = AnalyticsEngine(args.clean_dir)
+    if not engine.available():
+        parser.error(f"couche CLEAN introuvable dans {args.clean_dir} : exécutez d'abord etl.py")
+
+    if args.distinct is not None:
+        start = time.perf_counter()
+        try:
+            result = engine.distinct_counts(args.distinct, args.date_from, args.date_to, args.exact)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.exact or sketches.table_for(args.distinct) is None:
+            method = 'exact'
+        else:
+            method = f'esquisses, erreur type ±{sketches.error_bound():.1%} au-delà de {sketches.EXACT_MAX} valeurs'
+        print(f"\n--- Comptages distincts ({method}, {len(result)} lignes, "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms) ---")
+        with pd.option_context('display.width', 160, 'display.max_columns', 20):
+            print(result.head(20).to_string(index=False))
+    elif args.benchmark:
+        if args.dw_sqlite:
+            dw_engine = create_engine(f'sqlite:///{args.dw_sqlite}')
+        else:
+            dw_engine = create_engine(args.dw_conn or DW_CONN_STRING)
+        results = benchmark(engine, dw_engine, args.repeat, args.date_from, args.date_to)
+        print("\n--- Latence médiane par requête (ms) : moteur en mémoire vs Data Warehouse ---")
+        print(results.to_string(index=False))
+        os.makedirs('data/benchmark', exist_ok=True)
+        output = os.path.join('data/benchmark', 'analytics_benchmark.csv')
+        results.to_csv(output, index=False, sep=';', encoding='utf-8')
+        print(f"\n📄 Résultats enregistrés dans {output}")
+        if not results['same_result'].all():
+            print("⚠️  Résultats différents du DW pour : " + ', '.join(results.loc[~results['same_result'], 'query']))
+    else:
+        names = [args.query] if args.query else list(QUERIES)
+        with pd.option_context('display.width', 160, 'display.max_columns', 20):
+            for name in names:
+                start = time.perf_counter()
+                result = engine.run(name, args.date_from, args.date_to)
+                print(f"\n--- {name} ({len(result)} lignes, {(time.perf_counter() - start) * 1000:.1f} ms) ---")
+                print(result.head(10).to_string(index=False))
@@ -0,0 +1,135 @@
+# =================================================================
+# BENCHMARK DE MONTÉE EN CHARGE DE L'ETL
+# =================================================================
+# Pour chaque facteur d'échelle : génération des sources synthétiques
+# (scripts/synthetic_northwind.py), exécution complète de etl.py sur des
+# bases SQLite (sources + Data Warehouse) dans un dossier isolé, puis lecture
+# du rapport de mesures du run (scripts/metrics.py). On obtient, étape par
+# étape, l'évolution du débit (lignes/s) et du pic mémoire avec le volume.
+#
+# Exemple :
+#   python scripts/benchmark.py --scales 1 100 1000
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+import metrics
+import synthetic_northwind
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ETL_SCRIPT = os.path.join(SCRIPTS_DIR, 'etl.py')
+
+# Étapes suivies par le benchmark (transformation et chargement)
+BENCHMARK_STAGES = [
+    'consolidate', 'dim_date', 'dim_customers', 'dim_products', 'dim_employees',
+    'dim_shippers', 'dim_suppliers', 'fact_sales', 'load_dimensions', 'load_fact_sales',
+]
+
+
+def run_etl(run_dir, sql_path, access_path, extra_args=()):
+    """Lance etl.py dans `run_dir` ; retourne (code retour, secondes, pic RSS Mo ou None)."""
+    command = [
+        sys.executable, ETL_SCRIPT, '--full-refresh',
+        '--sqlite-sql', os.path.abspath(sql_path),
+        '--sqlite-access', os.path.abspath(access_path),
+        '--dw-sqlite', 'dw.db', *extra_args,
+    ]
+    start = time.perf_counter()
+    with open(os.path.join(run_dir, 'etl.log'), 'w', encoding='utf-8') as log:
+        process = subprocess.Popen(command, cwd=run_dir, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, 'wait4'):
+            # wait4 donne l'usage ressources de CE processus (ru_maxrss en Ko sous Linux)
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss_mb = round(usage.ru_maxrss / 1024, 1)
+        else:
+            process.wait()
+            peak_rss_mb = None
+    return process.returncode, time.perf_counter() - start, peak_rss_mb
+
+
+def benchmark_scale(scale, workdir, seed=42, extra_args=()):
+    """Génère les sources au facteur `scale`, exécute l'ETL et retourne ses mesures."""
+    run_dir = os.path.join(workdir, f'scale_{scale:g}')
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+
+    start = time.perf_counter()
+    sql_path, access_path, volumes = synthetic_northwind.generate(scale, os.path.join(run_dir, 'sources'), seed)
+    print(f"  - Sources x{scale:g} générées en {time.perf_counter() - start:.1f} s "
+          f"({volumes['SQL.Orders']} commandes, {volumes['SQL.Order Details']} lignes de détail)")
+
+    returncode, seconds, peak_rss_mb = run_etl(run_dir, sql_path, access_path, extra_args)
+    if returncode != 0:
+        print(f"  ❌ ETL x{scale:g} en échec (code {returncode}), voir {os.path.join(run_dir, 'etl.log')}")
+        return None
+    report = metrics.load_previous_run(os.path.join(run_dir, metrics.HISTORY_FILE))
+    print(f"  ✅ ETL x{scale:g} : {seconds:.1f} s" + (f", pic RSS {peak_rss_mb} Mo" if peak_rss_mb else ""))
+    return {
+        'scale': scale,
+        'total_seconds': round(seconds, 3),
+        'peak_rss_mb': peak_rss_mb,
+        'volumes': volumes,
+        'stages': report['stages'] if report else [],
+    }
+
+
+def to_frame(results):
+    """Une ligne par (facteur, étape) avec débit et pic mémoire."""
+    rows = []
+    for result in results:
+        for stage in result['stages']:
+            if stage['stage'] in BENCHMARK_STAGES:
+                rows.append({'scale': result['scale'], **stage})
+        rows.append({
+            'scale': result['scale'], 'stage': 'total',
+            'wall_seconds': result['total_seconds'], 'peak_mb': result['peak_rss_mb'],
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de montée en charge de l'ETL Northwind")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 100, 1000],
+                        help="Facteurs de volume à mesurer (défaut : %(default)s)")
+    parser.add_argument('--workdir', default='data/benchmark',
+                        help="Dossier de travail (sources, DW et rapports ; défaut : %(default)s)")
+    parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire (défaut : %(default)s)")
+    parser.add_argument('--batch-size', type=int,
+                        help="Taille des lots de chargement transmise à etl.py")
+    args = parser.parse_args()
+
+    extra_args = ['--batch-size', str(args.batch_size)] if args.batch_size else []
+    os.makedirs(args.workdir, exist_ok=True)
+    results = []
+    for scale in sorted(args.scales):
+        print(f"\n--- Benchmark x{scale:g} ---")
+        result = benchmark_scale(scale, args.workdir, args.seed, extra_args)
+        if result:
+            results.append(result)
+
+    if not results:
+        sys.exit(1)
+
+    curves = to_frame(results)
+    curves_path = os.path.join(args.workdir, 'benchmark_results.csv')
+    curves.to_csv(curves_path, index=False, sep=';', encoding='utf-8')
+    with open(os.path.join(args.workdir, 'benchmark_results.json'), 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+    stage_order = BENCHMARK_STAGES + ['total']
+    with pd.option_context('display.width', 160, 'display.max_columns', 20):
+        print("\n--- Débit (lignes/s) par étape et par facteur ---")
+        print(curves.pivot(index='stage', columns='scale', values='rows_per_sec').reindex(stage_order).dropna(how='all'))
+        print("\n--- Temps (s) par étape et par facteur ---")
+        print(curves.pivot(index='stage', columns='scale', values='wall_seconds').reindex(stage_order))
+        print("\n--- Pic mémoire (Mo) par étape et par facteur (total = pic RSS du processus) ---")
+        print(curves.pivot(index='stage', columns='scale', values='peak_mb').reindex(stage_order))
+    print(f"\n📄 Courbes enregistrées dans {curves_path}")
@@ -0,0 +1,199 @@
+# =================================================================
+# CHARGEMENT EN MASSE (L) : executemany par lots + bascule par rename
+# =================================================================
+# `DataFrame.to_sql` insère ligne à ligne, puis DELETE + INSERT...SELECT
+# réécrit (et journalise) chaque ligne de faits une seconde fois.
+# Ici :
+#   1. la table de staging est créée avec le schéma de la table de production
+#      (types, clé primaire, clés étrangères, reflétés par SQLAlchemy) ; au
+#      premier chargement, ou si les colonnes ont changé, d'après le DataFrame,
+#   2. les lignes sont insérées par lots (`fast_executemany` avec pyodbc),
+#   3. la staging devient la table de production par simple RENAME
+#      (opération de métadonnées, aucune ligne recopiée) ; les index de
+#      l'ancienne table sont recréés dans la même transaction.
+# Le backend est choisi d'après le dialecte SQLAlchemy (mssql, sqlite).
+
+import time
+
+from sqlalchemy import MetaData, Numeric, Table, inspect, text
+from sqlalchemy.schema import CheckConstraint, ForeignKeyConstraint, PrimaryKeyConstraint, UniqueConstraint
+
+import schema
+
+DEFAULT_BATCH_SIZE = 10_000
+
+
+class BulkLoader:
+    """Backend générique : executemany par lots sur la connexion DBAPI."""
+
+    def __init__(self, engine, batch_size=DEFAULT_BATCH_SIZE):
+        self.engine = engine
+        self.batch_size = batch_size
+        # '?' (pyodbc, sqlite3) ou '%s' (pilotes de style format/pyformat)
+        paramstyle = getattr(engine.dialect.dbapi, 'paramstyle', 'qmark')
+        self.placeholder = '%s' if paramstyle in ('format', 'pyformat') else '?'
+
+    def _prepare_cursor(self, cursor):
+        pass
+
+    def quote(self, name):
+        return f'"{name}"'
+
+    def to_records(self, batch):
+        # NaN/NaT -> None (NULL) ; tolist() convertit les scalaires numpy en types Python
+        return batch.astype(object).where(batch.notna(), None).values.tolist()
+
+    def _rename_sql(self, old, new):
+        return f'ALTER TABLE {self.quote(old)} RENAME TO {self.quote(new)}'
+
+    def create_table(self, df, table, like=None):
+        """(Re)crée `table` sans données.
+
+        Avec `like` (table de production existante) : mêmes colonnes, types et
+        contraintes que `like`, si chaque colonne du DataFrame y existe et que
+        les autres colonnes de `like` acceptent NULL ou ont une valeur par défaut.
+        Sinon : schéma déduit du DataFrame.
+        """
+        with self.engine.begin() as connection:
+            existing = inspect(connection)
+            source = None
+            if like and existing.has_table(like):
+                source = Table(like, MetaData(), autoload_with=connection)
+                if not self._compatible(source, df):
+                    print(f"    ⚠️  Colonnes de {like} différentes du DataFrame : {table} créée d'après le DataFrame "
+                          f"(types, contraintes et index de {like} non repris).")
+                    source = None
+            if source is not None:
+                if existing.has_table(table):
+                    connection.execute(text(f'DROP TABLE {self.quote(table)}'))
+                # Même MetaData : les tables référencées par les clés étrangères y sont reflétées
+                staging = source.to_metadata(source.metadata, name=table)
+                # Les noms de contraintes sont uniques dans le schéma (SQL Server) : noms générés
+                for constraint in staging.constraints:
+                    if isinstance(constraint, (PrimaryKeyConstraint, ForeignKeyConstraint,
+                                               UniqueConstraint, CheckConstraint)):
+                        constraint.name = None
+                # Index recréés à la bascule (swap), sur la table devenue production
+                staging.indexes.clear()
+                staging.create(connection)
+                return
+        df.head(0).to_sql(name=table, con=self.engine, if_exists='replace', index=False,
+                          dtype=money_sql_types(df))
+
+    @staticmethod
+    def _compatible(source, df):
+        columns = source.columns
+        if any(c not in columns for c in df.columns):
+            return False
+        return all(
+            column.nullable or column.server_default is not None or column.autoincrement is True
+            for name, column in columns.items() if name not in df.columns
+        )
+
+    def insert(self, df, table):
+        """Insère `df` dans `table` par lots ; retourne le débit (lignes/s)."""
+        columns = ', '.join(self.quote(c) for c in df.columns)
+        values = ', '.join([self.placeholder] * len(df.columns))
+        sql = f'INSERT INTO {self.quote(table)} ({columns}) VALUES ({values})'
+
+        start = time.perf_counter()
+        raw_conn = self.engine.raw_connection()
+        try:
+            cursor = raw_conn.cursor()
+            self._prepare_cursor(cursor)
+            for offset in range(0, len(df), self.batch_size):
+                cursor.executemany(sql, self.to_records(df.iloc[offset:offset + self.batch_size]))
+            raw_conn.commit()
+        finally:
+            raw_conn.close()
+        seconds = time.perf_counter() - start
+        return len(df) / seconds if seconds > 0 else float('inf')
+
+    def load_staging(self, df, staging, like=None):
+        """Crée `staging` (schéma de `like` si possible) et y insère `df`. Retourne le débit."""
+        self.create_table(df, staging, like)
+        return self.insert(df, staging)
+
+    def _create_index_sql(self, index, table):
+        columns = ', '.join(self.quote(c) for c in index['column_names'])
+        unique = 'UNIQUE ' if index['unique'] else ''
+        return f"CREATE {unique}INDEX {self.quote(index['name'])} ON {self.quote(table)} ({columns})"
+
+    def swap(self, staging, target):
+        """Remplace `target` par `staging` (rename dans une transaction) ; les
+        index de `target` sont recréés sur la nouvelle table."""
+        backup = f'{target}_Old'
+        with self.engine.begin() as connection:
+            existing = inspect(connection)
+            target_exists = existing.has_table(target)
+            indexes = []
+            if target_exists:
+                staging_columns = {c['name'] for c in existing.get_columns(staging)}
+                indexes = [
+                    index for index in existing.get_indexes(target)
+                    if index['name'] and all(c in staging_columns for c in index['column_names'])
+                ]
+            if existing.has_table(backup):
+                connection.execute(text(f'DROP TABLE {self.quote(backup)}'))
+            if target_exists:
+                connection.execute(text(self._rename_sql(target, backup)))
+            connection.execute(text(self._rename_sql(staging, target)))
+            if target_exists:
+                # Après suppression de l'ancienne table : les noms d'index sont libres (SQLite)
+                connection.execute(text(f'DROP TABLE {self.quote(backup)}'))
+            for index in indexes:
+                connection.execute(text(self._create_index_sql(index, target)))
+
+    def replace_table(self, df, target):
+        """Chargement complet : staging par lots puis bascule. Retourne le débit."""
+        staging = f'{target}_Staging'
+        rows_per_sec = self.load_staging(df, staging, like=target)
+        self.swap(staging, target)
+        return rows_per_sec
+
+
+def money_sql_types(df):
+    """Type SQL des colonnes 'money' (to_sql les créerait en TEXT)."""
+    return {col: Numeric(19, schema.MONEY_DECIMALS) for col in df.columns if schema.is_money(df[col])}
+
+
+class SqliteBulkLoader(BulkLoader):
+    """Backend local (SQLite) : permet de mesurer le débit sans SQL Server."""
+
+    def to_records(self, batch):
+        # sqlite3 ne sait pas lier les Timestamp pandas : dates au format texte (comme to_sql)
+        datetime_columns = batch.select_dtypes(include=['datetime', 'datetimetz']).columns
+        # ni les decimal.Decimal : SQLite stocke de toute façon les montants en REAL
+        money_columns = [col for col in batch.columns if schema.is_money(batch[col])]
+        if len(datetime_columns) or money_columns:
+            batch = batch.copy()
+            for col in datetime_columns:
+                batch[col] = batch[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+            for col in money_columns:
+                batch[col] = batch[col].astype('float64')
+        return super().to_records(batch)
+
+
+class MssqlBulkLoader(BulkLoader):
+    """SQL Server via pyodbc : paramètres envoyés en tableau (fast_executemany)."""
+
+    def _prepare_cursor(self, cursor):
+        cursor.fast_executemany = True
+
+    def quote(self, name):
+        return f'[{name}]'
+
+    def _rename_sql(self, old, new):
+        return f"EXEC sp_rename '{old}', '{new}'"
+
+
+LOADERS = {
+    'sqlite': SqliteBulkLoader,
+    'mssql': MssqlBulkLoader,
+}
+
+
+def get_loader(engine, batch_size=DEFAULT_BATCH_SIZE):
+    """Retourne le backend adapté au dialecte de `engine`."""
+    loader_class = LOADERS.get(engine.dialect.name, BulkLoader)
+    return loader_class(engine, batch_size=batch_size)
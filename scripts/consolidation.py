@@ -0,0 +1,206 @@
+# =================================================================
+# CONSOLIDATION MULTI-SOURCE (SQL Server + Access) EN UNE SEULE PASSE
+# =================================================================
+# Chaque table consolidée est décrite par une spécification déclarative :
+#   - 'sources'    : (système source, nom de la table extraite)
+#   - 'precedence' : ordre de priorité des systèmes en cas de doublon
+#   - 'key'        : clé métier (composite) servant à la déduplication
+#   - 'columns'    : variantes de noms de colonnes -> nom canonique
+#                    (ex. `Customer Id` / `ID` côté Access -> CustomerID)
+# La consolidation est exécutée une seule fois : les mêmes DataFrames servent
+# à l'export RAW et à la transformation. La déduplication se fait sur un hash
+# 64 bits de la clé composite et les doublons dont les attributs diffèrent
+# (conflits) sont comptés colonne par colonne.
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+SOURCE_COLUMN = 'SourceSystem'
+
+CONSOLIDATION_SPECS = {
+    'Orders': {
+        'sources': [('SQL', 'Orders'), ('Access', 'Orders_Access')],
+        'precedence': ['SQL', 'Access'],
+        # Une commande présente dans les deux sources n'est gardée qu'une fois
+        # (sinon chacune de ses lignes de détail serait dupliquée dans FactSales)
+        'key': ['OrderID'],
+        'columns': {
+            'OrderID': ['Order ID'],
+            'CustomerID': ['Customer ID'],
+            'EmployeeID': ['Employee ID'],
+            'OrderDate': ['Order Date'],
+            'ShippedDate': ['Shipped Date'],
+            'ShipVia': ['Shipper ID'],
+            'Freight': ['Shipping Fee'],
+        },
+    },
+    'OrderDetails': {
+        'sources': [('SQL', 'OrderDetails'), ('Access', 'OrderDetails_Access')],
+        'precedence': ['SQL', 'Access'],
+        'key': ['OrderID', 'ProductID'],
+        'columns': {
+            'OrderID': ['Order ID'],
+            'ProductID': ['Product ID'],
+            'UnitPrice': ['Unit Price'],
+        },
+    },
+    # Dimensions : un même identifiant dans deux sources donne deux membres distincts
+    'Customers': {
+        'sources': [('SQL', 'Customers_SQL'), ('Access', 'Customers_Access')],
+        'precedence': ['SQL', 'Access'],
+        'key': [SOURCE_COLUMN, 'CustomerID'],
+        'columns': {
+            'CustomerID': ['Customer Id', 'Customer ID', 'ID', 'Id'],
+            'CompanyName': ['Company'],
+        },
+    },
+    'Products': {
+        'sources': [('SQL', 'Products'), ('Access', 'Products_Access')],
+        'precedence': ['SQL', 'Access'],
+        'key': [SOURCE_COLUMN, 'ProductID'],
+        'columns': {
+            'ProductID': ['Product ID', 'ID'],
+            'ProductName': ['Product Name'],
+        },
+    },
+    'Suppliers': {
+        'sources': [('SQL', 'Suppliers'), ('Access', 'Suppliers_Access')],
+        'precedence': ['SQL', 'Access'],
+        'key': [SOURCE_COLUMN, 'SupplierID'],
+        'columns': {
+            'SupplierID': ['Supplier ID', 'ID'],
+            'CompanyName': ['Company'],
+            'Country': ['Country/Region'],
+        },
+    },
+}
+
+
+def column_mapping(table):
+    """Variantes de noms de colonnes de la spécification qui consolide `table`."""
+    for spec in CONSOLIDATION_SPECS.values():
+        if any(name == table for _, name in spec['sources']):
+            return spec['columns']
+    return {}
+
+
+def column_renames(columns, mapping):
+    """{variante: nom canonique} : première variante présente de chaque colonne canonique absente."""
+    renames = {}
+    for canonical, variants in mapping.items():
+        if canonical in columns:
+            continue
+        found = next((v for v in variants if v in columns and v not in renames), None)
+        if found:
+            renames[found] = canonical
+    return renames
+
+
+def canonical_columns(df, mapping):
+    """Renomme la première variante présente de chaque colonne canonique absente."""
+    renames = column_renames(df.columns, mapping)
+    return df.rename(columns=renames) if renames else df
+
+
+def align_categories(parts):
+    """Catégories communes aux sources : une colonne catégorielle (registre des
+    schémas) le reste après concaténation au lieu de repasser en 'object'."""
+    categorical = {
+        col for part in parts for col in part.columns
+        if isinstance(part[col].dtype, pd.CategoricalDtype)
+    }
+    for col in categorical:
+        if not all(col in part.columns and isinstance(part[col].dtype, pd.CategoricalDtype) for part in parts):
+            continue
+        try:
+            categories = union_categoricals([part[col] for part in parts]).categories
+        except TypeError:
+            continue  # catégories de types différents : concaténation en 'object'
+        parts = [part.assign(**{col: part[col].cat.set_categories(categories)}) for part in parts]
+    return parts
+
+
+def key_hash(df, key):
+    """Hash 64 bits de la clé composite de chaque ligne."""
+    return pd.util.hash_pandas_object(df[key], index=False).to_numpy()
+
+
+def _conflicts(combined, hashes, duplicated, key):
+    """Nombre de doublons dont au moins un attribut diffère de la ligne retenue."""
+    losers = combined[duplicated]
+    if losers.empty:
+        return 0, {}
+    winners = pd.Series(np.flatnonzero(~duplicated), index=hashes[~duplicated])
+    winners = combined.iloc[winners.loc[hashes[duplicated]].to_numpy()]
+    attributes = [c for c in combined.columns if c not in key and c != SOURCE_COLUMN]
+    differs_any = np.zeros(len(losers), dtype=bool)
+    by_column = {}
+    for col in attributes:
+        left = losers[col].reset_index(drop=True)
+        right = winners[col].reset_index(drop=True)
+        # Une valeur absente d'un côté n'est pas un conflit (colonne non renseignée)
+        differs = (left.ne(right) & left.notna() & right.notna()).fillna(False).to_numpy(dtype=bool)
+        if differs.any():
+            by_column[col] = int(differs.sum())
+            differs_any |= differs
+    return int(differs_any.sum()), by_column
+
+
+def consolidate_table(frames, spec):
+    """Consolide les DataFrames {système: df} selon `spec`.
+
+    Retourne (DataFrame consolidé, rapport).
+    """
+    ordered = [system for system in spec['precedence'] if system in frames]
+    parts = align_categories([canonical_columns(frames[system], spec['columns']) for system in ordered])
+    # Une seule concaténation ; la colonne source est construite sans copier chaque source
+    combined = pd.concat(parts, ignore_index=True)
+    combined[SOURCE_COLUMN] = pd.Categorical(np.repeat(ordered, [len(p) for p in parts]), categories=ordered)
+
+    key = [k for k in spec['key'] if k in combined.columns]
+    hashes = key_hash(combined, key)
+    duplicated = pd.Series(hashes).duplicated(keep='first').to_numpy()
+    conflicts, conflict_columns = _conflicts(combined, hashes, duplicated, key)
+    report = {
+        'sources': {system: len(part) for system, part in zip(ordered, parts)},
+        'rows_in': len(combined),
+        'duplicates': int(duplicated.sum()),
+        'conflicts': conflicts,
+        'conflict_columns': conflict_columns,
+    }
+    if duplicated.any():
+        combined = combined[~duplicated].reset_index(drop=True)
+    report['rows_out'] = len(combined)
+    return combined, report
+
+
+def consolidate(extracted, specs=CONSOLIDATION_SPECS):
+    """Consolide toutes les tables décrites dans `specs`.
+
+    `extracted` : {système: {nom de table extraite: DataFrame}}.
+    Retourne ({table: DataFrame}, {table: rapport}).
+    """
+    tables, reports = {}, {}
+    for name, spec in specs.items():
+        frames = {
+            system: extracted[system][source_table]
+            for system, source_table in spec['sources']
+            if source_table in extracted.get(system, {})
+        }
+        if not frames:
+            continue
+        tables[name], reports[name] = consolidate_table(frames, spec)
+    return tables, reports
+
+
+def print_report(reports):
+    for name, r in reports.items():
+        sources = ' + '.join(f"{n} ({s})" for s, n in r['sources'].items())
+        line = f"  - {name} consolidés : {sources} -> {r['rows_out']}"
+        if r['duplicates']:
+            line += f" ({r['duplicates']} doublons retirés, {r['conflicts']} en conflit)"
+        print(line)
+        if r['conflict_columns']:
+            details = ', '.join(f"{col} : {n}" for col, n in r['conflict_columns'].items())
+            print(f"    ⚠️  Conflits par colonne ({details}) — la source prioritaire est conservée.")
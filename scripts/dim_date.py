@@ -0,0 +1,83 @@
+# =================================================================
+# DIMENSION DATE : calendrier contigu vectorisé + clés arithmétiques
+# =================================================================
+# DimDate couvre des années civiles complètes (1er janvier -> 31 décembre)
+# autour des dates de commande. Le calendrier est mis en cache entre deux
+# runs et n'est prolongé que lorsqu'une date hors de la plage apparaît.
+# Les clés AAAAMMJJ sont calculées par arithmétique entière sur les valeurs
+# datetime64 : plus de strftime ni de jointure FactSales x DimDate.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+CALENDAR_CACHE = 'data/state/DimDate.pkl'
+
+DIMDATE_COLUMNS = ['DateKey', 'Date', 'Year', 'Quarter', 'Month', 'Day', 'DayName', 'MonthName']
+
+# Noms fixes (indépendants de la locale du poste qui exécute l'ETL)
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+MONTH_NAMES = np.array([
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December',
+])
+
+
+def date_keys(values):
+    """Clé AAAAMMJJ (Int64, NULL si date absente) calculée sans formatage texte."""
+    dates = pd.to_datetime(pd.Series(values), errors='coerce')
+    keys = dates.dt.year * 10_000 + dates.dt.month * 100 + dates.dt.day
+    return keys.astype('Int64')
+
+
+def build_calendar(start, end):
+    """Génère DimDate pour chaque jour de `start` à `end` (inclus)."""
+    dates = pd.Series(pd.date_range(start, end, freq='D'), name='Date')
+    year, month, day = dates.dt.year, dates.dt.month, dates.dt.day
+    return pd.DataFrame({
+        'DateKey': (year * 10_000 + month * 100 + day).astype('int64'),
+        'Date': dates,
+        'Year': year,
+        'Quarter': (month - 1) // 3 + 1,
+        'Month': month,
+        'Day': day,
+        'DayName': DAY_NAMES[dates.dt.dayofweek.to_numpy()],
+        'MonthName': MONTH_NAMES[month.to_numpy() - 1],
+    })[DIMDATE_COLUMNS]
+
+
+def load_or_extend_calendar(date_columns, cache_path=CALENDAR_CACHE):
+    """Retourne le calendrier couvrant toutes les dates de `date_columns`.
+
+    Le calendrier en cache est réutilisé tel quel s'il couvre déjà la plage ;
+    sinon seules les années manquantes sont générées puis ajoutées au cache.
+    """
+    bounds = [pd.to_datetime(col, errors='coerce').agg(['min', 'max']) for col in date_columns]
+    bounds = pd.concat(bounds).dropna()
+
+    calendar = pd.read_pickle(cache_path) if os.path.exists(cache_path) else None
+    if bounds.empty:
+        return calendar if calendar is not None else build_calendar('2000-01-01', '1999-12-31')
+
+    # Années civiles complètes : le cache n'est prolongé qu'une fois par an au plus
+    start = pd.Timestamp(year=bounds.min().year, month=1, day=1)
+    end = pd.Timestamp(year=bounds.max().year, month=12, day=31)
+
+    if calendar is None:
+        calendar = build_calendar(start, end)
+        extended = True
+    else:
+        cached_start, cached_end = calendar['Date'].min(), calendar['Date'].max()
+        parts = [calendar]
+        if start < cached_start:
+            parts.insert(0, build_calendar(start, cached_start - pd.Timedelta(days=1)))
+        if end > cached_end:
+            parts.append(build_calendar(cached_end + pd.Timedelta(days=1), end))
+        extended = len(parts) > 1
+        calendar = pd.concat(parts, ignore_index=True) if extended else calendar
+
+    if extended:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        calendar.to_pickle(cache_path)
+    return calendar
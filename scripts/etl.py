@@ -1,15 +1,147 @@
 import pandas as pd
 import pyodbc
 import os
-from sqlalchemy import create_engine  # noqa: F401  # Utilisé dans la partie Chargement (L)
-from sqlalchemy import text
+import argparse
+import sqlite3
+import sys
+from sqlalchemy import create_engine
+from sqlalchemy import inspect, text
+
+import aggregates
+import bulk_load
+import consolidation
+import dim_date
+import fact_builder
+import fingerprints
+import incremental
+import load_version
+import metrics
+import parallel_extract
+import pipeline
+import quality
+import scd
+import sketches
+import snapshot
+import schema
+import storage
+import streaming
+import surrogate_keys
+
+# =================================================================
+# OPTIONS DE LIGNE DE COMMANDE
+# =================================================================
+parser = argparse.ArgumentParser(description="ETL Northwind -> NorthwindDW")
+parser.add_argument('--full-refresh', action='store_true',
+                    help="Ignore les marques (watermarks) et ré-extrait tout l'historique")
+parser.add_argument('--sqlite-sql', metavar='CHEMIN',
+                    help="Base SQLite locale remplaçant la source SQL Server (tests)")
+parser.add_argument('--sqlite-access', metavar='CHEMIN',
+                    help="Base SQLite locale remplaçant la source Access (tests)")
+parser.add_argument('--stream-raw', action='store_true',
+                    help="Extraction en flux par blocs directement vers data/raw/ (mémoire bornée), sans transformation")
+parser.add_argument('--chunk-rows', type=int, default=streaming.DEFAULT_CHUNK_ROWS,
+                    help="Taille des blocs en lignes pour --stream-raw (défaut : %(default)s)")
+parser.add_argument('--chunk-mb', type=float,
+                    help="Budget mémoire par bloc en Mo pour --stream-raw (prioritaire sur --chunk-rows)")
+parser.add_argument('--sql-workers', type=int, default=4,
+                    help="Nombre de lectures parallèles sur SQL Server (défaut : %(default)s)")
+parser.add_argument('--access-workers', type=int, default=2,
+                    help="Nombre de lectures parallèles sur Access (défaut : %(default)s)")
+parser.add_argument('--dw-sqlite', metavar='CHEMIN',
+                    help="Base SQLite locale utilisée comme Data Warehouse (tests, mesure du débit)")
+parser.add_argument('--format', choices=storage.FORMATS,
+                    help="Format des couches data/raw et data/clean : parquet (défaut), csv ou both "
+                         "(--stream-raw : csv uniquement)")
+parser.add_argument('--batch-size', type=int, default=bulk_load.DEFAULT_BATCH_SIZE,
+                    help="Taille des lots d'insertion lors du chargement (défaut : %(default)s)")
+parser.add_argument('--regression-threshold', type=float, default=metrics.DEFAULT_REGRESSION_THRESHOLD,
+                    help="Écart relatif (temps / pic mémoire) signalé comme régression par rapport au run précédent (défaut : %(default)s)")
+parser.add_argument('--trace-memory', action='store_true',
+                    help="Mesure le pic mémoire par étape avec tracemalloc (précis mais lent ; défaut : pic RSS échantillonné)")
+parser.add_argument('--no-skip', action='store_true',
+                    help="Ré-exporte, reconstruit et recharge toutes les tables même si leur contenu est inchangé")
+parser.add_argument('--stage-workers', type=int, default=pipeline.DEFAULT_WORKERS,
+                    help="Nombre d'étapes indépendantes exécutées en parallèle (défaut : %(default)s)")
+parser.add_argument('--checkpoint', action='store_true',
+                    help="Écrit les sorties de chaque étape (points de contrôle) pour pouvoir reprendre le run (--resume, --stage)")
+parser.add_argument('--resume', action='store_true',
+                    help="Reprend le run précédent à partir des étapes en échec (points de contrôle, run lancé avec --checkpoint)")
+parser.add_argument('--stage', action='append', metavar='ÉTAPE',
+                    help="N'exécute que cette étape (répétable) ; ses entrées sont relues depuis les points de contrôle")
+parser.add_argument('--from-stage', action='append', metavar='ÉTAPE',
+                    help="Exécute cette étape et toutes celles qui en dépendent")
+parser.add_argument('--to-stage', action='append', metavar='ÉTAPE',
+                    help="Exécute cette étape et toutes celles dont elle dépend")
+parser.add_argument('--list-stages', action='store_true',
+                    help="Affiche le graphe des étapes et quitte")
+parser.add_argument('--fact-workers', type=int, default=0,
+                    help="Processus de construction de FactSales (défaut : 0 = automatique selon le volume, 1 = série)")
+parser.add_argument('--verify-fact-build', action='store_true',
+                    help="Construit aussi FactSales en série et compare les checksums (échec si différents)")
+parser.add_argument('--quality-action', choices=quality.ACTIONS, default='fail',
+                    help="Lignes de FactSales en violation des règles qualité : échec du run (défaut), "
+                         "quarantaine (écartées du chargement) ou simple avertissement")
+parser.add_argument('--quality-sample', type=float, metavar='FRACTION',
+                    help="Contrôle qualité d'abord sur cette fraction des lignes (ex. 0.05) ; contrôle complet si violation")
+parser.add_argument('--snapshot', action='store_true',
+                    help="Conserve un instantané versionné des tables extraites (data/snapshots/) pour le rejeu hors ligne")
+parser.add_argument('--replay', nargs='?', const='latest', metavar='VERSION',
+                    help="Rejoue consolidation, transformation et chargement depuis un instantané (défaut : le dernier), sans interroger les sources")
+parser.add_argument('--list-snapshots', action='store_true',
+                    help="Affiche les instantanés disponibles et quitte")
+args = parser.parse_args()
+
+# Temps, CPU, lignes et pic mémoire de chaque étape (rapport en fin de run)
+run_metrics = metrics.RunMetrics(trace_memory=args.trace_memory)
+
+STREAM_RAW = args.stream_raw
+
+# L'extraction en flux écrit chaque bloc à la suite du précédent : CSV uniquement
+if STREAM_RAW and args.format not in (None, 'csv'):
+    parser.error(f"--stream-raw écrit data/raw/ en CSV : --format {args.format} n'est pas pris en charge")
+
+# Parquet nécessite pyarrow : repli sur CSV s'il n'est pas installé
+EXPORT_FORMAT = 'csv' if STREAM_RAW else (args.format or 'parquet')
+if EXPORT_FORMAT != 'csv' and not storage.parquet_available():
+    print("⚠️  pyarrow n'est pas installé : export des couches RAW/CLEAN en CSV.")
+    EXPORT_FORMAT = 'csv'
+CHUNK_BYTES = int(args.chunk_mb * 1024 ** 2) if args.chunk_mb else None
+
+# Chemin de sortie pour les données brutes
+RAW_OUTPUT_DIR = 'data/raw/'
+# Chemin de sortie des tables nettoyées (couche CLEAN)
+OUTPUT_DIR = 'data/clean/'
+
+# Rejeu hors ligne (scripts/snapshot.py) : les sources sont relues depuis un instantané
+REPLAY_VERSION = None
+if args.replay:
+    if STREAM_RAW:
+        parser.error("--replay et --stream-raw sont incompatibles")
+    try:
+        REPLAY_VERSION = snapshot.resolve(args.replay)
+    except ValueError as e:
+        parser.error(str(e))
+
+FULL_REFRESH = args.full_refresh
+# Un rejeu reconstruit tout à partir de l'instantané (tables complètes, pas de delta)
+watermarks = {} if FULL_REFRESH or REPLAY_VERSION else incremental.load_watermarks()
+# Un run est incrémental dès qu'un run précédent a laissé des marques
+INCREMENTAL_RUN = bool(watermarks)
+# Mémoire (Mo) avant/après application du registre des schémas, par table
+source_memory = {}
+dw_memory = {}
+# Empreintes de contenu du run précédent : les exports, transformations et
+# chargements dont le contenu (ou les entrées) n'a pas changé sont ignorés
+manifest = fingerprints.RunManifest(use_previous=not (FULL_REFRESH or args.no_skip))
+CODE_FINGERPRINT = fingerprints.code_fingerprint()
+
 # =================================================================
 # PARTIE 1 : EXTRACTION SQL SERVER
 # =================================================================
 
 # ✅ SERVEUR SQL IDENTIFIÉ : Vous avez trouvé ce nom avec SSMS.
-SQL_SERVER_NAME = r'DESKTOP-F8N2M8C\SQLEXPRESS' 
-SQL_DATABASE_NAME = 'Northwind' 
+SQL_SERVER_NAME = r'DESKTOP-F8N2M8C\SQLEXPRESS'
+SQL_DATABASE_NAME = 'Northwind'
 
 # Chaîne de connexion pour l'authentification Windows
 SQL_CONN_STRING = (
@@ -20,32 +152,69 @@ SQL_CONN_STRING = (
     r'TrustServerCertificate=yes;'
 )
 
-print(f"Tentative de connexion à SQL Server: {SQL_SERVER_NAME}/{SQL_DATABASE_NAME}")
-
-try:
-    sql_conn = pyodbc.connect(SQL_CONN_STRING)
-    print("✅ Connexion à SQL Server réussie.")
-
-    # Requêtes d'extraction des tables nécessaires au schéma en étoile :
-    queries = {
-        'Orders': 'SELECT * FROM Orders',
-        'OrderDetails': 'SELECT * FROM "Order Details"',
-        'Customers_SQL': 'SELECT * FROM Customers',
-        'Products': 'SELECT * FROM Products',
-        'Categories': 'SELECT * FROM Categories',
-        'Employees': 'SELECT * FROM Employees',
-        'Shippers': 'SELECT * FROM Shippers',
-        'Suppliers': 'SELECT * FROM Suppliers'
-    }
+# Requêtes d'extraction des tables nécessaires au schéma en étoile :
+SQL_QUERIES = {
+    'Orders': 'SELECT * FROM Orders',
+    'OrderDetails': 'SELECT * FROM "Order Details"',
+    'Customers_SQL': 'SELECT * FROM Customers',
+    'Products': 'SELECT * FROM Products',
+    'Categories': 'SELECT * FROM Categories',
+    'Employees': 'SELECT * FROM Employees',
+    'Shippers': 'SELECT * FROM Shippers',
+    'Suppliers': 'SELECT * FROM Suppliers'
+}
+
+
+def connect_sql():
+    if args.sqlite_sql:
+        # check_same_thread=False : la connexion peut être ouverte par un worker du pool
+        # PARSE_DECLTYPES : les colonnes TIMESTAMP sont relues en datetime (comme SQL Server)
+        return sqlite3.connect(args.sqlite_sql, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+    return pyodbc.connect(SQL_CONN_STRING)
 
-    raw_data_sql = {}
-    for table, query in queries.items():
-        raw_data_sql[table] = pd.read_sql(query, sql_conn)
-        print(f"- Extrait la table {table} ({len(raw_data_sql[table])} lignes).")
 
-except pyodbc.Error as ex:
-    print(f"❌ Erreur de connexion à SQL Server.")
-    print(ex)
+def read_source_table(conn, table, query):
+    """Lecture d'une table source (incrémentale pour Orders / Order Details),
+    convertie aux types compacts du registre des schémas dès l'extraction."""
+    if table in incremental.INCREMENTAL_TABLES:
+        full, delta, watermark = incremental.extract_table(conn, table, watermarks, full_refresh=FULL_REFRESH)
+        return schema.enforce(full, table, source_memory), schema.enforce(delta, table), watermark
+    return schema.enforce(pd.read_sql(query, conn), table, source_memory)
+
+
+def record_extraction(report, label):
+    """Reporte dans les mesures du run le temps et les lignes de chaque table extraite."""
+    for table, r in report.items():
+        if not r['error']:
+            run_metrics.record(f'extract:{label}:{table}', r['seconds'], rows_out=r['rows'])
+
+
+def replay_source(source, label):
+    """Mode --replay : tables de l'instantané à la place de l'extraction, typées
+    comme à l'extraction et contrôlées contre les empreintes de l'instantané."""
+    run_metrics.start(f'replay_{source}')
+    tables = {
+        name: schema.enforce(df, name, source_memory)
+        for name, df in snapshot.load(REPLAY_VERSION, source).items()
+    }
+    snapshot.verify(REPLAY_VERSION, source, tables, fingerprint=manifest.fingerprint)
+    run_metrics.end(f'replay_{source}', rows_out=sum(len(df) for df in tables.values()))
+    print(f"♻️  {label} : {len(tables)} tables relues depuis l'instantané {REPLAY_VERSION} "
+          f"({sum(len(df) for df in tables.values())} lignes).")
+    return tables
+
+
+def split_extracted(results):
+    """Sépare les résultats du pool en (tables, deltas, nouvelles marques)."""
+    tables, deltas, new_watermarks = {}, {}, {}
+    for table, result in results.items():
+        if isinstance(result, tuple):
+            # Table incrémentale : (table complète, delta, nouvelle marque)
+            tables[table], deltas[table], new_watermarks[table] = result
+            print(f"- {table} : {len(deltas[table])} nouvelles lignes, {len(tables[table])} au total.")
+        else:
+            tables[table] = result
+    return tables, deltas, new_watermarks
 
 
 # =================================================================
@@ -54,297 +223,341 @@ except pyodbc.Error as ex:
 
 # Configuration de la connexion Access (CHEMIN ABSOLU UTILISÉ POUR LA FIABILITÉ)
 # Le 'r' devant la chaîne sert à ignorer les séquences d'échappement dans les chemins Windows.
-ACCESS_DB_PATH = r'C:\Users\tk computer\OneDrive\Bureau\etude\BI\Projet_BI_Northwind\data\Northwind 2012.accdb' 
-ACCESS_DRIVER = '{Microsoft Access Driver (*.mdb, *.accdb)}' 
+ACCESS_DB_PATH = r'C:\Users\tk computer\OneDrive\Bureau\etude\BI\Projet_BI_Northwind\data\Northwind 2012.accdb'
+ACCESS_DRIVER = '{Microsoft Access Driver (*.mdb, *.accdb)}'
 
 ACCESS_CONN_STRING = (
     f'DRIVER={ACCESS_DRIVER};'
     f'DBQ={ACCESS_DB_PATH};'
 )
 
-data_access = {}
-print(f"\nTentative de connexion à la source Access: {ACCESS_DB_PATH}")
-try:
-    access_conn = pyodbc.connect(ACCESS_CONN_STRING)
-    print("✅ Connexion à Access réussie.")
-
-    queries_access = {
-        'Customers_Access': 'SELECT * FROM Customers',
-        'Products_Access': 'SELECT * FROM Products',
-        'Suppliers_Access': 'SELECT * FROM Suppliers',
-        'Orders_Access': 'SELECT * FROM Orders',
-        'OrderDetails_Access': 'SELECT * FROM "Order Details"',
-    }
-    
-    for table_name, query in queries_access.items():
-        print(f"  - Extraction de {table_name}...")
-        data_access[table_name] = pd.read_sql(query, access_conn) 
-        
-    access_conn.close()
-    print("✅ Extraction des tables de la source Access terminée.")
+ACCESS_QUERIES = {
+    'Customers_Access': 'SELECT * FROM Customers',
+    'Products_Access': 'SELECT * FROM Products',
+    'Suppliers_Access': 'SELECT * FROM Suppliers',
+    'Orders_Access': 'SELECT * FROM Orders',
+    'OrderDetails_Access': 'SELECT * FROM "Order Details"',
+}
 
-except pyodbc.Error as e:
-    print(f"❌ Échec de la connexion/extraction Access. L'analyse des deux sources sera limitée. Détails: {e}")
-    data_access = {}
 
-# =================================================================
-# ÉTAPE : Exportation des Données Sources (RAW)
-# =================================================================
-print("\n--- Démarrage de l'Exportation des fichiers sources (RAW) ---")
+def connect_access():
+    if args.sqlite_access:
+        return sqlite3.connect(args.sqlite_access, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+    return pyodbc.connect(ACCESS_CONN_STRING)
 
-# Chemin de sortie pour les données brutes
-RAW_OUTPUT_DIR = 'data/raw/' 
-
-# Crée le dossier 'data/raw' s'il n'existe pas
-os.makedirs(RAW_OUTPUT_DIR, exist_ok=True)
-
-# Le dictionnaire 'raw_data_sql' contient toutes les tables extraites de la BDD Northwind
-dfs_to_export_raw = raw_data_sql.copy() 
-
-# Consolidation des données Access avec les données SQL pour l'export RAW
-# Pour chaque table qui existe dans les deux sources, on les concatène
-if data_access:
-    # Consolidation des Orders
-    if 'Orders_Access' in data_access:
-        Orders_Raw = pd.concat([raw_data_sql['Orders'], data_access['Orders_Access']], ignore_index=True)
-        dfs_to_export_raw['Orders'] = Orders_Raw
-        print(f"  - Orders consolidés pour RAW : {len(raw_data_sql['Orders'])} (SQL) + {len(data_access['Orders_Access'])} (Access) = {len(Orders_Raw)} (Total)")
-    
-    # Consolidation des OrderDetails
-    if 'OrderDetails_Access' in data_access:
-        OrderDetails_Raw = pd.concat([raw_data_sql['OrderDetails'], data_access['OrderDetails_Access']], ignore_index=True)
-        # Suppression des doublons basés sur OrderID et ProductID
-        initial_len = len(OrderDetails_Raw)
-        OrderDetails_Raw.drop_duplicates(subset=['OrderID', 'ProductID'], keep='first', inplace=True)
-        dfs_to_export_raw['OrderDetails'] = OrderDetails_Raw
-        if len(OrderDetails_Raw) < initial_len:
-            print(f"  - OrderDetails consolidés pour RAW : {initial_len} -> {len(OrderDetails_Raw)} (après déduplication)")
-        else:
-            print(f"  - OrderDetails consolidés pour RAW : {len(raw_data_sql['OrderDetails'])} (SQL) + {len(data_access['OrderDetails_Access'])} (Access) = {len(OrderDetails_Raw)} (Total)")
-    
-    # Consolidation des Customers
-    if 'Customers_Access' in data_access:
-        Customers_Raw = pd.concat([raw_data_sql['Customers_SQL'], data_access['Customers_Access']], ignore_index=True)
-        # Suppression des doublons basés sur CustomerID (priorité à SQL)
-        Customers_Raw.drop_duplicates(subset=['CustomerID'], keep='first', inplace=True)
-        dfs_to_export_raw['Customers_SQL'] = Customers_Raw
-        print(f"  - Customers consolidés pour RAW : {len(Customers_Raw)} lignes (après déduplication)")
-    
-    # Consolidation des Products
-    if 'Products_Access' in data_access:
-        Products_Raw = pd.concat([raw_data_sql['Products'], data_access['Products_Access']], ignore_index=True)
-        # Suppression des doublons basés sur ProductID (priorité à SQL)
-        Products_Raw.drop_duplicates(subset=['ProductID'], keep='first', inplace=True)
-        dfs_to_export_raw['Products'] = Products_Raw
-        print(f"  - Products consolidés pour RAW : {len(Products_Raw)} lignes (après déduplication)")
-    
-    # Consolidation des Suppliers
-    if 'Suppliers_Access' in data_access:
-        Suppliers_Raw = pd.concat([raw_data_sql['Suppliers'], data_access['Suppliers_Access']], ignore_index=True)
-        # Suppression des doublons basés sur SupplierID (priorité à SQL)
-        Suppliers_Raw.drop_duplicates(subset=['SupplierID'], keep='first', inplace=True)
-        dfs_to_export_raw['Suppliers'] = Suppliers_Raw
-        print(f"  - Suppliers consolidés pour RAW : {len(Suppliers_Raw)} lignes (après déduplication)")
-    
-    # Export des notes clients d'Access si elles existent
-    if 'Customers_Access' in data_access:
-        # Extraire uniquement les colonnes Notes si elles existent
-        customers_access_df = data_access['Customers_Access']
-        # Vérifier quelles colonnes existent (peut être CustomerID ou autre)
-        id_column = None
-        for col in ['CustomerID', 'Customer Id', 'ID', 'Id']:
-            if col in customers_access_df.columns:
-                id_column = col
-                break
-        
-        if 'Notes' in customers_access_df.columns and id_column:
-            customers_notes = customers_access_df[[id_column, 'Notes']].copy()
-            customers_notes = customers_notes[customers_notes['Notes'].notna()]  # Garder seulement les notes non vides
-            if len(customers_notes) > 0:
-                # Renommer la colonne ID pour cohérence
-                customers_notes.rename(columns={id_column: 'CustomerID'}, inplace=True)
-                dfs_to_export_raw['Customers_Access_Notes'] = customers_notes
-                print(f"  - Notes clients Access extraites : {len(customers_notes)} lignes")
-        elif 'Notes' in customers_access_df.columns:
-            # Si Notes existe mais pas d'ID, exporter juste les Notes
-            customers_notes = customers_access_df[['Notes']].copy()
-            customers_notes = customers_notes[customers_notes['Notes'].notna()]
-            if len(customers_notes) > 0:
-                dfs_to_export_raw['Customers_Access_Notes'] = customers_notes
-                print(f"  - Notes clients Access extraites : {len(customers_notes)} lignes (sans ID)")
-
-# Exportation de tous les fichiers RAW
-for name, df in dfs_to_export_raw.items():
-    file_path = os.path.join(RAW_OUTPUT_DIR, f'{name}.csv')
-    try:
-        df.to_csv(
-            file_path,
-            index=False,
-            sep=';',
-            encoding='utf-8'
-        )
-        print(f"  - Exportation de {name}.csv (RAW) réussie vers {RAW_OUTPUT_DIR} ({len(df)} lignes).")
-    except Exception as e:
-        print(f"  ❌ Échec de l'exportation de {name}.csv (RAW): {e}")
-
-print("--- Exportation des fichiers sources (RAW) terminée ---")
 
-# --- Démarrage de la Transformation (T) ---
-# =================================================================
-# =================================================================
-# PARTIE 3 : TRANSFORMATION (T)
-# =================================================================
+def stream_sources():
+    """Mode --stream-raw : chaque table est écrite bloc par bloc dans data/raw/
+    (séquentiel : le pic mémoire reste celui d'un seul bloc)."""
+    print(f"Tentative de connexion à SQL Server: {SQL_SERVER_NAME}/{SQL_DATABASE_NAME}")
+    try:
+        sql_conn = connect_sql()
+        print("✅ Connexion à SQL Server réussie.")
+        print(f"- Extraction en flux vers {RAW_OUTPUT_DIR} (blocs de {args.chunk_rows} lignes"
+              + (f", budget {args.chunk_mb} Mo)" if CHUNK_BYTES else ")"))
+        streaming.stream_queries(sql_conn, SQL_QUERIES, RAW_OUTPUT_DIR, args.chunk_rows, CHUNK_BYTES)
+        sql_conn.close()
+    except (pyodbc.Error, sqlite3.Error) as ex:
+        print(f"❌ Erreur de connexion à SQL Server.")
+        print(ex)
+        sys.exit(1)
+
+    print(f"\nTentative de connexion à la source Access: {ACCESS_DB_PATH}")
+    try:
+        access_conn = connect_access()
+        print("✅ Connexion à Access réussie.")
+        streaming.stream_queries(access_conn, ACCESS_QUERIES, RAW_OUTPUT_DIR, args.chunk_rows, CHUNK_BYTES)
+        access_conn.close()
+        print("✅ Extraction des tables de la source Access terminée.")
+    except (pyodbc.Error, sqlite3.Error) as e:
+        print(f"❌ Échec de la connexion Access. L'analyse des deux sources sera limitée. Détails: {e}")
 
-print("\n--- Démarrage de la Transformation (T) ---")
 
 # =================================================================
-# >>> AJOUT MULTI-SOURCE : CONSOLIDATION DES SOURCES <<<
-# Nous utilisons maintenant les DATA CONSOLIDÉES pour toutes les transformations.
+# GRAPHE DES ÉTAPES (scripts/pipeline.py)
 # =================================================================
+# Chaque étape déclare ses entrées et ses sorties : les étapes indépendantes
+# (les deux extractions, les dimensions, l'export CLEAN et le chargement...)
+# s'exécutent en parallèle. Avec --checkpoint (implicite pour --resume et les
+# sous-graphes), les sorties de chaque étape sont conservées pour reprendre un
+# run interrompu (--resume) ou relancer une seule étape.
+etl_pipeline = pipeline.Pipeline()
+
+
+@etl_pipeline.stage('extract_sql', outputs=['raw_data_sql', 'sql_deltas', 'sql_watermarks'])
+def extract_sql():
+    if REPLAY_VERSION:
+        return {'raw_data_sql': replay_source('sql', 'SQL Server'), 'sql_deltas': {}, 'sql_watermarks': {}}
+    print(f"Tentative de connexion à SQL Server: {SQL_SERVER_NAME}/{SQL_DATABASE_NAME}")
+    try:
+        # La connexion de test est fermée : chaque worker du pool ouvre la sienne
+        connect_sql().close()
+        print("✅ Connexion à SQL Server réussie.")
+    except (pyodbc.Error, sqlite3.Error) as ex:
+        raise RuntimeError(f"Erreur de connexion à SQL Server : {ex}") from ex
+
+    run_metrics.start('extract_sql')
+    results, report = parallel_extract.extract_parallel(
+        connect_sql, SQL_QUERIES, read_source_table, workers=args.sql_workers, label='SQL Server'
+    )
+    raw_data_sql, sql_deltas, sql_watermarks = split_extracted(results)
+    run_metrics.end('extract_sql', rows_out=sum(len(df) for df in raw_data_sql.values()))
+    record_extraction(report, 'sql')
+
+    # SQL Server est la source principale : une table manquante rendrait la transformation incohérente
+    sql_failures = [t for t, r in report.items() if r['error']]
+    if sql_failures:
+        raise RuntimeError(f"Tables SQL Server non extraites : {', '.join(sql_failures)}. Arrêt de l'ETL.")
+    return {'raw_data_sql': raw_data_sql, 'sql_deltas': sql_deltas, 'sql_watermarks': sql_watermarks}
+
+
+@etl_pipeline.stage('extract_access', outputs=['data_access', 'access_deltas', 'access_watermarks'])
+def extract_access():
+    if REPLAY_VERSION:
+        return {'data_access': replay_source('access', 'Access'), 'access_deltas': {}, 'access_watermarks': {}}
+    print(f"\nTentative de connexion à la source Access: {ACCESS_DB_PATH}")
+    try:
+        connect_access().close()
+        print("✅ Connexion à Access réussie.")
+    except (pyodbc.Error, sqlite3.Error) as e:
+        print(f"❌ Échec de la connexion Access. L'analyse des deux sources sera limitée. Détails: {e}")
+        return {'data_access': {}, 'access_deltas': {}, 'access_watermarks': {}}
+
+    run_metrics.start('extract_access')
+    # Une table Access en échec n'empêche plus l'extraction des autres :
+    # la consolidation utilise simplement les tables Access disponibles.
+    results, report = parallel_extract.extract_parallel(
+        connect_access, ACCESS_QUERIES, read_source_table, workers=args.access_workers, label='Access'
+    )
+    data_access, access_deltas, access_watermarks = split_extracted(results)
+    run_metrics.end('extract_access', rows_out=sum(len(df) for df in data_access.values()))
+    record_extraction(report, 'access')
+    print("✅ Extraction des tables de la source Access terminée.")
+    return {'data_access': data_access, 'access_deltas': access_deltas, 'access_watermarks': access_watermarks}
 
-# Nous devons d'abord nous assurer que tous les DataFrames existent, sinon nous utilisons uniquement la source SQL.
-# -----------------------------------------------------------------
-# 3.0 CONSOLIDATION DES DONNÉES DE FAITS (Orders et OrderDetails)
-# -----------------------------------------------------------------
-
-# Consolidation des commandes (Orders)
-# La source principale est data['Orders'] (ou raw_data_sql['Orders']).
-# Nous allons renommer raw_data_sql en data pour simplifier.
-data = raw_data_sql 
 
-if 'Orders_Access' in data_access:
-    # On concatène les données de SQL Server et Access, en ignorant l'index.
-    Orders_Combined = pd.concat([data['Orders'], data_access['Orders_Access']], ignore_index=True)
-    print(f"  - Commandes consolidées : {len(data['Orders'])} (SQL) + {len(data_access['Orders_Access'])} (Access) -> {len(Orders_Combined)} (Total)")
-else:
-    Orders_Combined = data['Orders'].copy()
-    print("  - Utilisation uniquement des commandes SQL Server.")
+@etl_pipeline.stage('snapshot_sources', inputs=['raw_data_sql', 'data_access'])
+def snapshot_sources(raw_data_sql, data_access):
+    # Instantané versionné des tables extraites (--snapshot), base du rejeu hors ligne
+    if not args.snapshot or REPLAY_VERSION:
+        print("  - Instantané des sources non demandé (--snapshot).")
+        return
+    run_metrics.start('snapshot_sources')
+    path = snapshot.save({'sql': raw_data_sql, 'access': data_access}, run_metrics.run_id)
+    run_metrics.end('snapshot_sources', rows_out=sum(len(df) for df in [*raw_data_sql.values(), *data_access.values()]))
+    print(f"📸 Instantané des sources {run_metrics.run_id} écrit dans {path} (rejeu : python scripts/etl.py --replay)")
 
-# Consolidation des détails de commandes (OrderDetails)
-if 'OrderDetails_Access' in data_access:
-    # On concatène les données de SQL Server et Access.
-    OrderDetails_Combined = pd.concat([data['OrderDetails'], data_access['OrderDetails_Access']], ignore_index=True)
-    
-    # === Dédupliquer les lignes de détail ===
-    # Une ligne est unique par la combinaison de l'OrderID et du ProductID.
-    initial_len = len(OrderDetails_Combined)
-    OrderDetails_Combined.drop_duplicates(subset=['OrderID', 'ProductID'], keep='first', inplace=True)
-    
-    if len(OrderDetails_Combined) < initial_len:
-         print(f"  - Détails de commande : {initial_len - len(OrderDetails_Combined)} doublons retirés.")
 
-    print(f"  - Détails consolidés : {len(data['OrderDetails'])} (SQL) + {len(data_access['OrderDetails_Access'])} (Access) -> {len(OrderDetails_Combined)} (Total Net)")
-else:
-    OrderDetails_Combined = data['OrderDetails'].copy()
-    print("  - Utilisation uniquement des détails SQL Server.")
+# =================================================================
+# ÉTAPE : Consolidation des sources et Exportation des Données Sources (RAW)
+# =================================================================
+@etl_pipeline.stage('consolidate', inputs=['raw_data_sql', 'data_access'], outputs=['consolidated', 'raw_tables'])
+def consolidate_sources(raw_data_sql, data_access):
+    schema.print_memory_report(source_memory, "des tables extraites")
+
+    # Empreinte de chaque table extraite, comparée à celle du run précédent
+    extracted_tables = {**raw_data_sql, **data_access}
+    for name, df in extracted_tables.items():
+        manifest.record('sources', name, manifest.fingerprint(df))
+    unchanged_sources = [n for n in extracted_tables if manifest.unchanged('sources', n, manifest.current['sources'][n])]
+    if manifest.previous:
+        print(f"🔎 Tables sources inchangées depuis le dernier run : {len(unchanged_sources)}/{len(extracted_tables)}"
+              + (f" ({', '.join(unchanged_sources)})" if unchanged_sources else ""))
+
+    print("\n--- Consolidation des sources (SQL Server + Access) ---")
+    # Consolidation exécutée UNE seule fois (spécifications dans scripts/consolidation.py) :
+    # les mêmes tables servent à l'export RAW et à la transformation.
+    run_metrics.start('consolidate', rows_in=sum(len(df) for df in raw_data_sql.values()) + sum(len(df) for df in data_access.values()))
+    consolidated, consolidation_report = consolidation.consolidate({'SQL': raw_data_sql, 'Access': data_access})
+    consolidation.print_report(consolidation_report)
+    run_metrics.end('consolidate', rows_out=sum(len(df) for df in consolidated.values()))
+
+    # Tables SQL Server extraites ; chaque table consolidée remplace sa table source
+    # principale (ex. Customers_SQL contient les clients SQL + Access)
+    raw_tables = dict(raw_data_sql)
+    for name, df in consolidated.items():
+        raw_tables[consolidation.CONSOLIDATION_SPECS[name]['sources'][0][1]] = df
 
+    # Export des notes clients d'Access si elles existent
+    if 'Customers_Access' in data_access and 'Notes' in consolidated['Customers'].columns:
+        customers_consolidated = consolidated['Customers']
+        customers_notes = customers_consolidated.loc[
+            (customers_consolidated[consolidation.SOURCE_COLUMN] == 'Access') & customers_consolidated['Notes'].notna(),
+            ['CustomerID', 'Notes']
+        ]
+        if len(customers_notes) > 0:
+            raw_tables['Customers_Access_Notes'] = customers_notes
+            print(f"  - Notes clients Access extraites : {len(customers_notes)} lignes")
+    return {'consolidated': consolidated, 'raw_tables': raw_tables}
+
+
+def export_unchanged(layer, directory, name, df):
+    """Vrai si le fichier exporté au run précédent a exactement ce contenu (et existe encore)."""
+    fingerprint = manifest.fingerprint(df)
+    if manifest.unchanged(layer, name, fingerprint) and all(
+        os.path.exists(path) for path in storage.export_paths(directory, name, EXPORT_FORMAT)
+    ):
+        manifest.record(layer, name, fingerprint)
+        manifest.skip(f'export {layer.upper()}', name, "contenu identique au dernier export")
+        return True
+    return False
+
+
+@etl_pipeline.stage('export_raw', inputs=['raw_tables'])
+def export_raw(raw_tables):
+    print("\n--- Démarrage de l'Exportation des fichiers sources (RAW) ---")
+    run_metrics.start('export_raw')
+
+    # Crée le dossier 'data/raw' s'il n'existe pas
+    os.makedirs(RAW_OUTPUT_DIR, exist_ok=True)
+
+    # Exportation de tous les fichiers RAW
+    for name, df in raw_tables.items():
+        if export_unchanged('raw', RAW_OUTPUT_DIR, name, df):
+            continue
+        try:
+            # Parquet typé/compressé par défaut, CSV (';') si --format csv ou both
+            storage.write_table(df, RAW_OUTPUT_DIR, name, EXPORT_FORMAT)
+            manifest.record('raw', name, manifest.fingerprint(df))
+            print(f"  - Exportation de {name} ({EXPORT_FORMAT}, RAW) réussie vers {RAW_OUTPUT_DIR} ({len(df)} lignes).")
+        except Exception as e:
+            print(f"  ❌ Échec de l'exportation de {name} (RAW): {e}")
+
+    run_metrics.end('export_raw', rows_out=sum(len(df) for df in raw_tables.values()))
+    print("--- Exportation des fichiers sources (RAW) terminée ---")
 
-# === NOUVEAU : Vérification de la taille de FactSales après création ===
-# (Ajouter ces lignes juste après la création de FactSales en 3.5)
-# ...
 
+# =================================================================
+# PARTIE 3 : TRANSFORMATION (T)
+# =================================================================
+# Les dimensions ne dépendent que des tables consolidées : elles sont
+# construites en parallèle. FactSales attend les dimensions à clé de
+# substitution (ses clés sont résolues dans leurs registres).
+
+def reuse_previous(table, input_tables, raw_tables):
+    """Dimension du run précédent, relue depuis la couche CLEAN, si ses tables
+    d'entrée (RAW) et le code de l'ETL sont inchangés ; sinon None."""
+    inputs = fingerprints.combine(
+        [CODE_FINGERPRINT] + [manifest.fingerprint(raw_tables[name]) for name in input_tables]
+    )
+    manifest.record('inputs', table, inputs)
+    if not manifest.unchanged('inputs', table, inputs) or not storage.table_exists(OUTPUT_DIR, table):
+        return None
+    previous = schema.enforce(storage.read_table(OUTPUT_DIR, table), table)
+    # L'export CLEAN doit être celui du run précédent (pas modifié ou incomplet depuis)
+    if manifest.fingerprint(previous) != manifest.previous_value('clean', table):
+        return None
+    manifest.skip('transformation', table, f"entrées inchangées ({', '.join(input_tables)}), table relue depuis la couche CLEAN")
+    return previous
+
+
+# Registres persistants des clés de substitution : (source, clé naturelle) -> clé entière.
+# Chaque dimension sauvegarde son registre dès sa construction (reprise possible avant FactSales).
+key_registries = {
+    dimension: surrogate_keys.KeyRegistry(dimension)
+    for dimension in ('DimCustomers', 'DimProducts', 'DimEmployees', 'DimShippers', 'DimSuppliers')
+}
 
 
 # -----------------------------------------------------------------
 # 3.1 Création et Nettoyage de la Dimension Date (DimDate)
 # -----------------------------------------------------------------
+@etl_pipeline.stage('dim_date', inputs=['consolidated'], outputs=['DimDate'])
+def build_dim_date(consolidated):
+    # Calendrier contigu (années civiles complètes) couvrant toutes les dates de la
+    # table Orders CONSOLIDÉE ; mis en cache et prolongé seulement si de nouvelles dates apparaissent.
+    Orders_Combined = consolidated['Orders']
+    run_metrics.start('dim_date', rows_in=len(Orders_Combined))
+    DimDate = dim_date.load_or_extend_calendar([
+        Orders_Combined['OrderDate'], # Utilise les commandes consolidées
+        Orders_Combined['RequiredDate'], # Utilise les commandes consolidées
+        Orders_Combined['ShippedDate'] # Utilise les commandes consolidées
+    ])
+    DimDate = schema.enforce(DimDate, 'DimDate', dw_memory)
+    run_metrics.end('dim_date', rows_out=len(DimDate))
+    print(f"- Création de DimDate (clés uniques : {len(DimDate)}, du {DimDate['Date'].min():%Y-%m-%d} au {DimDate['Date'].max():%Y-%m-%d}).")
+    return {'DimDate': DimDate}
 
-# Extrait toutes les dates uniques de la table Orders CONSOLIDÉE
-dates = pd.concat([
-    Orders_Combined['OrderDate'], # Utilise les commandes consolidées
-    Orders_Combined['RequiredDate'], # Utilise les commandes consolidées
-    Orders_Combined['ShippedDate'] # Utilise les commandes consolidées
-]).drop_duplicates().dropna().to_frame(name='DateKey')
-
-dates['DateKey'] = pd.to_datetime(dates['DateKey'])
-dates.rename(columns={'DateKey': 'Date'}, inplace=True)
-dates['DateKey'] = dates['Date'].dt.strftime('%Y%m%d').astype(int)
-
-# Création des attributs de temps (votre code est correct ici)
-dates['Year'] = dates['Date'].dt.year
-dates['Quarter'] = dates['Date'].dt.quarter
-dates['Month'] = dates['Date'].dt.month
-dates['Day'] = dates['Date'].dt.day
-dates['DayName'] = dates['Date'].dt.day_name()
-dates['MonthName'] = dates['Date'].dt.month_name()
-
-DimDate = dates[['DateKey', 'Date', 'Year', 'Quarter', 'Month', 'Day', 'DayName', 'MonthName']]
-print(f"- Création de DimDate (clés uniques : {len(DimDate)}).")
 
 # -----------------------------------------------------------------
 # 3.2 Création de la Dimension Clients (DimCustomers)
 # -----------------------------------------------------------------
+@etl_pipeline.stage('dim_customers', inputs=['consolidated', 'raw_tables'], outputs=['DimCustomers'])
+def build_dim_customers(consolidated, raw_tables):
+    run_metrics.start('dim_customers')
+    DimCustomers = reuse_previous('DimCustomers', ['Customers_SQL'], raw_tables)
+    if DimCustomers is None:
+        # >>> AJOUT MULTI-SOURCE : clients consolidés (un membre par (SourceSystem, CustomerID)) <<<
+        DimCustomers_Raw = consolidated['Customers']
+
+        # >>> CORRECTION KEYERROR : Ajoute la colonne Notes si elle manque (cas où Access échoue) <<<
+        # (assign : la table consolidée est partagée avec les autres étapes)
+        if 'Notes' not in DimCustomers_Raw.columns:
+            DimCustomers_Raw = DimCustomers_Raw.assign(Notes=None)
+
+        # Clé de substitution entière (CustomerID reste disponible comme clé naturelle)
+        DimCustomers_Raw = surrogate_keys.add_surrogate_key(
+            DimCustomers_Raw, key_registries['DimCustomers'], 'CustomerID', 'CustomerKey'
+        )
+        key_registries['DimCustomers'].save()
+
+        # Renommage et sélection des colonnes (utilise DimCustomers_Raw)
+        DimCustomers = DimCustomers_Raw.rename(columns={
+            'ContactName': 'CustomerContactName',
+            'CompanyName': 'CustomerCompanyName',
+            'Country': 'CustomerCountry',
+            'City': 'CustomerCity',
+            'Notes': 'CustomerNotes'
+        })
+
+        # Nettoyage et sélection des attributs
+        DimCustomers = DimCustomers[[
+            'CustomerKey', 'CustomerID', 'SourceSystem', 'CustomerCompanyName', 'CustomerContactName',
+            'CustomerCountry', 'CustomerCity', 'CustomerNotes'
+        ]]
+        DimCustomers = schema.enforce(DimCustomers, 'DimCustomers', dw_memory)
+    run_metrics.end('dim_customers', rows_out=len(DimCustomers))
+    print(f"- Création de DimCustomers ({len(DimCustomers)} lignes).")
+    return {'DimCustomers': DimCustomers}
 
-# >>> AJOUT MULTI-SOURCE : CONCATENATION <<<
-if 'Customers_Access' in data_access:
-    customers_sql = data['Customers_SQL'].copy()
-    customers_access = data_access['Customers_Access'].copy()
-    
-    # CONCATÉNATION et SUPPRESSION des doublons (priorité à SQL Server)
-    DimCustomers_Raw = pd.concat([customers_sql, customers_access]).drop_duplicates(subset=['CustomerID'], keep='first')
-    print(f"  - Clients consolidés : {len(DimCustomers_Raw)} lignes.")
-else:
-    DimCustomers_Raw = data['Customers_SQL'].copy()
-    print("  - Utilisation uniquement des clients SQL Server.")
-
-# >>> CORRECTION KEYERROR : Ajoute la colonne Notes si elle manque (cas où Access échoue) <<<
-if 'Notes' not in DimCustomers_Raw.columns:
-    DimCustomers_Raw['Notes'] = None 
-
-# Renommage et sélection des colonnes (utilise DimCustomers_Raw)
-DimCustomers = DimCustomers_Raw.rename(columns={
-    'CustomerID': 'CustomerKey',
-    'ContactName': 'CustomerContactName',
-    'CompanyName': 'CustomerCompanyName',
-    'Country': 'CustomerCountry',
-    'City': 'CustomerCity',
-    'Notes': 'CustomerNotes'
-})
-
-# Nettoyage et sélection des attributs
-DimCustomers = DimCustomers[[
-    'CustomerKey', 'CustomerCompanyName', 'CustomerContactName', 
-    'CustomerCountry', 'CustomerCity', 'CustomerNotes'
-]]
-print(f"- Création de DimCustomers ({len(DimCustomers)} lignes).")
 
 # -----------------------------------------------------------------
 # 3.3 Création de la Dimension Produits (DimProducts)
 # -----------------------------------------------------------------
+@etl_pipeline.stage('dim_products', inputs=['consolidated', 'raw_tables'], outputs=['DimProducts'])
+def build_dim_products(consolidated, raw_tables):
+    run_metrics.start('dim_products')
+    DimProducts = reuse_previous('DimProducts', ['Products', 'Categories'], raw_tables)
+    if DimProducts is None:
+        # >>> AJOUT MULTI-SOURCE : produits consolidés (un membre par (SourceSystem, ProductID)) <<<
+        DimProducts_Raw = surrogate_keys.add_surrogate_key(
+            consolidated['Products'], key_registries['DimProducts'], 'ProductID', 'ProductKey'
+        )
+        key_registries['DimProducts'].save()
 
-# >>> AJOUT MULTI-SOURCE : CONCATENATION PRODUITS <<<
-if 'Products_Access' in data_access:
-    products_sql = data['Products'].copy()
-    products_access = data_access['Products_Access'].copy()
-    
-    # CONCATÉNATION et SUPPRESSION des doublons (priorité à SQL Server)
-    DimProducts_Raw = pd.concat([products_sql, products_access]).drop_duplicates(subset=['ProductID'], keep='first')
-    print(f"  - Produits consolidés : {len(DimProducts_Raw)} lignes.")
-else:
-    DimProducts_Raw = data['Products'].copy()
-    print("  - Utilisation uniquement des produits SQL Server.")
-    
-# Fusion DimProducts_Raw (consolidée) et Categories (issue de SQL Server)
-DimProducts = DimProducts_Raw.merge(
-    data['Categories'], # Categories n'est pas dans Access, donc on utilise SQL
-    on='CategoryID', 
-    how='left'
-)
+        # Fusion DimProducts_Raw (consolidée) et Categories (issue de SQL Server)
+        DimProducts = DimProducts_Raw.merge(
+            raw_tables['Categories'], # Categories n'est pas dans Access, donc on utilise SQL
+            on='CategoryID',
+            how='left'
+        )
 
-# Renommage et sélection des colonnes (votre code est correct)
-DimProducts.rename(columns={
-    'ProductID': 'ProductKey',
-    'ProductName': 'ProductName',
-    'CategoryName': 'CategoryName',
-    'UnitsInStock': 'UnitsInStock',
-    'UnitPrice': 'StandardPrice'
-}, inplace=True)
+        # Renommage et sélection des colonnes (votre code est correct)
+        DimProducts.rename(columns={
+            'ProductName': 'ProductName',
+            'CategoryName': 'CategoryName',
+            'UnitsInStock': 'UnitsInStock',
+            'UnitPrice': 'StandardPrice'
+        }, inplace=True)
 
-# Sélection des attributs
-DimProducts = DimProducts[[
-    'ProductKey', 'ProductName', 'CategoryName', 'StandardPrice', 'UnitsInStock'
-]]
-print(f"- Création de DimProducts ({len(DimProducts)} lignes).")
+        # Sélection des attributs
+        DimProducts = DimProducts[[
+            'ProductKey', 'ProductID', 'SourceSystem', 'ProductName', 'CategoryName', 'StandardPrice', 'UnitsInStock'
+        ]]
+        DimProducts = schema.enforce(DimProducts, 'DimProducts', dw_memory)
+    run_metrics.end('dim_products', rows_out=len(DimProducts))
+    print(f"- Création de DimProducts ({len(DimProducts)} lignes).")
+    return {'DimProducts': DimProducts}
 
 
 # -----------------------------------------------------------------
@@ -352,226 +565,503 @@ print(f"- Création de DimProducts ({len(DimProducts)} lignes).")
 # -----------------------------------------------------------------
 
 # DimEmployees (Non affecté par Access dans notre plan)
-DimEmployees = data['Employees'].rename(columns={'EmployeeID': 'EmployeeKey'})
-DimEmployees = DimEmployees[['EmployeeKey', 'LastName', 'FirstName', 'Title', 'City', 'Country']]
-print(f"- Création de DimEmployees ({len(DimEmployees)} lignes).")
+@etl_pipeline.stage('dim_employees', inputs=['raw_tables'], outputs=['DimEmployees'])
+def build_dim_employees(raw_tables):
+    run_metrics.start('dim_employees', rows_in=len(raw_tables['Employees']))
+    DimEmployees = reuse_previous('DimEmployees', ['Employees'], raw_tables)
+    if DimEmployees is None:
+        DimEmployees = surrogate_keys.add_surrogate_key(
+            raw_tables['Employees'].assign(SourceSystem='SQL'), key_registries['DimEmployees'], 'EmployeeID', 'EmployeeKey'
+        )
+        key_registries['DimEmployees'].save()
+        DimEmployees = DimEmployees[['EmployeeKey', 'EmployeeID', 'SourceSystem', 'LastName', 'FirstName', 'Title', 'City', 'Country']]
+        DimEmployees = schema.enforce(DimEmployees, 'DimEmployees', dw_memory)
+    run_metrics.end('dim_employees', rows_out=len(DimEmployees))
+    print(f"- Création de DimEmployees ({len(DimEmployees)} lignes).")
+    return {'DimEmployees': DimEmployees}
+
 
 # DimShippers (Non affecté par Access dans notre plan)
-DimShippers = data['Shippers'].rename(columns={'ShipperID': 'ShipperKey', 'CompanyName': 'ShipperCompanyName'})
-DimShippers = DimShippers[['ShipperKey', 'ShipperCompanyName']]
-print(f"- Création de DimShippers ({len(DimShippers)} lignes).")
-
-# >>> AJOUT MULTI-SOURCE : CONCATENATION FOURNISSEURS <<<
-if 'Suppliers_Access' in data_access:
-    suppliers_sql = data['Suppliers'].copy()
-    suppliers_access = data_access['Suppliers_Access'].copy()
-    
-    # CONCATÉNATION et SUPPRESSION des doublons (priorité à SQL Server)
-    DimSuppliers_Raw = pd.concat([suppliers_sql, suppliers_access]).drop_duplicates(subset=['SupplierID'], keep='first')
-    print(f"  - Fournisseurs consolidés : {len(DimSuppliers_Raw)} lignes.")
-else:
-    DimSuppliers_Raw = data['Suppliers'].copy()
-    print("  - Utilisation uniquement des fournisseurs SQL Server.")
-
-DimSuppliers = DimSuppliers_Raw.rename(columns={'SupplierID': 'SupplierKey', 'CompanyName': 'SupplierCompanyName'})
-DimSuppliers = DimSuppliers[['SupplierKey', 'SupplierCompanyName', 'Country']]
-print(f"- Création de DimSuppliers ({len(DimSuppliers)} lignes).")
+@etl_pipeline.stage('dim_shippers', inputs=['raw_tables'], outputs=['DimShippers'])
+def build_dim_shippers(raw_tables):
+    run_metrics.start('dim_shippers', rows_in=len(raw_tables['Shippers']))
+    DimShippers = reuse_previous('DimShippers', ['Shippers'], raw_tables)
+    if DimShippers is None:
+        DimShippers = surrogate_keys.add_surrogate_key(
+            raw_tables['Shippers'].assign(SourceSystem='SQL'), key_registries['DimShippers'], 'ShipperID', 'ShipperKey'
+        )
+        key_registries['DimShippers'].save()
+        DimShippers = DimShippers.rename(columns={'CompanyName': 'ShipperCompanyName'})
+        DimShippers = DimShippers[['ShipperKey', 'ShipperID', 'SourceSystem', 'ShipperCompanyName']]
+        DimShippers = schema.enforce(DimShippers, 'DimShippers', dw_memory)
+    run_metrics.end('dim_shippers', rows_out=len(DimShippers))
+    print(f"- Création de DimShippers ({len(DimShippers)} lignes).")
+    return {'DimShippers': DimShippers}
+
+
+@etl_pipeline.stage('dim_suppliers', inputs=['consolidated'], outputs=['DimSuppliers'])
+def build_dim_suppliers(consolidated):
+    run_metrics.start('dim_suppliers')
+    # Non exportée dans la couche CLEAN : toujours reconstruite (table minuscule)
+    # >>> AJOUT MULTI-SOURCE : fournisseurs consolidés (un membre par (SourceSystem, SupplierID)) <<<
+    DimSuppliers_Raw = surrogate_keys.add_surrogate_key(
+        consolidated['Suppliers'], key_registries['DimSuppliers'], 'SupplierID', 'SupplierKey'
+    )
+    key_registries['DimSuppliers'].save()
+    DimSuppliers = DimSuppliers_Raw.rename(columns={'CompanyName': 'SupplierCompanyName'})
+    DimSuppliers = DimSuppliers[['SupplierKey', 'SupplierID', 'SourceSystem', 'SupplierCompanyName', 'Country']]
+    DimSuppliers = schema.enforce(DimSuppliers, 'DimSuppliers', dw_memory)
+    run_metrics.end('dim_suppliers', rows_out=len(DimSuppliers))
+    print(f"- Création de DimSuppliers ({len(DimSuppliers)} lignes).")
+    return {'DimSuppliers': DimSuppliers}
 
 
 # -----------------------------------------------------------------
 # 3.5 Création de la Table de Faits (FactSales)
 # -----------------------------------------------------------------
+@etl_pipeline.stage('fact_sales',
+                    inputs=['consolidated', 'sql_deltas', 'access_deltas',
+                            'DimCustomers', 'DimProducts', 'DimEmployees', 'DimShippers'],
+                    outputs=['FactSales_Built'])
+def build_fact_sales(consolidated, sql_deltas, access_deltas, **dimensions):
+    # `dimensions` : non lues ici, mais leurs clés de substitution doivent être
+    # dans les registres avant la résolution des clés de FactSales.
+
+    # Commandes et détails consolidés (colonne SourceSystem) : une commande ou une ligne de
+    # détail présente dans les deux sources n'est gardée qu'une fois, SQL Server prioritaire.
+    # La source de chaque commande sert à résoudre les clés de dimension de la ligne de faits.
+    Orders_Combined = consolidated['Orders']
+    OrderDetails_Combined = consolidated['OrderDetails']
+    print(f"  - Commandes consolidées : {len(Orders_Combined)}, détails : {len(OrderDetails_Combined)}.")
+
+    run_metrics.start('fact_sales', rows_in=len(OrderDetails_Combined))
+
+    # >>> MODE INCRÉMENTAL : seules les commandes touchées par le delta sont reconstruites <<<
+    if INCREMENTAL_RUN:
+        order_ids_delta = incremental.delta_order_ids({**sql_deltas, **access_deltas})
+        OrderDetails_Fact = OrderDetails_Combined[OrderDetails_Combined['OrderID'].isin(order_ids_delta)]
+        print(f"  - Mode incrémental : {len(order_ids_delta)} commandes touchées par le delta.")
+    else:
+        OrderDetails_Fact = OrderDetails_Combined
+
+    # Jointure, montants, clés de date et de substitution (scripts/fact_builder.py) :
+    # par plages d'OrderID dans un pool de processus si le volume le justifie
+    FactSales = fact_builder.build_fact_sales(
+        OrderDetails_Fact, Orders_Combined, key_registries, workers=args.fact_workers, report=dw_memory
+    )
+    if args.verify_fact_build:
+        FactSales_Serial = fact_builder.build(OrderDetails_Fact, Orders_Combined, key_registries)
+        if fact_builder.checksum(FactSales) != fact_builder.checksum(FactSales_Serial):
+            raise RuntimeError("FactSales différent du chemin série en mémoire (checksums différents)")
+        print(f"  ✅ Checksum FactSales identique au chemin série ({fact_builder.checksum(FactSales)[:16]}).")
+    run_metrics.end('fact_sales', rows_out=len(FactSales))
+    print(f"- Création de FactSales ({len(FactSales)} lignes).")
+    return {'FactSales_Built': FactSales}
 
-# ⚠️ CORRECTION : Renommer la colonne UnitPrice dans OrderDetails avant la jointure
-# (Utilise OrderDetails_Combined)
-OrderDetails_Combined.rename(columns={'UnitPrice': 'SaleUnitPrice'}, inplace=True)
-
-# Jointure des Orders et OrderDetails CONSOLIDÉS
-FactSales = OrderDetails_Combined.merge(
-    Orders_Combined, # Utilise les commandes consolidées
-    on='OrderID',
-    how='left'
-)
-
-# Calcul du prix unitaire total après remise
-FactSales['SalesAmount'] = FactSales['Quantity'] * FactSales['SaleUnitPrice'] * (1 - FactSales['Discount'])
-
-# Jointure des clés de date (Conversion des dates en clés entières)
-# Le reste de votre code de jointure des clés est correct, il est important qu'il soit après la fusion.
-
-FactSales = FactSales.merge(
-    DimDate[['Date', 'DateKey']], 
-    left_on='OrderDate', 
-    right_on='Date', 
-    how='left'
-).rename(columns={'DateKey': 'OrderDateKey'}).drop(columns=['Date'])
-
-FactSales = FactSales.merge(
-    DimDate[['Date', 'DateKey']], 
-    left_on='ShippedDate', 
-    right_on='Date', 
-    how='left'
-).rename(columns={'DateKey': 'ShippedDateKey'}).drop(columns=['Date'])
-
-# --- CORRECTION : Renommer les colonnes pour correspondre au schéma cible ---
-FactSales.rename(columns={
-    'ShipVia': 'ShipperID', 
-    'Quantity': 'OrderQuantity',
-    # Note : 'SaleUnitPrice' a déjà été renommé au début du bloc.
-    # Note : Assurez-vous que les colonnes CustomerID, EmployeeID, ProductID sont présentes.
-}, inplace=True)
-
-# Sélection finale des colonnes de la Fact table
-# N.B. : Il manque la colonne SupplierID dans la Fact Table si elle n'est pas dans OrderDetails ou Orders. 
-# Je suppose que votre Fact Table est correcte avec les colonnes listées.
-FactSales = FactSales[[
-    'OrderID', 
-    'CustomerID', 
-    'EmployeeID', 
-    'ShipperID', 
-    'ProductID', 
-    'OrderDateKey', 
-    'ShippedDateKey',
-    'OrderQuantity', 
-    'SaleUnitPrice', 
-    'Discount', 
-    'SalesAmount', 
-    'Freight'
-]]
-
-print(f"- Création de FactSales ({len(FactSales)} lignes).")
-print("--- Transformation (T) terminée ---")
-# =================================================================
-# ÉTAPE : Exportation des DataFrames (CSV)
-# =================================================================
-print("\n--- Démarrage de l'Exportation des fichiers ---")
-
-# Définition du chemin du dossier de sortie (assurez-vous qu'il existe)
-OUTPUT_DIR = 'data/clean/' # Si vous voulez un sous-dossier, sinon utilisez 'data/'
-
-# Crée le dossier s'il n'existe pas
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# -----------------------------------------------------------------
+# 3.6 Contrôle qualité de FactSales (avant agrégats, export et chargement)
+# -----------------------------------------------------------------
+@etl_pipeline.stage('validate_fact_sales',
+                    inputs=['FactSales_Built', 'DimDate', 'DimCustomers', 'DimProducts',
+                            'DimEmployees', 'DimShippers'],
+                    outputs=['FactSales'])
+def validate_fact_sales(FactSales_Built, **dimensions):
+    # Clés orphelines, dates sans DimDate, doublons (OrderID, ProductKey), nulls et plages
+    # (scripts/quality.py) ; en quarantaine, les lignes fautives ne vont ni dans les
+    # agrégats, ni dans la couche CLEAN, ni dans le DW.
+    run_metrics.start('validate_fact_sales', rows_in=len(FactSales_Built))
+    FactSales = quality.gate(
+        FactSales_Built, 'FactSales', quality.FACT_SALES_RULES, dimensions,
+        action=args.quality_action, sample=args.quality_sample,
+        run_id=run_metrics.run_id, fmt=EXPORT_FORMAT,
+    )
+    run_metrics.end('validate_fact_sales', rows_out=len(FactSales))
+    return {'FactSales': FactSales}
 
-# Définition d'un dictionnaire des DataFrames à exporter
-dfs_to_export = {
-    'DimDate': DimDate,
-    'DimCustomers': DimCustomers,
-    'DimProducts': DimProducts,
-    'DimEmployees': DimEmployees,
-    'DimShippers': DimShippers,
-    'FactSales': FactSales
-}
 
-for name, df in dfs_to_export.items():
-    file_path = os.path.join(OUTPUT_DIR, f'{name}.csv')
-    try:
-        df.to_csv(
-            file_path,
-            index=False, # Important : N'inclut pas l'index de Pandas
-            sep=';',     # Utilisation du point-virgule comme séparateur pour la lisibilité
-            encoding='utf-8'
+# -----------------------------------------------------------------
+# 3.7 FactSales complet et tables d'agrégats
+# -----------------------------------------------------------------
+@etl_pipeline.stage('aggregates', inputs=['FactSales', 'DimProducts', 'DimCustomers'],
+                    outputs=['FactSales_Full', 'aggregate_tables'])
+def build_aggregates(FactSales, DimProducts, DimCustomers):
+    # En mode incrémental, FactSales ne contient que le delta : on le fusionne dans l'export existant
+    FactSales_Full = FactSales
+    FactSales_Replaced = FactSales.iloc[:0]
+    if INCREMENTAL_RUN and storage.table_exists(OUTPUT_DIR, 'FactSales'):
+        FactSales_Previous = storage.read_table(OUTPUT_DIR, 'FactSales')
+        is_replaced = FactSales_Previous['OrderID'].isin(FactSales['OrderID'])
+        # Anciennes versions des commandes rechargées (retirées des agrégats)
+        FactSales_Replaced = FactSales_Previous[is_replaced]
+        FactSales_Full = pd.concat([FactSales_Previous[~is_replaced], FactSales], ignore_index=True)
+
+    # Tables d'agrégats : mises à jour avec le seul delta si les agrégats du run précédent existent
+    run_metrics.start('aggregates', rows_in=len(FactSales))
+    group_attributes = aggregates.group_attributes(DimProducts, DimCustomers)
+    previous_aggregates = aggregates.load_previous(group_attributes) if INCREMENTAL_RUN else {}
+    if previous_aggregates:
+        aggregate_base, aggregate_tables = aggregates.build(
+            aggregates.enrich(FactSales, group_attributes),
+            aggregates.enrich(FactSales_Replaced, group_attributes),
+            previous_aggregates,
         )
-        print(f"  - Exportation de {name}.csv réussie.")
-    except Exception as e:
-        print(f"  ❌ Échec de l'exportation de {name}.csv: {e}")
-
-print("--- Exportation des fichiers terminée ---")
+        print(f"  - Agrégats mis à jour de façon incrémentale ({len(FactSales)} lignes ajoutées, {len(FactSales_Replaced)} retirées).")
+    else:
+        aggregate_base, aggregate_tables = aggregates.build(
+            aggregates.enrich(FactSales_Full, group_attributes)
+        )
+        print(f"  - Agrégats reconstruits à partir de FactSales ({len(FactSales_Full)} lignes).")
+    # Esquisses HyperLogLog (commandes et clients distincts) : seuls les mois touchés par le delta sont reconstruits
+    previous_sketches = sketches.load_previous() if previous_aggregates else None
+    if previous_sketches is not None:
+        months = pd.concat([FactSales['OrderDateKey'], FactSales_Replaced['OrderDateKey']]) // 100
+        touched = (FactSales_Full['OrderDateKey'] // 100).isin(months.unique())
+        sales_sketches = sketches.refresh(
+            previous_sketches, aggregates.enrich(FactSales_Full[touched], group_attributes), months.unique()
+        )
+    else:
+        sales_sketches = sketches.build(aggregates.enrich(FactSales_Full, group_attributes))
+    aggregate_tables.update(sales_sketches)
+    # Sauvegardés avec la couche CLEAN : les deux restent cohérents même si le chargement échoue
+    aggregates.save(aggregate_base, group_attributes)
+    sketches.save(sales_sketches)
+    run_metrics.end('aggregates', rows_out=sum(len(df) for df in aggregate_tables.values()))
+    return {'FactSales_Full': FactSales_Full, 'aggregate_tables': aggregate_tables}
 
 
 # =================================================================
-# ÉTAPE SUIVANTE : Le Chargement (L) dans le Data Warehouse...
+# ÉTAPE : Exportation des DataFrames (couche CLEAN)
 # =================================================================
+@etl_pipeline.stage('export_clean', inputs=['DimDate', 'DimCustomers', 'DimProducts', 'DimEmployees',
+                                            'DimShippers', 'FactSales_Full', 'aggregate_tables'])
+def export_clean(DimDate, DimCustomers, DimProducts, DimEmployees, DimShippers, FactSales_Full, aggregate_tables):
+    print("\n--- Démarrage de l'Exportation des fichiers ---")
+    run_metrics.start('export_clean')
+
+    # Crée le dossier de sortie (OUTPUT_DIR) s'il n'existe pas
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    # Définition d'un dictionnaire des DataFrames à exporter
+    dfs_to_export = {
+        'DimDate': DimDate,
+        'DimCustomers': DimCustomers,
+        'DimProducts': DimProducts,
+        'DimEmployees': DimEmployees,
+        'DimShippers': DimShippers,
+        'FactSales': FactSales_Full,
+        **aggregate_tables,
+    }
+
+    for name, df in dfs_to_export.items():
+        if export_unchanged('clean', OUTPUT_DIR, name, df):
+            continue
+        try:
+            # FactSales / DimDate : un row group Parquet par année-mois de commande
+            storage.write_table(df, OUTPUT_DIR, name, EXPORT_FORMAT)
+            manifest.record('clean', name, manifest.fingerprint(df))
+            print(f"  - Exportation de {name} ({EXPORT_FORMAT}) réussie.")
+        except Exception as e:
+            print(f"  ❌ Échec de l'exportation de {name}: {e}")
+
+    run_metrics.end('export_clean', rows_out=sum(len(df) for df in dfs_to_export.values()))
+    print("--- Exportation des fichiers terminée ---")
+
 
 # =================================================================
 # ÉTAPE FINALE : Le Chargement (L) dans le Data Warehouse (NorthwindDW)
 # =================================================================
 
 # --- 1. DÉFINITION DE LA CONNEXION CIBLE ---
-SQL_DW_SERVER = r'DESKTOP-F8N2M8C\SQLEXPRESS' 
-SQL_DW_DATABASE = 'NorthwindDW' 
-SQL_DW_DRIVER = 'ODBC Driver 17 for SQL Server' 
+SQL_DW_SERVER = r'DESKTOP-F8N2M8C\SQLEXPRESS'
+SQL_DW_DATABASE = 'NorthwindDW'
+SQL_DW_DRIVER = 'ODBC Driver 17 for SQL Server'
 
 # Chaîne de connexion SQLAlchemy
 SQL_DW_CONN_STRING = f'mssql+pyodbc://{SQL_DW_SERVER}/{SQL_DW_DATABASE}?driver={SQL_DW_DRIVER}'
 
-# --- 2. CRÉATION DU MOTEUR ET CONNEXION ---
-print("\n--- Démarrage du Chargement (L) ---")
-
-try:
-    sql_dw_engine = create_engine(SQL_DW_CONN_STRING)
-    print(f"Tentative de connexion au Data Warehouse: {SQL_DW_DATABASE}")
-    sql_dw_engine.connect()
-    print("✅ Connexion au Data Warehouse réussie.")
-except Exception as e:
-    print(f"❌ Échec de la connexion au Data Warehouse. Veuillez vérifier les paramètres: {e}")
-    # Vous pouvez ajouter 'import sys; sys.exit()' ici si vous voulez stopper l'exécution
-    # Si la connexion échoue, le script ne peut pas continuer.
-    
-    
-# --- 3. CHARGEMENT DES TABLES (Dimensions et Faits) ---
-
-# Liste des DataFrames à charger (SANS FactSales)
-tables_a_charger = {
-    'DimDate': DimDate, 
-    'DimCustomers': DimCustomers, 
-    'DimProducts': DimProducts,
-    'DimEmployees': DimEmployees,
-    'DimShippers': DimShippers,
-    'DimSuppliers': DimSuppliers
-}
+# Cible du chargement : une empreinte 'loaded' ne vaut que pour ce Data Warehouse
+DW_TARGET = f'sqlite:///{args.dw_sqlite}' if args.dw_sqlite else SQL_DW_CONN_STRING
+
+# Moteur et chargeur créés au premier chargement (les étapes de chargement s'enchaînent)
+dw_connection = {}
+
+
+def connect_dw():
+    """(moteur SQLAlchemy, chargeur en masse) du Data Warehouse."""
+    if not dw_connection:
+        print("\n--- Démarrage du Chargement (L) ---")
+        sql_dw_engine = create_engine(DW_TARGET)
+        print(f"Tentative de connexion au Data Warehouse: {SQL_DW_DATABASE}")
+        try:
+            sql_dw_engine.connect().close()
+        except Exception as e:
+            raise RuntimeError(f"Échec de la connexion au Data Warehouse. Veuillez vérifier les paramètres: {e}") from e
+        print("✅ Connexion au Data Warehouse réussie.")
+        print("  ℹ️  Les données consolidées (SQL + Access) seront chargées dans NorthwindDW")
+        dw_connection['engine'] = sql_dw_engine
+        # Backend de chargement en masse (executemany par lots + bascule par rename)
+        dw_connection['loader'] = bulk_load.get_loader(sql_dw_engine, batch_size=args.batch_size)
+    return dw_connection['engine'], dw_connection['loader']
+
+
+def load_unchanged(table_name, df):
+    """Vrai si `table_name` contient déjà exactement `df` (même contenu qu'au dernier
+    chargement réussi vers ce DW, table toujours présente)."""
+    sql_dw_engine, _ = connect_dw()
+    loaded = fingerprints.combine([DW_TARGET, manifest.fingerprint(df)])
+    if manifest.unchanged('loaded', table_name, loaded) and inspect(sql_dw_engine).has_table(table_name):
+        manifest.record('loaded', table_name, loaded)
+        manifest.skip('chargement', table_name, "contenu identique au dernier chargement")
+        return True
+    return False
+
+
+def record_loaded(table_name, df):
+    manifest.record('loaded', table_name, fingerprints.combine([DW_TARGET, manifest.fingerprint(df)]))
+
+
+# --- 2. CHARGEMENT DES TABLES (Dimensions et Faits) ---
+@etl_pipeline.stage('load_dimensions', inputs=['DimDate', 'DimCustomers', 'DimProducts', 'DimEmployees',
+                                               'DimShippers', 'DimSuppliers'],
+                    outputs=['dimensions_loaded'])
+def load_dimensions(**tables_a_charger):
+    _, loader = connect_dw()
+    # Boucle de chargement pour les Dimensions
+    # Upsert SCD Type 2 : seuls les membres nouveaux ou modifiés sont écrits (historique conservé)
+    run_time = pd.Timestamp.now().floor('s')
+    run_metrics.start('load_dimensions', rows_in=sum(len(df) for df in tables_a_charger.values()))
+    dimension_rows_written = 0
+    load_failures = []
+    for table_name, df in tables_a_charger.items():
+        if load_unchanged(table_name, df):
+            continue
+        try:
+            changes = scd.upsert_dimension(loader, df, table_name, scd.DIMENSION_KEYS[table_name], run_time,
+                                           close_missing=table_name in scd.SNAPSHOT_DIMENSIONS)
+            record_loaded(table_name, df)
+            dimension_rows_written += changes['inserted'] + changes['changed'] + changes['closed']
+            summary = (f"{changes['inserted']} nouveaux, {changes['changed']} modifiés, "
+                       f"{changes['unchanged']} inchangés, {changes['closed']} supprimés de la source")
+            # Message de confirmation pour les tables consolidées
+            if table_name in ('DimCustomers', 'DimProducts', 'DimSuppliers'):
+                print(f"  ✅ Chargement de {table_name} ({summary}) - Données consolidées SQL + Access")
+            else:
+                print(f"  ✅ Chargement de {table_name} ({summary}) réussi.")
+        except Exception as e:
+            print(f"  ❌ Échec du chargement de la table {table_name}: {e}")
+            load_failures.append(table_name)
+
+    run_metrics.end('load_dimensions', rows_out=dimension_rows_written)
+    # Les faits référencent les dimensions : l'étape échoue (et sera reprise) si l'une manque
+    if load_failures:
+        raise RuntimeError(f"Dimensions non chargées : {', '.join(load_failures)}")
+    return {'dimensions_loaded': list(tables_a_charger)}
 
-print("\n--- Démarrage du Chargement des tables ---")
-print("  ℹ️  Les données consolidées (SQL + Access) seront chargées dans NorthwindDW")
 
-# Boucle de chargement pour les Dimensions
-for table_name, df in tables_a_charger.items():
+# === CHARGEMENT DE FACTSALES SÉPARÉ (Plus sûr) ===
+@etl_pipeline.stage('load_fact_sales', inputs=['FactSales', 'FactSales_Full', 'dimensions_loaded'],
+                    outputs=['fact_sales_loaded'])
+def load_fact_sales(FactSales, FactSales_Full, dimensions_loaded):
+    sql_dw_engine, loader = connect_dw()
+    run_metrics.start('load_fact_sales', rows_in=len(FactSales))
+    # FactSales est créé à partir de Orders_Combined et OrderDetails_Combined (données consolidées SQL + Access)
+    if load_unchanged('FactSales', FactSales_Full):
+        pass
+    elif INCREMENTAL_RUN and FactSales.empty and inspect(sql_dw_engine).has_table('FactSales'):
+        # Le DW contient déjà toutes les lignes : rien à supprimer ni à insérer
+        record_loaded('FactSales', FactSales_Full)
+        manifest.skip('chargement', 'FactSales', "aucune commande nouvelle ou modifiée")
+    else:
+        try:
+            print(f"  - Chargement de la table FactSales dans STAGING ({len(FactSales)} lignes)...")
+            print(f"    ℹ️  FactSales contient les données consolidées : Orders (SQL + Access) et OrderDetails (SQL + Access)")
+            rows_per_sec = loader.load_staging(FactSales, 'FactSales_Staging', like='FactSales')
+            print(f"    ⏱️  Staging chargé par lots de {args.batch_size} : {rows_per_sec:,.0f} lignes/s")
+
+            # 2. Remplacement du contenu de la table de production par les données de staging
+            if INCREMENTAL_RUN:
+                # Mode incrémental : le staging ne contient que le delta, on ne remplace que ces commandes
+                with sql_dw_engine.begin() as connection:
+                    connection.execute(text(
+                        "DELETE FROM FactSales WHERE OrderID IN (SELECT DISTINCT OrderID FROM FactSales_Staging);"
+                    ))
+                    connection.execute(text("INSERT INTO FactSales SELECT * FROM FactSales_Staging;"))
+            else:
+                # Rechargement complet : la staging DEVIENT FactSales (rename, aucune ligne recopiée)
+                loader.swap('FactSales_Staging', 'FactSales')
+
+            print(f"  ✅ Chargement de la table FactSales ({len(FactSales)} lignes) réussi via Staging.")
+            print(f"    ✅ Données consolidées SQL + Access chargées dans NorthwindDW")
+            record_loaded('FactSales', FactSales_Full)
+
+        except Exception as e:
+            run_metrics.end('load_fact_sales', rows_out=0)
+            raise RuntimeError(f"Échec du chargement de la table FactSales: {e}") from e
+    run_metrics.end('load_fact_sales', rows_out=len(FactSales))
+    return {'fact_sales_loaded': len(FactSales)}
+
+
+# === CHARGEMENT DES TABLES D'AGRÉGATS (petites tables, remplacées en entier) ===
+@etl_pipeline.stage('load_aggregates', inputs=['aggregate_tables', 'fact_sales_loaded'],
+                    outputs=['aggregates_loaded'])
+def load_aggregates(aggregate_tables, fact_sales_loaded):
+    _, loader = connect_dw()
+    run_metrics.start('load_aggregates')
+    load_failures = []
+    for table_name, df in aggregate_tables.items():
+        if load_unchanged(table_name, df):
+            continue
+        try:
+            loader.replace_table(df, table_name)
+            record_loaded(table_name, df)
+            print(f"  ✅ Chargement de {table_name} ({len(df)} lignes) réussi.")
+        except Exception as e:
+            print(f"  ❌ Échec du chargement de la table {table_name}: {e}")
+            load_failures.append(table_name)
+    run_metrics.end('load_aggregates', rows_out=sum(len(df) for df in aggregate_tables.values()))
+    if load_failures:
+        raise RuntimeError(f"Agrégats non chargés : {', '.join(load_failures)}")
+    return {'aggregates_loaded': list(aggregate_tables)}
+
+
+# === VERSION DE CHARGEMENT (invalide le cache de requêtes du notebook si le contenu a changé) ===
+@etl_pipeline.stage('load_version', inputs=['DimDate', 'DimCustomers', 'DimProducts', 'DimEmployees',
+                                            'DimShippers', 'DimSuppliers', 'FactSales_Full',
+                                            'aggregate_tables', 'aggregates_loaded'])
+def record_load_version(FactSales_Full, aggregate_tables, aggregates_loaded, **dimensions):
+    _, loader = connect_dw()
     try:
-        df.to_sql(
-            name=table_name, 
-            con=sql_dw_engine, 
-            if_exists='replace', # Écrase les tables à chaque exécution de l'ETL
-            index=False          # N'écrit pas l'index de Pandas
+        loaded_tables = {**dimensions, 'FactSales': FactSales_Full, **aggregate_tables}
+        version, is_new = load_version.record(
+            loader, {name: manifest.fingerprint(df) for name, df in loaded_tables.items()},
+            len(FactSales_Full),
         )
-        # Message de confirmation pour les tables consolidées
-        if table_name == 'DimCustomers':
-            print(f"  ✅ Chargement de {table_name} ({len(df)} lignes) - Données consolidées SQL + Access")
-        elif table_name == 'DimProducts':
-            print(f"  ✅ Chargement de {table_name} ({len(df)} lignes) - Données consolidées SQL + Access")
-        elif table_name == 'DimSuppliers':
-            print(f"  ✅ Chargement de {table_name} ({len(df)} lignes) - Données consolidées SQL + Access")
+        if is_new:
+            print(f"  ✅ Nouvelle version de chargement {version['load_version']} ({version['content_hash'][:12]}).")
         else:
-            print(f"  ✅ Chargement de {table_name} ({len(df)} lignes) réussi.")
+            print(f"  ℹ️  Contenu inchangé : version de chargement {version['load_version']} conservée.")
     except Exception as e:
-        print(f"  ❌ Échec du chargement de la table {table_name}: {e}")
+        print(f"  ⚠️  Version de chargement non enregistrée : {e}")
 
-# === CHARGEMENT DE FACTSALES SÉPARÉ (Plus sûr) ===
-# FactSales est créé à partir de Orders_Combined et OrderDetails_Combined (données consolidées SQL + Access)
-try:
-    print(f"  - Chargement de la table FactSales dans STAGING ({len(FactSales)} lignes)...")
-    print(f"    ℹ️  FactSales contient les données consolidées : Orders (SQL + Access) et OrderDetails (SQL + Access)")
-    FactSales.to_sql(
-        name='FactSales_Staging', 
-        con=sql_dw_engine, 
-        if_exists='replace', 
-        index=False
-    )
-    
-    # 2. Remplacement du contenu de la table de production par les données de staging
-    with sql_dw_engine.begin() as connection:
-        # Supprime toutes les lignes de FactSales
-        connection.execute(text("DELETE FROM FactSales;")) # Utilisez 'text' de sqlalchemy
-        
-        # Insère toutes les lignes de Staging dans FactSales
-        connection.execute(text("INSERT INTO FactSales SELECT * FROM FactSales_Staging;"))
-
-    print(f"  ✅ Chargement de la table FactSales ({len(FactSales)} lignes) réussi via Staging.")
-    print(f"    ✅ Données consolidées SQL + Access chargées dans NorthwindDW")
-    
-except Exception as e:
-    print(f"  ❌ Échec du chargement de la table FactSales: {e}")
-
-print("\n--- Chargement (L) terminé ---")
-
-# Assurez-vous d'ajouter from sqlalchemy import create_engine, text
-# en tête du script si 'text' n'est pas déjà importé.
\ No newline at end of file
+    print("\n--- Chargement (L) terminé ---")
+
+
+# =================================================================
+# ÉTAPE : Persistance des marques (watermarks) pour le prochain run
+# =================================================================
+# Les marques ne sont avancées qu'après un chargement réussi de FactSales : en cas
+# d'échec, le prochain run relira le même delta (la fusion par clé est idempotente).
+@etl_pipeline.stage('save_watermarks', inputs=['raw_data_sql', 'data_access', 'sql_watermarks',
+                                               'access_watermarks', 'fact_sales_loaded'])
+def save_watermarks(raw_data_sql, data_access, sql_watermarks, access_watermarks, fact_sales_loaded):
+    if REPLAY_VERSION:
+        # Rien n'a été extrait : aucune marque à enregistrer (effacées au début du rejeu)
+        print("ℹ️  Rejeu : marques d'extraction non enregistrées.")
+        return
+    new_watermarks = {**watermarks, **sql_watermarks, **access_watermarks}
+    extracted_frames = {**raw_data_sql, **data_access}
+    for table_name in incremental.INCREMENTAL_TABLES:
+        if table_name in extracted_frames:
+            incremental.save_snapshot(table_name, extracted_frames[table_name])
+        elif table_name in watermarks:
+            # Source indisponible ce run : on conserve l'ancienne marque
+            new_watermarks[table_name] = watermarks[table_name]
+        else:
+            new_watermarks.pop(table_name, None)
+    incremental.save_watermarks(new_watermarks)
+    print(f"✅ Marques d'extraction sauvegardées dans {incremental.WATERMARK_FILE}")
+
+
+# =================================================================
+# EXÉCUTION
+# =================================================================
+# Garde indispensable : les processus du pool de construction de FactSales
+# (scripts/fact_builder.py, démarrage « spawn ») réimportent ce script.
+if __name__ == '__main__':
+    if args.list_stages:
+        etl_pipeline.describe()
+        sys.exit(0)
+
+    if args.list_snapshots:
+        versions = snapshot.list_versions()
+        print("Instantanés des sources (rejeu : --replay VERSION) :" if versions else "Aucun instantané (lancez etl.py --snapshot).")
+        for version in versions:
+            info = snapshot.describe(version)
+            counts = {source: sum(t['rows'] for t in tables.values()) for source, tables in info['tables'].items()}
+            print(f"  - {version} (créé le {info['created_at']}) : "
+                  + ', '.join(f"{source} {len(info['tables'][source])} tables / {rows} lignes" for source, rows in counts.items()))
+        sys.exit(0)
+
+    if REPLAY_VERSION:
+        print(f"ℹ️  Mode --replay : sources relues depuis l'instantané {REPLAY_VERSION} "
+              f"(créé le {snapshot.describe(REPLAY_VERSION)['created_at']}), sans connexion à SQL Server ni Access.")
+        if os.path.exists(incremental.WATERMARK_FILE):
+            # La couche CLEAN, les agrégats et le DW vont refléter l'instantané : le
+            # prochain run sur les sources ne peut plus repartir des marques actuelles
+            incremental.save_watermarks({})
+            print("⚠️  Marques d'extraction effacées : le prochain run sur les sources sera complet.")
+    elif FULL_REFRESH:
+        print("ℹ️  Mode --full-refresh : extraction complète de l'historique.")
+    elif watermarks:
+        print(f"ℹ️  Mode incrémental : marques chargées depuis {incremental.WATERMARK_FILE}")
+
+    if STREAM_RAW:
+        # Les tables sont écrites par source (ex. Orders.csv + Orders_Access.csv) sans
+        # être gardées en mémoire : la consolidation et la transformation ne sont pas exécutées.
+        stream_sources()
+        print("\n✅ Extraction en flux terminée (mode --stream-raw, transformation non exécutée).")
+        metrics.write_report(run_metrics, args.regression_threshold)
+        sys.exit(0)
+
+    try:
+        selected_stages = etl_pipeline.select(args.stage, args.from_stage, args.to_stage)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    # Options qui changent le contenu des sorties : les points de contrôle d'un run
+    # lancé avec d'autres valeurs ne sont pas réutilisés
+    run_signature = {
+        'sqlite_sql': args.sqlite_sql, 'sqlite_access': args.sqlite_access, 'dw_sqlite': args.dw_sqlite,
+        'format': EXPORT_FORMAT, 'full_refresh': FULL_REFRESH, 'replay': REPLAY_VERSION,
+    }
+    if args.resume or selected_stages is not None:
+        # Run partiel : les empreintes des étapes non relancées restent valables
+        manifest.carry_over_all()
+
+    stage_workers = args.stage_workers
+    if args.trace_memory and stage_workers > 1:
+        # Pic tracemalloc global au processus : une étape à la fois pour l'attribuer
+        print("ℹ️  --trace-memory : étapes exécutées une par une (pic mémoire par étape exact)")
+        stage_workers = 1
+
+    try:
+        run_result = etl_pipeline.run(selected_stages, workers=stage_workers,
+                                      signature=run_signature, resume=args.resume,
+                                      checkpoint=args.checkpoint or args.resume or selected_stages is not None)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    if dw_memory:
+        schema.print_memory_report(dw_memory, "des tables du Data Warehouse")
+
+    # Manifeste des empreintes (base des étapes ignorées au prochain run), écrit
+    # aussi après un échec : la reprise ne refait pas les exports déjà écrits
+    manifest.save()
+    if manifest.skipped:
+        print(f"⏭️  {len(manifest.skipped)} étape(s) ignorée(s) car inchangée(s) (détail dans {manifest.path})")
+
+    # =================================================================
+    # ÉTAPE : Rapport de mesures du run (comparé au run précédent)
+    # =================================================================
+    metrics.write_report(run_metrics, args.regression_threshold)
+
+    if run_result['failed']:
+        print(f"\n❌ Étape(s) en échec : {', '.join(run_result['failed'])}"
+              + (f" ; non exécutées : {', '.join(run_result['not_run'])}" if run_result['not_run'] else "")
+              + ".\n   Après correction, reprenez le run avec : python scripts/etl.py --resume"
+              + ("" if args.checkpoint or args.resume or selected_stages is not None
+                 else " (sans --checkpoint, toutes les étapes seront refaites)"))
+        sys.exit(1)
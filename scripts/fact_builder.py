@@ -0,0 +1,213 @@
+# =================================================================
+# CONSTRUCTION DE FACTSALES (série ou parallèle par plages d'OrderID)
+# =================================================================
+# FactSales = OrderDetails ⨝ Orders, SalesAmount, clés de date, clés de
+# substitution, renommages et projection. Toutes ces opérations sont ligne à
+# ligne une fois la commande jointe : les lignes de détail peuvent donc être
+# découpées en plages d'OrderID (une commande entière par partition, avec ses
+# seules commandes), construites dans un pool de processus, puis recollées.
+#   - les registres de clés (lecture seule) sont transmis une fois à chaque
+#     worker à son démarrage, les partitions une fois par tâche ;
+#   - les plages sont découpées en nombre de lignes comparable (quantiles) ;
+#   - les lignes reprennent leur position d'origine : le résultat est
+#     identique, octet pour octet, au chemin série (voir checksum()).
+# En dessous de PARALLEL_MIN_ROWS lignes, le démarrage des processus coûte
+# plus qu'il ne rapporte : le chemin série est utilisé.
+#
+# Vérification (chemin série vs parallèle sur la couche RAW du dernier run) :
+#   python scripts/fact_builder.py --workers 8
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import consolidation
+import dim_date
+import schema
+import storage
+import surrogate_keys
+
+PARALLEL_MIN_ROWS = 200_000
+# Plusieurs partitions par worker : une partition lente ne bloque pas tout le pool
+PARTITIONS_PER_WORKER = 2
+RAW_DIR = 'data/raw/'
+
+FACT_COLUMNS = [
+    'OrderID',
+    'CustomerKey',
+    'EmployeeKey',
+    'ShipperKey',
+    'ProductKey',
+    'OrderDateKey',
+    'ShippedDateKey',
+    'OrderQuantity',
+    'SaleUnitPrice',
+    'Discount',
+    'SalesAmount',
+    'Freight'
+]
+
+
+def build(order_details, orders, key_registries, report=None):
+    """Chemin série : lignes de détail consolidées + commandes -> FactSales typé."""
+    # ⚠️ CORRECTION : Renommer la colonne UnitPrice dans OrderDetails avant la jointure
+    order_details = order_details.rename(columns={'UnitPrice': 'SaleUnitPrice'})
+
+    # Jointure des Orders et OrderDetails CONSOLIDÉS (la source retenue est celle de la commande)
+    fact = order_details.drop(columns=[consolidation.SOURCE_COLUMN]).merge(orders, on='OrderID', how='left')
+
+    # Calcul du prix unitaire total après remise
+    fact['SalesAmount'] = schema.line_amount(fact['Quantity'], fact['SaleUnitPrice'], fact['Discount'])
+
+    # Clés de date (AAAAMMJJ) calculées directement depuis les datetime64 :
+    # le calendrier étant contigu, chaque date a sa clé dans DimDate sans jointure.
+    fact['OrderDateKey'] = dim_date.date_keys(fact['OrderDate']).values
+    fact['ShippedDateKey'] = dim_date.date_keys(fact['ShippedDate']).values
+
+    # Clés de substitution résolues par recherche vectorisée dans les registres
+    # (source de la commande, clé naturelle) ; repli sur SQL Server si la source n'a pas ce membre.
+    fact_sources = fact['SourceSystem']
+    fact['CustomerKey'] = key_registries['DimCustomers'].lookup(fact_sources, fact['CustomerID'])
+    fact['EmployeeKey'] = key_registries['DimEmployees'].lookup(fact_sources, fact['EmployeeID'])
+    fact['ShipperKey'] = key_registries['DimShippers'].lookup(fact_sources, fact['ShipVia'])
+    fact['ProductKey'] = key_registries['DimProducts'].lookup(fact_sources, fact['ProductID'])
+
+    # Renommage vers le schéma cible et sélection finale des colonnes de la Fact table
+    fact = fact.rename(columns={'Quantity': 'OrderQuantity'})[FACT_COLUMNS]
+    return schema.enforce(fact, 'FactSales', report)
+
+
+# -----------------------------------------------------------------
+# Chemin parallèle
+# -----------------------------------------------------------------
+_worker_registries = None
+
+
+def _init_worker(key_registries):
+    global _worker_registries
+    _worker_registries = key_registries
+
+
+def _build_partition(order_details, orders):
+    report = {}
+    fact = build(order_details, orders, _worker_registries, report)
+    return fact, report.get('FactSales')
+
+
+def _order_ids(values):
+    # OrderID en float ; manquant -> -inf (partition 0, comme dans la jointure série NaN = NaN)
+    return pd.Series(values).astype('float64').to_numpy(na_value=-np.inf)
+
+
+def partition_cuts(order_ids, partitions):
+    """Bornes de plages d'OrderID contiguës de tailles comparables en lignes."""
+    values = _order_ids(order_ids)
+    present = np.sort(values[np.isfinite(values)])
+    if len(present) == 0 or partitions <= 1:
+        return np.array([])
+    return np.unique(present[(np.arange(1, partitions) * len(present)) // partitions])
+
+
+def partition_of(order_ids, cuts):
+    """Numéro de partition de chaque OrderID."""
+    return np.searchsorted(cuts, _order_ids(order_ids), side='right')
+
+
+def build_parallel(order_details, orders, key_registries, workers, report=None):
+    """Même résultat que build(), construit par plages d'OrderID dans `workers` processus."""
+    if not orders['OrderID'].is_unique:
+        # Jointure 1-n : les lignes d'une partition ne seraient plus repositionnables
+        print("  ⚠️  OrderID non unique dans Orders : construction de FactSales en série.")
+        return build(order_details, orders, key_registries, report)
+
+    cuts = partition_cuts(order_details['OrderID'], workers * PARTITIONS_PER_WORKER)
+    detail_parts = partition_of(order_details['OrderID'], cuts)
+    order_parts = partition_of(orders['OrderID'], cuts)
+    partitions = np.unique(detail_parts)
+    positions = [np.flatnonzero(detail_parts == p) for p in partitions]
+    detail_inputs = [order_details.iloc[rows] for rows in positions]
+    order_inputs = [orders[order_parts == p] for p in partitions]
+
+    # spawn : sûr même si d'autres étapes du pipeline tournent dans des threads (et seul mode sous Windows)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(partitions)), mp_context=context,
+                             initializer=_init_worker, initargs=(key_registries,)) as executor:
+        results = list(executor.map(_build_partition, detail_inputs, order_inputs))
+
+    fact = pd.concat([part for part, _ in results], ignore_index=True)
+    # Les lignes reprennent l'ordre des lignes de détail (celui du chemin série)
+    order = np.argsort(np.concatenate(positions), kind='stable')
+    fact = fact.iloc[order].reset_index(drop=True)
+    if report is not None:
+        memory = [m for _, m in results if m is not None]
+        report['FactSales'] = (sum(b for b, _ in memory), sum(a for _, a in memory))
+    return fact
+
+
+def build_fact_sales(order_details, orders, key_registries, workers=0, report=None):
+    """Parallèle si `workers` > 1 (0 = automatique selon le volume), sinon série."""
+    if workers == 0:
+        workers = (os.cpu_count() or 1) if len(order_details) >= PARALLEL_MIN_ROWS else 1
+    if workers <= 1 or len(order_details) == 0:
+        return build(order_details, orders, key_registries, report)
+    print(f"  - FactSales construit par plages d'OrderID sur {workers} processus.")
+    return build_parallel(order_details, orders, key_registries, workers, report)
+
+
+def checksum(df):
+    """Empreinte exacte d'une table : colonnes, types, valeurs et ordre des lignes."""
+    digest = hashlib.sha256()
+    digest.update(repr([(col, str(dtype)) for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def verify(order_details, orders, key_registries, workers):
+    """Construit FactSales en série puis en parallèle ; retourne
+    (lignes, {chemin: {'checksum', 'seconds'}}), le chemin série en premier."""
+    builders = {
+        'série': lambda: build(order_details, orders, key_registries),
+        'parallèle': lambda: build_parallel(order_details, orders, key_registries, workers),
+    }
+    results, rows = {}, 0
+    for label, builder in builders.items():
+        start = time.perf_counter()
+        fact = builder()
+        results[label] = {'checksum': checksum(fact), 'seconds': round(time.perf_counter() - start, 3)}
+        rows = len(fact)
+    return rows, results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Vérifie la construction parallèle de FactSales (checksum vs série)")
+    parser.add_argument('--raw-dir', default=RAW_DIR, help="Couche RAW du dernier run (défaut : %(default)s)")
+    parser.add_argument('--keys-dir', default=surrogate_keys.KEYS_DIR,
+                        help="Registres des clés de substitution (défaut : %(default)s)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Nombre de processus du chemin parallèle (défaut : %(default)s)")
+    args = parser.parse_args()
+
+    if not (storage.table_exists(args.raw_dir, 'Orders') and storage.table_exists(args.raw_dir, 'OrderDetails')):
+        parser.error(f"Orders / OrderDetails introuvables dans {args.raw_dir} : exécutez d'abord etl.py")
+    # Tables RAW consolidées (Orders, OrderDetails) retypées comme à l'extraction
+    orders = schema.enforce(storage.read_table(args.raw_dir, 'Orders'), 'Orders')
+    order_details = schema.enforce(storage.read_table(args.raw_dir, 'OrderDetails'), 'OrderDetails')
+    key_registries = {
+        dimension: surrogate_keys.KeyRegistry(dimension, args.keys_dir)
+        for dimension in ('DimCustomers', 'DimProducts', 'DimEmployees', 'DimShippers')
+    }
+
+    rows, results = verify(order_details, orders, key_registries, max(2, args.workers))
+    print(f"FactSales : {rows} lignes")
+    for label, result in results.items():
+        print(f"  - {label:<15} : {result['seconds']:.2f} s, checksum {result['checksum'][:16]}")
+    if len({result['checksum'] for result in results.values()}) > 1:
+        print("❌ Résultats différents selon le chemin de construction.")
+        raise SystemExit(1)
+    print("✅ Résultats identiques.")
@@ -0,0 +1,120 @@
+# =================================================================
+# EMPREINTES DE CONTENU ET MANIFESTE DU RUN (travail inchangé ignoré)
+# =================================================================
+# Chaque table extraite, exportée (RAW / CLEAN) ou chargée dans le DW reçoit
+# une empreinte de contenu rapide (hash vectorisé des lignes, insensible à
+# leur ordre et aux types physiques). Les empreintes sont conservées dans un
+# manifeste (data/state/manifest.json) ; au run suivant :
+#   - un export RAW/CLEAN dont l'empreinte n'a pas changé n'est pas réécrit ;
+#   - une dimension dont les entrées (et le code de l'ETL) n'ont pas changé
+#     est relue depuis la couche CLEAN au lieu d'être reconstruite ;
+#   - une table dont le contenu est celui du dernier chargement n'est pas
+#     rechargée dans le DW.
+# Chaque étape ignorée est affichée avec sa raison et listée dans le manifeste.
+
+import glob
+import hashlib
+import json
+import os
+import weakref
+
+import numpy as np
+import pandas as pd
+
+MANIFEST_FILE = 'data/state/manifest.json'
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def table_fingerprint(df):
+    """Empreinte d'une table, indépendante de l'ordre des lignes et des types
+    physiques (un Int32 relu en int64 ou en float donne la même empreinte)."""
+    normalized = pd.DataFrame({
+        col: (df[col].astype('float64') if pd.api.types.is_numeric_dtype(df[col].dtype)
+              else df[col].astype('string'))
+        for col in sorted(df.columns, key=str)
+    })
+    hashes = pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+    # Somme modulo 2^64 : insensible à l'ordre (FactSales incrémental = ancien + delta)
+    return f"{len(df)}:{','.join(map(str, normalized.columns))}:{int(hashes.sum(dtype=np.uint64)):016x}"
+
+
+def combine(parts):
+    """Empreinte unique d'une liste d'empreintes (entrées d'une transformation)."""
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+def code_fingerprint(directory=SCRIPTS_DIR):
+    """Empreinte du code de l'ETL : une modification des scripts invalide les
+    transformations mémorisées."""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(directory, '*.py'))):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """Empreintes du run précédent (lecture) et du run courant (écriture).
+
+    Sections : 'sources', 'raw', 'inputs', 'clean', 'loaded'.
+    """
+
+    def __init__(self, path=MANIFEST_FILE, use_previous=True):
+        self.path = path
+        self.previous = {}
+        if use_previous and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.previous = json.load(f)
+        self.current = {}
+        self.skipped = []
+        # id(DataFrame) -> empreinte : une table partagée entre plusieurs étapes
+        # (export, chargement) n'est hachée qu'une fois. Le cache ne garde pas
+        # la table en vie : l'entrée est retirée quand la table est libérée
+        # (weakref.finalize), avant que son id puisse être réutilisé.
+        self._fingerprints = {}
+
+    def fingerprint(self, df):
+        key = id(df)
+        fingerprint = self._fingerprints.get(key)
+        if fingerprint is None:
+            fingerprint = self._fingerprints[key] = table_fingerprint(df)
+            weakref.finalize(df, self._fingerprints.pop, key, None).atexit = False
+        return fingerprint
+
+    def previous_value(self, section, name):
+        return self.previous.get(section, {}).get(name)
+
+    def unchanged(self, section, name, fingerprint):
+        return fingerprint is not None and self.previous_value(section, name) == fingerprint
+
+    def record(self, section, name, fingerprint):
+        self.current.setdefault(section, {})[name] = fingerprint
+
+    def carry_over(self, section, name):
+        """Reprend l'empreinte du run précédent (étape ignorée, état inchangé)."""
+        value = self.previous_value(section, name)
+        if value is not None:
+            self.record(section, name, value)
+
+    def carry_over_all(self):
+        """Reprend toutes les empreintes du run précédent (run partiel ou reprise :
+        les étapes non relancées gardent leur état)."""
+        for section, values in self.previous.items():
+            if isinstance(values, dict):
+                self.current.setdefault(section, {}).update(values)
+
+    def skip(self, stage, name, reason):
+        self.skipped.append({'stage': stage, 'table': name, 'reason': reason})
+        print(f"  ⏭️  {name} : {reason} — étape {stage} ignorée.")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        manifest = {
+            **self.current,
+            'run_at': pd.Timestamp.now().floor('s').isoformat(),
+            'skipped': self.skipped,
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,175 @@
+# =================================================================
+# EXTRACTION INCRÉMENTALE (High-Water Mark)
+# =================================================================
+# Au lieu de relire tout l'historique à chaque exécution, on conserve pour
+# chaque table source volumineuse (Orders / Order Details) la valeur maximale
+# déjà extraite (OrderID, OrderDate ou une colonne rowversion si elle existe).
+# Seules les lignes au-delà de cette marque sont relues, puis fusionnées dans
+# l'instantané des extractions précédentes conservé dans STATE_DIR.
+#
+# Limite : avec une marque sur OrderID (pas de rowversion, cas des bases
+# Northwind), seules les NOUVELLES commandes sont captées. Une commande
+# modifiée, ou une ligne de détail ajoutée à une commande déjà extraite, a un
+# OrderID sous la marque et n'est pas relue : renseignez 'rowversion' (colonne
+# rowversion/timestamp ou date de modification) ou lancez --full-refresh.
+
+import json
+import os
+
+import pandas as pd
+
+# Dossier d'état (marques + instantanés des tables sources)
+STATE_DIR = 'data/state/'
+WATERMARK_FILE = os.path.join(STATE_DIR, 'watermarks.json')
+SNAPSHOT_DIR = os.path.join(STATE_DIR, 'sources')
+
+# Tables extraites en mode incrémental.
+# - 'table'     : nom de la table dans la source (tel qu'utilisé dans le FROM)
+# - 'watermark' : colonne croissante utilisée comme marque (OrderID, OrderDate...)
+# - 'rowversion': colonne rowversion/timestamp SQL Server si elle existe
+#                 (prioritaire : capte aussi les lignes MODIFIÉES)
+# - 'keys'      : clé logique pour fusionner le delta dans l'instantané
+# - 'order_id'  : colonne de la table portant le numéro de commande (nom
+#                 propre à la source, renommé OrderID à la consolidation)
+INCREMENTAL_TABLES = {
+    'Orders': {
+        'table': 'Orders', 'watermark': 'OrderID', 'rowversion': None,
+        'keys': ['OrderID'], 'order_id': 'OrderID',
+    },
+    'OrderDetails': {
+        'table': '"Order Details"', 'watermark': 'OrderID', 'rowversion': None,
+        'keys': ['OrderID', 'ProductID'], 'order_id': 'OrderID',
+    },
+    'Orders_Access': {
+        'table': 'Orders', 'watermark': 'Order ID', 'rowversion': None,
+        'keys': ['Order ID'], 'order_id': 'Order ID',
+    },
+    'OrderDetails_Access': {
+        'table': '"Order Details"', 'watermark': 'Order ID', 'rowversion': None,
+        'keys': ['ID'], 'order_id': 'Order ID',
+    },
+}
+
+
+def load_watermarks(path=WATERMARK_FILE):
+    """Charge les marques persistées ({} si aucune exécution précédente)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_watermarks(watermarks, path=WATERMARK_FILE):
+    """Écrit les marques de façon atomique (fichier temporaire + rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(watermarks, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _watermark_column(spec):
+    return spec['rowversion'] or spec['watermark']
+
+
+def build_incremental_query(spec, watermark):
+    """Construit la requête d'extraction (complète si aucune marque connue).
+
+    Retourne (requête, paramètres) ; les paramètres utilisent le style '?'
+    commun à pyodbc et sqlite3.
+    """
+    query = f"SELECT * FROM {spec['table']}"
+    if watermark is None:
+        return query, []
+    column = _watermark_column(spec)
+    value = watermark['value']
+    if spec['rowversion']:
+        # La rowversion est stockée en hexadécimal dans le fichier JSON
+        value = bytes.fromhex(value)
+    return f"{query} WHERE [{column}] > ?", [value]
+
+
+def next_watermark(spec, delta, previous):
+    """Calcule la nouvelle marque à partir du delta extrait."""
+    column = _watermark_column(spec)
+    if delta.empty or column not in delta.columns:
+        return previous
+    max_value = delta[column].dropna().max()
+    if pd.isna(max_value):
+        return previous
+    if isinstance(max_value, (bytes, bytearray)):
+        max_value = bytes(max_value).hex()
+    elif isinstance(max_value, pd.Timestamp):
+        max_value = max_value.isoformat()
+    elif hasattr(max_value, 'item'):
+        max_value = max_value.item()  # numpy -> type Python (sérialisable JSON)
+    return {'column': column, 'value': max_value}
+
+
+def load_snapshot(name, directory=SNAPSHOT_DIR):
+    """Charge l'instantané d'une table source (None s'il n'existe pas)."""
+    path = os.path.join(directory, f'{name}.pkl')
+    if not os.path.exists(path):
+        return None
+    # Pickle plutôt que CSV : conserve les types (dates, entiers) sans re-parsing
+    return pd.read_pickle(path)
+
+
+def save_snapshot(name, df, directory=SNAPSHOT_DIR):
+    os.makedirs(directory, exist_ok=True)
+    df.to_pickle(os.path.join(directory, f'{name}.pkl'))
+
+
+def merge_delta(snapshot, delta, keys):
+    """Fusionne le delta dans l'instantané : les lignes modifiées remplacent
+    les anciennes (keep='last'), les nouvelles sont ajoutées."""
+    if snapshot is None or snapshot.empty:
+        return delta.reset_index(drop=True)
+    if delta.empty:
+        return snapshot
+    # Un petit delta peut avoir des colonnes entièrement NULL (lues en 'object') :
+    # on reprend les types de l'instantané pour ne pas dégrader les dates/entiers.
+    for col in delta.columns.intersection(snapshot.columns):
+        # Catégorielles exclues : le cast ferait disparaître les valeurs nouvelles du delta
+        if isinstance(snapshot[col].dtype, pd.CategoricalDtype):
+            continue
+        if delta[col].dtype != snapshot[col].dtype:
+            try:
+                delta[col] = delta[col].astype(snapshot[col].dtype)
+            except (TypeError, ValueError):
+                pass
+    merged = pd.concat([snapshot, delta], ignore_index=True)
+    key_columns = [k for k in keys if k in merged.columns]
+    if key_columns:
+        merged.drop_duplicates(subset=key_columns, keep='last', inplace=True)
+    return merged.reset_index(drop=True)
+
+
+def extract_table(conn, name, watermarks, full_refresh=False):
+    """Extrait une table en mode incrémental.
+
+    Retourne (table_complète, delta, nouvelle_marque).
+    """
+    spec = INCREMENTAL_TABLES[name]
+    snapshot = None if full_refresh else load_snapshot(name)
+    # Sans instantané, une marque seule ne suffit pas : on repart de zéro
+    watermark = watermarks.get(name) if snapshot is not None else None
+    query, params = build_incremental_query(spec, watermark)
+    delta = pd.read_sql(query, conn, params=params or None)
+    full = merge_delta(snapshot, delta, spec['keys'])
+    return full, delta, next_watermark(spec, delta, watermark)
+
+
+def delta_order_ids(deltas):
+    """Ensemble des OrderID touchés par les deltas {table: delta} (lignes
+    relues au-delà de la marque ; voir la limite en tête de module).
+
+    Le numéro de commande est lu dans la colonne 'order_id' de chaque table
+    ('Order ID' côté Access).
+    """
+    order_ids = set()
+    for name, df in deltas.items():
+        column = INCREMENTAL_TABLES[name]['order_id']
+        if column in df.columns:
+            order_ids.update(df[column].dropna().tolist())
+    return order_ids
@@ -0,0 +1,97 @@
+# =================================================================
+# VERSION DE CHARGEMENT DU DATA WAREHOUSE
+# =================================================================
+# Après un chargement réussi, l'ETL combine les empreintes du contenu chargé
+# (dimensions, FactSales complet, agrégats ; scripts/fingerprints.py). Si le
+# résultat diffère de la version précédente, une nouvelle version est enregistrée :
+#   - dans le DW : table `EtlLoadVersion` (une ligne par version),
+#   - en local : `data/state/load_version.json`, lu par le cache de requêtes
+#     du notebook (scripts/query_cache.py) sans interroger la base.
+# Un run qui ne change rien (aucune commande nouvelle, dimensions identiques)
+# garde la même version : les résultats en cache restent valides.
+
+import json
+import os
+
+import pandas as pd
+from sqlalchemy import inspect, text
+
+import fingerprints
+
+LOAD_VERSION_TABLE = 'EtlLoadVersion'
+LOAD_VERSION_FILE = 'data/state/load_version.json'
+
+
+def content_hash(table_fingerprints):
+    """Empreinte globale de {table: empreinte de la table} (scripts/fingerprints.py)."""
+    return fingerprints.combine([f'{name}={table_fingerprints[name]}' for name in sorted(table_fingerprints)])
+
+
+def read_local(path=LOAD_VERSION_FILE):
+    """Dernière version écrite par l'ETL sur ce poste (None si absente)."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_dw(connection):
+    """Dernière version enregistrée dans le DW (None si la table n'existe pas).
+
+    `connection` : moteur SQLAlchemy ou connexion DBAPI (pyodbc dans le notebook).
+    """
+    query = (f'SELECT LoadVersion, ContentHash, LoadedAt FROM {LOAD_VERSION_TABLE} '
+             f'WHERE LoadVersion = (SELECT MAX(LoadVersion) FROM {LOAD_VERSION_TABLE})')
+    try:
+        row = pd.read_sql(text(query) if hasattr(connection, 'dialect') else query, connection)
+    except Exception:
+        return None
+    if row.empty:
+        return None
+    return {
+        'load_version': int(row['LoadVersion'].iloc[0]),
+        'content_hash': row['ContentHash'].iloc[0],
+        'loaded_at': str(row['LoadedAt'].iloc[0]),
+    }
+
+
+def write_local(version, path=LOAD_VERSION_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(version, f, indent=2)
+
+
+def record(loader, table_fingerprints, fact_rows, path=LOAD_VERSION_FILE):
+    """Enregistre une nouvelle version si le contenu chargé a changé.
+
+    Retourne (version, nouvelle ?).
+    """
+    engine = loader.engine
+    content = content_hash(table_fingerprints)
+    previous = read_dw(engine) if inspect(engine).has_table(LOAD_VERSION_TABLE) else None
+    if previous and previous['content_hash'] == content:
+        write_local(previous, path)  # poste local éventuellement en retard sur le DW
+        return previous, False
+
+    version = {
+        'load_version': previous['load_version'] + 1 if previous else 1,
+        'content_hash': content,
+        'loaded_at': pd.Timestamp.now().floor('s').isoformat(),
+    }
+    row = pd.DataFrame([{
+        'LoadVersion': version['load_version'],
+        'ContentHash': content,
+        'LoadedAt': pd.Timestamp(version['loaded_at']),
+        'FactSalesRows': fact_rows,
+    }])
+    if previous is None and not inspect(engine).has_table(LOAD_VERSION_TABLE):
+        loader.create_table(row, LOAD_VERSION_TABLE)
+    with engine.begin() as connection:
+        connection.execute(
+            text(f'INSERT INTO {LOAD_VERSION_TABLE} (LoadVersion, ContentHash, LoadedAt, FactSalesRows) '
+                 'VALUES (:v, :h, :t, :n)'),
+            {'v': version['load_version'], 'h': content,
+             't': row['LoadedAt'].iloc[0].to_pydatetime(), 'n': int(row['FactSalesRows'].iloc[0])},
+        )
+    write_local(version, path)
+    return version, True
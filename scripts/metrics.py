@@ -0,0 +1,224 @@
+# =================================================================
+# INSTRUMENTATION DU RUN ETL (temps, CPU, lignes, mémoire)
+# =================================================================
+# Chaque étape est encadrée par metrics.start(...) / metrics.end(...).
+# On mesure : temps réel, temps CPU, lignes en entrée/sortie,
+# débit (lignes/s) et pic mémoire. Par défaut, le pic mémoire est la RSS
+# maximale échantillonnée pendant l'étape (thread léger, psutil ou
+# /proc/self/statm) : coût négligeable. tracemalloc (allocations Python +
+# numpy, plus précis) ralentit fortement les étapes pandas (~x9 sur FactSales)
+# et n'est activé qu'à la demande (--trace-memory).
+# Les étapes du pipeline pouvant s'exécuter en parallèle (scripts/pipeline.py),
+# le temps CPU est celui du thread de l'étape (time.thread_time : le travail
+# des étapes voisines n'y est pas compté, celui des pools lancés par l'étape
+# non plus). Le pic mémoire (RSS ou tracemalloc) est global au processus :
+# une étape qui a chevauché une autre est marquée `overlapped` et son pic
+# n'entre pas dans la détection des régressions. Avec --trace-memory, etl.py
+# exécute les étapes une par une (reset_peak est global).
+# Le rapport du run est écrit en JSON, ajouté à l'historique JSONL et comparé
+# au run précédent : toute étape plus lente (ou plus gourmande) au-delà du
+# seuil est signalée comme régression.
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+import streaming
+
+METRICS_DIR = 'data/state/metrics/'
+HISTORY_FILE = os.path.join(METRICS_DIR, 'runs.jsonl')
+
+DEFAULT_REGRESSION_THRESHOLD = 0.20
+# En dessous de ces valeurs, les écarts relèvent du bruit de mesure
+MIN_SECONDS = 0.5
+MIN_PEAK_MB = 16
+
+# Période d'échantillonnage de la RSS pendant les étapes
+RSS_SAMPLE_SECONDS = 0.05
+
+
+class RunMetrics:
+    """Collecte les mesures des étapes d'un run."""
+
+    def __init__(self, trace_memory=False):
+        self.run_id = pd.Timestamp.now().strftime('%Y%m%dT%H%M%S')
+        self.stages = []
+        self._open = {}
+        self._run_start = time.perf_counter()
+        self.trace_memory = trace_memory
+        self.memory_source = 'tracemalloc' if trace_memory else 'rss'
+        self._rss_peaks = {}
+        self._overlapped = set()
+        self._lock = threading.Lock()
+        self._sampler = None
+
+    def start(self, name, rows_in=None):
+        if self.trace_memory:
+            # Démarré à la première étape : un processus qui importe etl.py sans
+            # exécuter d'étape (worker d'un pool) ne paie pas le traçage
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        with self._lock:
+            if self._open:
+                self._overlapped.update(self._open)
+                self._overlapped.add(name)
+            self._open[name] = (time.perf_counter(), time.thread_time(), rows_in)
+            if not self.trace_memory:
+                self._rss_peaks[name] = streaming.current_rss_mb()
+                if self._sampler is None and self._rss_peaks[name] is not None:
+                    self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+                    self._sampler.start()
+
+    def _sample_rss(self):
+        """Met à jour le pic RSS des étapes ouvertes ; s'arrête quand aucune ne l'est."""
+        while True:
+            time.sleep(RSS_SAMPLE_SECONDS)
+            rss = streaming.current_rss_mb()
+            with self._lock:
+                if not self._open or rss is None:
+                    self._sampler = None
+                    return
+                for name in self._open:
+                    if name in self._rss_peaks:
+                        self._rss_peaks[name] = max(self._rss_peaks[name] or 0, rss)
+
+    def end(self, name, rows_out=None, rows_in=None):
+        with self._lock:
+            wall_start, cpu_start, started_rows_in = self._open.pop(name)
+            rss_peak = self._rss_peaks.pop(name, None)
+            overlapped = name in self._overlapped
+            self._overlapped.discard(name)
+        wall = time.perf_counter() - wall_start
+        peak_mb = None
+        if self.trace_memory:
+            peak_mb = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+        elif rss_peak is not None:
+            peak_mb = round(max(rss_peak, streaming.current_rss_mb() or 0), 2)
+        self.record(
+            name,
+            wall_seconds=wall,
+            cpu_seconds=time.thread_time() - cpu_start,
+            rows_in=rows_in if rows_in is not None else started_rows_in,
+            rows_out=rows_out,
+            peak_mb=peak_mb,
+            overlapped=overlapped,
+        )
+
+    def record(self, name, wall_seconds, cpu_seconds=None, rows_in=None, rows_out=None, peak_mb=None,
+               overlapped=False):
+        """Ajoute une mesure déjà prise (ex. temps par table du pool d'extraction)."""
+        rows = rows_out if rows_out is not None else rows_in
+        self.stages.append({
+            'stage': name,
+            'wall_seconds': round(wall_seconds, 4),
+            'cpu_seconds': round(cpu_seconds, 4) if cpu_seconds is not None else None,
+            'rows_in': int(rows_in) if rows_in is not None else None,
+            'rows_out': int(rows_out) if rows_out is not None else None,
+            'rows_per_sec': round(rows / wall_seconds, 1) if rows and wall_seconds > 0 else None,
+            'peak_mb': peak_mb,
+            'overlapped': overlapped,
+        })
+
+    def report(self):
+        return {
+            'run_id': self.run_id,
+            'memory_source': self.memory_source,
+            'total_seconds': round(time.perf_counter() - self._run_start, 4),
+            'stages': self.stages,
+        }
+
+    def print_summary(self):
+        print("\n--- Mesures par étape ---")
+        for s in self.stages:
+            rows = s['rows_out'] if s['rows_out'] is not None else s['rows_in']
+            details = [f"{s['wall_seconds']:.2f} s"]
+            if s['cpu_seconds'] is not None:
+                details.append(f"CPU {s['cpu_seconds']:.2f} s")
+            if rows is not None:
+                details.append(f"{rows} lignes")
+            if s['rows_per_sec']:
+                details.append(f"{s['rows_per_sec']:,.0f} lignes/s")
+            if s['peak_mb'] is not None:
+                label = 'pic RSS' if self.memory_source == 'rss' else 'pic'
+                details.append(f"{label} {s['peak_mb']:.1f} Mo")
+            if s.get('overlapped'):
+                details.append("en parallèle")
+            print(f"  - {s['stage']} : {', '.join(details)}")
+
+
+def load_previous_run(path=HISTORY_FILE):
+    """Dernier run de l'historique JSONL (None s'il n'y en a pas)."""
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                last = line
+    return json.loads(last) if last else None
+
+
+def find_regressions(current, previous, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Étapes dont le temps ou le pic mémoire dépasse le run précédent de plus de `threshold`.
+
+    Le pic mémoire d'une étape exécutée en parallèle d'autres (`overlapped`)
+    est celui du processus : il n'est pas comparé. Le temps réel n'est comparé
+    qu'entre deux exécutions dans les mêmes conditions (seule ou en parallèle).
+    """
+    if not previous:
+        return []
+    previous_stages = {s['stage']: s for s in previous['stages']}
+    metrics_compared = [('wall_seconds', MIN_SECONDS)]
+    # Pic RSS et pic tracemalloc ne sont pas comparables entre eux
+    if current.get('memory_source') == previous.get('memory_source', 'tracemalloc'):
+        metrics_compared.append(('peak_mb', MIN_PEAK_MB))
+    regressions = []
+    for stage in current['stages']:
+        before = previous_stages.get(stage['stage'])
+        if not before:
+            continue
+        overlapped = stage.get('overlapped', False), before.get('overlapped', False)
+        for metric, floor in metrics_compared:
+            if metric == 'peak_mb' and any(overlapped):
+                continue
+            if metric == 'wall_seconds' and overlapped[0] != overlapped[1]:
+                continue
+            old, new = before.get(metric), stage.get(metric)
+            if old is None or new is None or max(old, new) < floor or old <= 0:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append({
+                    'stage': stage['stage'], 'metric': metric,
+                    'previous': old, 'current': new, 'change': round(change, 3),
+                })
+    return regressions
+
+
+def write_report(metrics, threshold=DEFAULT_REGRESSION_THRESHOLD, directory=METRICS_DIR):
+    """Écrit le rapport du run, le compare au précédent et l'ajoute à l'historique."""
+    os.makedirs(directory, exist_ok=True)
+    history_file = os.path.join(directory, os.path.basename(HISTORY_FILE))
+    report = metrics.report()
+    previous = load_previous_run(history_file)
+    report['previous_run_id'] = previous['run_id'] if previous else None
+    report['regressions'] = find_regressions(report, previous, threshold)
+
+    report_path = os.path.join(directory, f"run_{report['run_id']}.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    with open(history_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(report, ensure_ascii=False) + '\n')
+
+    metrics.print_summary()
+    print(f"📄 Rapport de mesures : {report_path}")
+    for r in report['regressions']:
+        print(f"  ⚠️  Régression {r['stage']} ({r['metric']}) : {r['previous']} -> {r['current']} (+{r['change']:.0%})")
+    if previous and not report['regressions']:
+        print(f"  ✅ Aucune régression > {threshold:.0%} par rapport au run {previous['run_id']}.")
+    return report
@@ -0,0 +1,86 @@
+# =================================================================
+# EXTRACTION PARALLÈLE (pool de workers, une connexion par worker)
+# =================================================================
+# Les lectures par table sont indépendantes : on les exécute sur un pool borné
+# de threads. Chaque thread ouvre (paresseusement) SA connexion et la réutilise
+# pour toutes les tables qu'il traite. Les temps et les erreurs sont collectés
+# table par table : l'échec d'une table n'annule plus les autres.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+class ConnectionPool:
+    """Une connexion par thread worker, créée à la première utilisation."""
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections.clear()
+
+
+def _row_count(result):
+    # Le lecteur peut retourner un DataFrame ou un tuple (DataFrame, ...)
+    df = result[0] if isinstance(result, tuple) else result
+    return len(df) if hasattr(df, '__len__') else None
+
+
+def extract_parallel(connect, queries, read_table, workers=4, label='source'):
+    """Exécute `read_table(conn, table, query)` pour chaque requête sur un pool.
+
+    Retourne (résultats, rapport) :
+    - résultats : {table: valeur retournée} pour les tables réussies
+    - rapport   : {table: {'seconds', 'rows', 'error'}} pour toutes les tables
+    """
+    pool = ConnectionPool(connect)
+    results, report = {}, {}
+
+    def run(table, query):
+        start = time.perf_counter()
+        result = read_table(pool.get(), table, query)
+        return result, time.perf_counter() - start
+
+    workers = max(1, min(workers, len(queries) or 1))
+    start_all = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'extract-{label}') as executor:
+            futures = {executor.submit(run, table, query): table for table, query in queries.items()}
+            for future in as_completed(futures):
+                table = futures[future]
+                try:
+                    result, seconds = future.result()
+                except Exception as e:
+                    report[table] = {'seconds': None, 'rows': None, 'error': str(e)}
+                    print(f"  ❌ {label} - {table} : échec de l'extraction ({e})")
+                    continue
+                results[table] = result
+                report[table] = {'seconds': round(seconds, 3), 'rows': _row_count(result), 'error': None}
+                print(f"  - {label} - {table} : {report[table]['rows']} lignes en {seconds:.2f} s")
+    finally:
+        pool.close_all()
+
+    failed = [t for t, r in report.items() if r['error']]
+    print(f"  ⏱️  {label} : {len(results)}/{len(queries)} tables extraites en "
+          f"{time.perf_counter() - start_all:.2f} s ({workers} workers)"
+          + (f" — échecs : {', '.join(failed)}" if failed else ""))
+    return results, report
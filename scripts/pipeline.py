@@ -0,0 +1,284 @@
+# =================================================================
+# ORDONNANCEUR D'ÉTAPES (DAG) AVEC POINTS DE CONTRÔLE ET REPRISE
+# =================================================================
+# L'ETL est décrit comme un graphe d'étapes nommées. Chaque étape déclare les
+# artefacts qu'elle lit (inputs) et ceux qu'elle produit (outputs) ; une étape
+# dépend de celles qui produisent ses entrées. Les étapes prêtes (toutes leurs
+# dépendances terminées) s'exécutent en parallèle sur un pool de threads.
+#
+# Le statut de chaque étape est écrit dans run.json. Les sorties d'une étape
+# réussie ne sont écrites sur disque (point de contrôle,
+# data/state/checkpoints/<étape>.pkl) que si les points de contrôle sont
+# activés (checkpoint=True) : sinon chaque run pickle toutes les tables
+# extraites et construites pour rien. Ils servent à :
+#   - reprise (--resume) : seules les étapes en échec ou non exécutées au run
+#     précédent (et leurs descendantes) sont relancées, les autres sorties
+#     sont relues depuis leur point de contrôle ;
+#   - sous-graphe (--stage, --from-stage, --to-stage) : les entrées des étapes
+#     hors sélection sont relues depuis les points de contrôle.
+# Une étape en échec n'arrête pas les branches indépendantes ; ses
+# descendantes ne sont pas exécutées.
+
+import json
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+CHECKPOINT_DIR = 'data/state/checkpoints/'
+RUN_STATE_FILE = 'run.json'
+DEFAULT_WORKERS = 4
+
+
+class Stage:
+    """Étape du graphe : `func(**entrées)` retourne {sortie: valeur}."""
+
+    def __init__(self, name, func, inputs=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+
+class Pipeline:
+    """Graphe d'étapes ; les dépendances sont déduites des entrées/sorties déclarées."""
+
+    def __init__(self, checkpoint_dir=CHECKPOINT_DIR):
+        self.checkpoint_dir = checkpoint_dir
+        self.stages = {}
+        self.producers = {}
+
+    def stage(self, name, inputs=(), outputs=()):
+        """Décorateur : enregistre la fonction comme étape `name`."""
+        def register(func):
+            self.add(Stage(name, func, inputs, outputs))
+            return func
+        return register
+
+    def add(self, stage):
+        if stage.name in self.stages:
+            raise ValueError(f"Étape déjà déclarée : {stage.name}")
+        for output in stage.outputs:
+            if output in self.producers:
+                raise ValueError(f"Artefact {output} produit par {self.producers[output]} et {stage.name}")
+            self.producers[output] = stage.name
+        self.stages[stage.name] = stage
+
+    # ------------------------------------------------------------------
+    # Structure du graphe
+    # ------------------------------------------------------------------
+    def dependencies(self, name):
+        missing = [i for i in self.stages[name].inputs if i not in self.producers]
+        if missing:
+            raise ValueError(f"Étape {name} : aucune étape ne produit {', '.join(missing)}")
+        return {self.producers[i] for i in self.stages[name].inputs}
+
+    def order(self):
+        """Étapes dans un ordre topologique (ordre de déclaration à égalité)."""
+        done, ordered = set(), []
+        while len(ordered) < len(self.stages):
+            ready = [n for n in self.stages if n not in done and self.dependencies(n) <= done]
+            if not ready:
+                cycle = [n for n in self.stages if n not in done]
+                raise ValueError(f"Cycle dans le graphe d'étapes : {', '.join(cycle)}")
+            ordered.extend(ready)
+            done.update(ready)
+        return ordered
+
+    def upstream(self, names):
+        """`names` et toutes les étapes dont elles dépendent."""
+        result, todo = set(), list(names)
+        while todo:
+            name = todo.pop()
+            if name not in result:
+                result.add(name)
+                todo.extend(self.dependencies(name))
+        return result
+
+    def downstream(self, names):
+        """`names` et toutes les étapes qui en dépendent."""
+        result = set(names)
+        for name in self.order():
+            if self.dependencies(name) & result:
+                result.add(name)
+        return result
+
+    def select(self, stages=None, from_stages=None, to_stages=None):
+        """Sous-graphe à exécuter (None = tout le graphe).
+
+        stages : ces étapes seulement ; from_stages : ces étapes et leurs
+        descendantes ; to_stages : ces étapes et leurs ascendantes.
+        """
+        if not (stages or from_stages or to_stages):
+            return None
+        unknown = [n for n in (stages or []) + (from_stages or []) + (to_stages or []) if n not in self.stages]
+        if unknown:
+            raise ValueError(f"Étape(s) inconnue(s) : {', '.join(unknown)} (voir --list-stages)")
+        selected = set(stages or [])
+        if from_stages:
+            selected |= self.downstream(from_stages)
+        if to_stages:
+            to_selection = self.upstream(to_stages)
+            # --from-stage X --to-stage Y : les étapes entre X et Y
+            selected = selected & to_selection if from_stages else selected | to_selection
+        return selected
+
+    def describe(self):
+        print("Étapes du pipeline (ordre topologique) :")
+        for name in self.order():
+            stage = self.stages[name]
+            after = sorted(self.dependencies(name))
+            print(f"  - {name}" + (f"  ← {', '.join(after)}" if after else "")
+                  + (f"  → {', '.join(stage.outputs)}" if stage.outputs else ""))
+
+    # ------------------------------------------------------------------
+    # Points de contrôle
+    # ------------------------------------------------------------------
+    def _checkpoint_path(self, name):
+        return os.path.join(self.checkpoint_dir, f'{name}.pkl')
+
+    def load_state(self):
+        path = os.path.join(self.checkpoint_dir, RUN_STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self, state):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = os.path.join(self.checkpoint_dir, RUN_STATE_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _write_checkpoint(self, name, outputs):
+        if not outputs:
+            return
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = self._checkpoint_path(name)
+        pd.to_pickle(outputs, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def _read_checkpoint(self, name):
+        if not self.stages[name].outputs:
+            return {}
+        return pd.read_pickle(self._checkpoint_path(name))
+
+    def _reusable(self, state, signature):
+        """Étapes terminées au run précédent dont le point de contrôle est exploitable."""
+        if not state or state.get('signature') != signature:
+            return set()
+        return {
+            name for name, s in state['stages'].items()
+            if name in self.stages and s['status'] == 'done'
+            and (not self.stages[name].outputs
+                 or (s.get('checkpoint') and os.path.exists(self._checkpoint_path(name))))
+        }
+
+    # ------------------------------------------------------------------
+    # Exécution
+    # ------------------------------------------------------------------
+    def run(self, selected=None, workers=DEFAULT_WORKERS, signature=None, resume=False, checkpoint=False):
+        """Exécute le graphe (ou la sélection). Retourne {'done', 'failed', 'not_run'}.
+
+        `signature` : paramètres du run (sources, options) ; les points de contrôle
+        d'un run de signature différente ne sont jamais réutilisés.
+        `checkpoint` : écrit les sorties des étapes réussies (reprise possible).
+        """
+        order = self.order()
+        previous = self.load_state()
+        reusable = self._reusable(previous, signature)
+
+        if resume:
+            if previous and previous.get('signature') != signature:
+                print("⚠️  Reprise impossible : options différentes du run interrompu. Exécution complète.")
+            elif previous and not reusable:
+                print("⚠️  Aucun point de contrôle du run précédent (lancé sans --checkpoint). Exécution complète.")
+            to_run = set(self.downstream(set(order) - reusable))
+            if selected is not None:
+                to_run &= selected
+            if not to_run:
+                print("ℹ️  Rien à reprendre : toutes les étapes du run précédent sont terminées.")
+        else:
+            to_run = set(order) if selected is None else set(selected)
+
+        # Entrées des étapes à exécuter produites par des étapes non exécutées
+        external = {d for name in to_run for d in self.dependencies(name)} - to_run
+        missing = sorted(external - reusable, key=order.index)
+        if missing:
+            raise ValueError(
+                f"Point de contrôle absent ou incompatible pour : {', '.join(missing)}. "
+                "Exécutez d'abord ces étapes (ou le pipeline complet)."
+            )
+
+        # État du run : les étapes non exécutées gardent leur statut précédent
+        state = {'signature': signature, 'started_at': pd.Timestamp.now().floor('s').isoformat(), 'stages': {}}
+        for name in order:
+            if name in to_run:
+                state['stages'][name] = {'status': 'pending'}
+            elif name in reusable:
+                state['stages'][name] = previous['stages'][name]
+            else:
+                state['stages'][name] = {'status': 'not_run'}
+        self._save_state(state)
+
+        artifacts = {}
+        for name in sorted(external, key=order.index):
+            artifacts.update(self._read_checkpoint(name))
+            print(f"♻️  {name} : sorties relues depuis le point de contrôle.")
+
+        def execute(stage):
+            start = time.perf_counter()
+            outputs = stage.func(**{i: artifacts[i] for i in stage.inputs}) or {}
+            missing_outputs = [o for o in stage.outputs if o not in outputs]
+            if missing_outputs:
+                raise ValueError(f"sorties non produites : {', '.join(missing_outputs)}")
+            if checkpoint:
+                self._write_checkpoint(stage.name, {o: outputs[o] for o in stage.outputs})
+            elif os.path.exists(self._checkpoint_path(stage.name)):
+                # Point de contrôle d'un run antérieur : périmé
+                os.remove(self._checkpoint_path(stage.name))
+            return outputs, time.perf_counter() - start
+
+        done, failed, running = set(), set(), {}
+        pending = [n for n in order if n in to_run]
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='stage') as executor:
+            while pending or running:
+                # Descendantes d'une étape en échec : non exécutées
+                pending = [n for n in pending if not self.upstream([n]) & failed]
+                ready = [n for n in pending if (self.dependencies(n) & to_run) <= done]
+                for name in ready:
+                    pending.remove(name)
+                    print(f"\n▶️  Étape {name}")
+                    running[executor.submit(execute, self.stages[name])] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        outputs, seconds = future.result()
+                    except Exception as e:
+                        failed.add(name)
+                        state['stages'][name] = {'status': 'failed', 'error': f'{type(e).__name__}: {e}'}
+                        print(f"❌ Étape {name} en échec : {e}")
+                        print(''.join('    ' + line for line in traceback.format_exception(e)), end='')
+                    else:
+                        done.add(name)
+                        artifacts.update({o: outputs[o] for o in self.stages[name].outputs})
+                        state['stages'][name] = {
+                            'status': 'done', 'seconds': round(seconds, 3), 'checkpoint': checkpoint,
+                            'finished_at': pd.Timestamp.now().floor('s').isoformat(),
+                        }
+                        print(f"✅ Étape {name} terminée en {seconds:.2f} s")
+                    self._save_state(state)
+
+        not_run = [n for n in order if n in to_run and n not in done and n not in failed]
+        return {
+            'done': [n for n in order if n in done],
+            'failed': [n for n in order if n in failed],
+            'not_run': not_run,
+        }
@@ -0,0 +1,202 @@
+# =================================================================
+# CONTRÔLE QUALITÉ ET INTÉGRITÉ RÉFÉRENTIELLE AVANT CHARGEMENT
+# =================================================================
+# Chaque règle est évaluée sur la colonne entière (ensemble, pas ligne à
+# ligne) : appartenance des clés aux dimensions construites (table de hachage,
+# Series.isin), unicité (Series.duplicated), valeurs nulles et plages. Le coût
+# est linéaire en nombre de lignes.
+#   - règles déclaratives (FACT_SALES_RULES) : (contrôle, colonnes, paramètre) ;
+#   - échantillonnage optionnel (très gros chargements) : les règles ligne à
+#     ligne sont d'abord évaluées sur un échantillon ; un échantillon sans
+#     violation valide la table, sinon le contrôle complet est exécuté pour
+#     isoler toutes les lignes fautives. L'unicité est toujours contrôlée sur
+#     la table complète (un doublon échappe presque toujours à un échantillon) ;
+#   - rapport des violations (nombre, taux, exemples d'OrderID) écrit dans
+#     data/state/quality/ ;
+#   - mise en quarantaine : les lignes fautives sont retirées du chargement et
+#     écrites dans data/quarantine/ avec la liste des règles violées.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+QUALITY_DIR = 'data/state/quality/'
+QUARANTINE_DIR = 'data/quarantine/'
+VIOLATIONS_COLUMN = 'QualityViolations'
+ACTIONS = ('fail', 'quarantine', 'warn')
+EXAMPLES = 5
+
+# Contrôles :
+#   - 'not_null'           : valeur obligatoire
+#   - 'reference'          : clé présente dans (dimension, colonne) ; nulle = orpheline
+#   - 'reference_nullable' : comme 'reference', mais la valeur peut être nulle
+#   - 'unique'             : combinaison de colonnes unique dans la table
+#   - 'range'              : (minimum, maximum) inclus, None = non borné ; nulle acceptée
+FACT_SALES_RULES = [
+    ('not_null', ['OrderID'], None),
+    ('reference', ['CustomerKey'], ('DimCustomers', 'CustomerKey')),
+    ('reference', ['EmployeeKey'], ('DimEmployees', 'EmployeeKey')),
+    ('reference', ['ShipperKey'], ('DimShippers', 'ShipperKey')),
+    ('reference', ['ProductKey'], ('DimProducts', 'ProductKey')),
+    ('reference', ['OrderDateKey'], ('DimDate', 'DateKey')),
+    # Commande non encore expédiée : ShippedDateKey nulle
+    ('reference_nullable', ['ShippedDateKey'], ('DimDate', 'DateKey')),
+    ('unique', ['OrderID', 'ProductKey'], None),
+    ('not_null', ['OrderQuantity'], None),
+    ('range', ['OrderQuantity'], (1, None)),
+    ('range', ['SaleUnitPrice'], (0, None)),
+    ('range', ['Discount'], (0, 1)),
+    ('range', ['SalesAmount'], (0, None)),
+    ('range', ['Freight'], (0, None)),
+]
+
+
+def rule_name(check, columns):
+    return f"{'+'.join(columns)}:{check}"
+
+
+def _as_mask(values):
+    return np.asarray(pd.Series(values).fillna(False).to_numpy(dtype=bool))
+
+
+def evaluate(df, check, columns, param, references):
+    """Masque booléen des lignes de `df` qui violent la règle."""
+    if check == 'not_null':
+        return df[columns[0]].isna().to_numpy()
+    if check in ('reference', 'reference_nullable'):
+        table, key = param
+        values = df[columns[0]]
+        # isin : table de hachage des clés de la dimension (une valeur nulle n'y est jamais)
+        orphan = ~values.isin(references[table][key].dropna().unique()).to_numpy()
+        if check == 'reference_nullable':
+            orphan &= values.notna().to_numpy()
+        return orphan
+    if check == 'unique':
+        # Première occurrence conservée, les suivantes sont des doublons
+        return df.duplicated(subset=columns, keep='first').to_numpy()
+    if check == 'range':
+        low, high = param
+        values = df[columns[0]]
+        out = np.zeros(len(df), dtype=bool)
+        if low is not None:
+            out |= _as_mask(values < low)
+        if high is not None:
+            out |= _as_mask(values > high)
+        return out
+    raise ValueError(f"Contrôle qualité inconnu : {check}")
+
+
+def _evaluate_all(df, rules, references):
+    return {rule_name(check, columns): evaluate(df, check, columns, param, references)
+            for check, columns, param in rules}
+
+
+def validate(df, rules, references, sample=None, seed=0):
+    """Évalue les règles sur `df`.
+
+    Retourne (masques {règle: lignes en violation} sur la table complète, rapport).
+    `sample` : fraction (0 < f < 1) des lignes contrôlées d'abord ; si
+    l'échantillon est sans violation, les masques des règles ligne à ligne
+    sont vides (table acceptée sans contrôle complet).
+    """
+    row_rules = [r for r in rules if r[0] != 'unique']
+    table_rules = [r for r in rules if r[0] == 'unique']
+    report = {'rows': len(df), 'sampled_rows': None, 'full_check': True, 'rules': []}
+
+    masks = None
+    if sample and 0 < sample < 1 and len(df):
+        checked = df.sample(frac=sample, random_state=seed)
+        sample_masks = _evaluate_all(checked, row_rules, references)
+        report['sampled_rows'] = len(checked)
+        if not any(mask.any() for mask in sample_masks.values()):
+            # Échantillon propre : table acceptée, taux estimés à 0
+            report['full_check'] = False
+            masks = {name: np.zeros(len(df), dtype=bool) for name in sample_masks}
+    if masks is None:
+        masks = _evaluate_all(df, row_rules, references)
+    masks.update(_evaluate_all(df, table_rules, references))
+
+    order_ids = df['OrderID'].to_numpy() if 'OrderID' in df.columns else None
+    for check, columns, param in rules:
+        name = rule_name(check, columns)
+        mask = masks[name]
+        count = int(mask.sum())
+        report['rules'].append({
+            'rule': name, 'check': check, 'columns': columns,
+            'violations': count,
+            'rate': round(count / len(df), 6) if len(df) else 0.0,
+            'examples': ([None if pd.isna(v) else int(v) for v in order_ids[mask][:EXAMPLES]]
+                         if order_ids is not None else []),
+        })
+    invalid = np.zeros(len(df), dtype=bool)
+    for mask in masks.values():
+        invalid |= mask
+    report['invalid_rows'] = int(invalid.sum())
+    return masks, report
+
+
+def violation_labels(masks, invalid):
+    """Règles violées par chaque ligne fautive, séparées par ';'."""
+    labels = pd.Series('', index=np.flatnonzero(invalid), dtype=object)
+    for name, mask in masks.items():
+        hit = mask[invalid]
+        if hit.any():
+            labels[hit] = labels[hit] + name + ';'
+    return labels.str.rstrip(';').to_numpy()
+
+
+def gate(df, table, rules, references, action='fail', sample=None, run_id=None,
+         fmt='parquet', quality_dir=QUALITY_DIR, quarantine_dir=QUARANTINE_DIR):
+    """Contrôle `df` avant chargement ; retourne la table à charger.
+
+    action : 'fail' (RuntimeError si une règle est violée), 'quarantine'
+    (lignes fautives retirées et écrites dans `quarantine_dir`) ou 'warn'
+    (violations signalées, table chargée telle quelle).
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"Action qualité inconnue : {action} ({', '.join(ACTIONS)})")
+    run_id = run_id or pd.Timestamp.now().strftime('%Y%m%dT%H%M%S')
+    masks, report = validate(df, rules, references, sample)
+    report.update({'table': table, 'run_id': run_id, 'action': action, 'quarantine_file': None})
+
+    invalid = np.zeros(len(df), dtype=bool)
+    for mask in masks.values():
+        invalid |= mask
+    if invalid.any() and action == 'quarantine':
+        rejected = df[invalid].assign(**{VIOLATIONS_COLUMN: violation_labels(masks, invalid)})
+        written = storage.write_table(rejected, quarantine_dir, f'{table}_{run_id}', fmt)
+        report['quarantine_file'] = written[0]
+        df = df[~invalid].reset_index(drop=True)
+
+    os.makedirs(quality_dir, exist_ok=True)
+    report_path = os.path.join(quality_dir, f'{table}_{run_id}.json')
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print_report(report, report_path)
+
+    if invalid.any() and action == 'fail':
+        raise RuntimeError(
+            f"{table} : {report['invalid_rows']} ligne(s) en violation des règles qualité "
+            f"(détail dans {report_path} ; reprise avec --resume --quality-action quarantine pour les écarter)"
+        )
+    return df
+
+
+def print_report(report, report_path):
+    scope = (f"échantillon de {report['sampled_rows']} lignes sans violation, contrôle complet non nécessaire"
+             if not report['full_check'] else f"{report['rows']} lignes contrôlées")
+    if not report['invalid_rows']:
+        print(f"  ✅ Contrôle qualité de {report['table']} : aucune violation ({scope}).")
+        return
+    print(f"  ⚠️  Contrôle qualité de {report['table']} : {report['invalid_rows']} ligne(s) en violation ({scope}).")
+    for rule in report['rules']:
+        if rule['violations']:
+            examples = ', '.join(map(str, rule['examples']))
+            print(f"    - {rule['rule']} : {rule['violations']} ({rule['rate']:.2%}) ; OrderID : {examples}")
+    if report['quarantine_file']:
+        print(f"    🚧 Lignes écartées du chargement (quarantaine) : {report['quarantine_file']}")
+    print(f"    📄 Rapport : {report_path}")
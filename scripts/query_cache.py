@@ -0,0 +1,157 @@
+# =================================================================
+# CACHE DE REQUÊTES DU NOTEBOOK (clé : SQL normalisé + version de chargement)
+# =================================================================
+# Le DW ne change que lorsque etl.py charge de nouvelles données. Les résultats
+# des requêtes du notebook sont donc conservés sur disque et réutilisés tant
+# que la version de chargement (scripts/load_version.py) reste la même :
+#   - la version est lue dans data/state/load_version.json (aucun accès base),
+#     ou à défaut une seule fois dans la table EtlLoadVersion du DW ;
+#   - un résultat est rangé dans <cache>/<version>/<hash du SQL>.pkl ;
+#   - quand une nouvelle version apparaît, les dossiers des versions
+#     précédentes sont supprimés (invalidation automatique) ;
+#   - la taille totale est bornée (LRU : les résultats les moins récemment
+#     lus sont supprimés en premier).
+# La connexion au DW n'est ouverte qu'au premier résultat absent du cache.
+# Plusieurs instances peuvent partager le même dossier depuis des threads ou
+# des processus (scripts/reports.py : une instance par requête concurrente) :
+# un résultat est écrit dans un fichier temporaire du même dossier puis mis en
+# place par os.replace (atomique), un lecteur ne voit jamais de pickle partiel.
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+import pandas as pd
+
+import load_version
+
+CACHE_DIR = 'data/cache/notebook/'
+DEFAULT_MAX_MB = 256
+
+# Chaînes SQL ('...', apostrophes doublées), commentaires '--', blancs
+_SQL_TOKENS = re.compile(r"'(?:[^']|'')*'|(?:--[^\n]*|\s+)+")
+# Changement de version et éviction : un seul thread à la fois
+_DIRECTORY_LOCK = threading.Lock()
+TMP_SUFFIX = '.tmp'
+
+
+def normalize_sql(sql):
+    """SQL sans commentaires, blancs réduits à un espace, sans ';' final.
+    Le contenu des chaînes littérales est conservé tel quel."""
+    def replace(match):
+        token = match.group(0)
+        return token if token.startswith("'") else ' '
+    return _SQL_TOKENS.sub(replace, sql).strip().rstrip(';').strip()
+
+
+class QueryCache:
+    """`read_sql` avec cache disque ; `connect` ouvre une connexion au DW à la demande."""
+
+    def __init__(self, connect, directory=CACHE_DIR, max_mb=DEFAULT_MAX_MB,
+                 version_file=load_version.LOAD_VERSION_FILE):
+        self.connect = connect
+        self.directory = str(directory)
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.version_file = str(version_file)
+        self.conn = None
+        self._dw_version = None
+        self.hits = 0
+        self.misses = 0
+
+    def connection(self):
+        if self.conn is None:
+            self.conn = self.connect()
+        return self.conn
+
+    def load_version(self):
+        """Empreinte de la version chargée (relue à chaque requête : un nouveau
+        chargement pendant la session invalide le cache)."""
+        version = load_version.read_local(self.version_file)
+        if version is None:
+            if self._dw_version is None:
+                self._dw_version = load_version.read_dw(self.connection())
+            version = self._dw_version
+        if version is None:
+            raise RuntimeError(f"Version de chargement introuvable ({self.version_file} ni table "
+                               f"{load_version.LOAD_VERSION_TABLE}) : exécutez d'abord etl.py.")
+        return version['content_hash'][:16]
+
+    def _version_dir(self, version):
+        path = os.path.join(self.directory, version)
+        with _DIRECTORY_LOCK:
+            if os.path.isdir(path):
+                return path
+            # Nouvelle version : les résultats des chargements précédents sont obsolètes
+            if os.path.isdir(self.directory):
+                for entry in os.listdir(self.directory):
+                    shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+            os.makedirs(path, exist_ok=True)
+        return path
+
+    def read_sql(self, sql, params=None):
+        key_text = normalize_sql(sql) + (repr(params) if params is not None else '')
+        version_dir = self._version_dir(self.load_version())
+        path = os.path.join(version_dir, hashlib.sha256(key_text.encode()).hexdigest() + '.pkl')
+        try:
+            os.utime(path)  # date d'accès de l'entrée pour la politique LRU
+            df = pd.read_pickle(path)
+        except FileNotFoundError:
+            pass  # absente, ou évincée par une autre instance entre-temps
+        else:
+            self.hits += 1
+            return df
+
+        self.misses += 1
+        df = pd.read_sql(sql, self.connection(), params=params)
+        self._write(df, path)
+        self.evict()
+        return df
+
+    def _write(self, df, path):
+        """Écriture atomique : fichier temporaire du même dossier puis os.replace."""
+        try:
+            fd, tmp_path = tempfile.mkstemp(suffix=TMP_SUFFIX, dir=os.path.dirname(path))
+        except FileNotFoundError:
+            return  # dossier de version supprimé par un chargement plus récent
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                df.to_pickle(f)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def evict(self):
+        """Supprime les entrées les moins récemment lues au-delà de la taille maximale."""
+        with _DIRECTORY_LOCK:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(TMP_SUFFIX):
+                        continue  # écriture en cours
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
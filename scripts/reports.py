@@ -0,0 +1,423 @@
+# =================================================================
+# RAPPORTS SANS NOTEBOOK (requêtes concurrentes, rendu en parallèle)
+# =================================================================
+# Produit, sans Jupyter ni interaction, les graphiques du notebook d'analyse
+# (notebooks/analysis_notebook.ipynb) :
+#   - chaque analyse est un rapport enregistré (@report) : sa requête SQL sur
+#     les tables d'agrégats du DW et sa fonction de rendu ;
+#   - les requêtes s'exécutent en parallèle dans des threads, sur un pool de
+#     connexions SQLAlchemy partagé (une connexion empruntée par requête), avec
+#     le cache de requêtes du notebook (scripts/query_cache.py) ; --offline lit
+#     la couche CLEAN avec le moteur en mémoire (scripts/analytics.py) ;
+#   - dès qu'un résultat arrive, son rendu (HTML, PNG si kaleido est installé)
+#     part dans un pool de processus. plotly n'est importé que par les
+#     fonctions de rendu, jamais au chargement du module ;
+#   - les durées par rapport (requête, rendu, fin depuis le début du run) sont
+#     affichées et écrites dans data/state/reports/ (historique runs.jsonl).
+#
+#   python scripts/reports.py --dw-sqlite dw.db
+#   python scripts/reports.py --offline --formats html png
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+import analytics
+import query_cache
+
+FIGURES_DIR = 'figures/'
+REPORTS_STATE_DIR = 'data/state/reports/'
+HISTORY_FILE = 'runs.jsonl'
+FORMATS = ('html', 'png')
+DEFAULT_QUERY_WORKERS = 4
+
+# Rapports enregistrés : nom -> {'sql', 'render'} (ordre du notebook)
+REPORTS = {}
+
+
+def report(name, sql):
+    """Enregistre la fonction de rendu du rapport `name`.
+
+    `sql` : requête sur le DW ({concat} : opérateur de concaténation du
+    dialecte) ; mêmes colonnes que analytics.AnalyticsEngine.run(name).
+    La fonction reçoit le résultat et retourne {fichier sans extension:
+    figure plotly ou DataFrame (table HTML)}.
+    """
+    def register(render):
+        REPORTS[name] = {'sql': sql, 'render': render}
+        return render
+    return register
+
+
+def _plotly_express():
+    """plotly, importé à la demande (processus de rendu uniquement)."""
+    try:
+        import plotly.express as px
+    except ImportError as e:
+        raise ImportError("plotly est requis pour le rendu des graphiques : pip install plotly") from e
+    return px
+
+
+# -----------------------------------------------------------------
+# Rapports (requêtes et graphiques du notebook)
+# -----------------------------------------------------------------
+@report('sales_trend', """
+    SELECT Year, Month, MonthName, SalesAmount AS MonthlySales, OrderCount AS TotalOrders
+    FROM AggSalesByMonth
+    ORDER BY Year, Month""")
+def sales_trend(df):
+    px = _plotly_express()
+    df = df.assign(
+        YearMonth=df['Year'].astype(str) + '-' + df['Month'].astype(str).str.zfill(2),
+        YearMonthLabel=df['MonthName'].astype(str) + ' ' + df['Year'].astype(str),
+    )
+    fig = px.line(
+        df, x='YearMonth', y='MonthlySales', markers=True,
+        title='Tendance des Ventes Mensuelles (SalesAmount)',
+        labels={'MonthlySales': 'Revenus Totaux ($)', 'YearMonth': 'Mois'},
+        hover_data=['TotalOrders', 'YearMonthLabel'],
+    )
+    fig.update_layout(xaxis_title='Mois', yaxis_title='Revenus Totaux ($)', hovermode='x unified',
+                      template='plotly_white', height=600)
+    fig.update_traces(line=dict(width=3), marker=dict(size=8))
+    return {'tendance_ventes_mensuelles': fig}
+
+
+@report('top_employees', """
+    SELECT de.FirstName {concat} ' ' {concat} de.LastName AS EmployeeName, de.Title, de.City, de.Country,
+           SUM(agg.SalesAmount) AS TotalSales, SUM(agg.OrderCount) AS TotalOrders,
+           SUM(agg.SalesAmount) / SUM(agg.LineCount) AS AvgOrderValue
+    FROM AggSalesByEmployee agg
+    JOIN DimEmployees de ON agg.EmployeeKey = de.EmployeeKey AND de.IsCurrent = 1
+    GROUP BY de.FirstName, de.LastName, de.Title, de.City, de.Country
+    ORDER BY TotalSales DESC""")
+def top_employees(df):
+    px = _plotly_express()
+    fig = px.bar(
+        df, x='TotalSales', y='EmployeeName', orientation='h',
+        title='Performance des Employés (Ventes Totales)',
+        labels={'TotalSales': 'Montant des Ventes (USD)', 'EmployeeName': 'Employé'},
+        hover_data=['TotalOrders', 'AvgOrderValue', 'Title', 'City', 'Country'],
+        color='TotalSales', color_continuous_scale='Viridis',
+    )
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'}, template='plotly_white', height=500,
+                      showlegend=False)
+    return {'performance_employes': fig}
+
+
+@report('category_volume', """
+    SELECT CategoryName, Quantity AS TotalQuantity, SalesAmount AS TotalSales,
+           OrderCount AS TotalOrders, ProductCount AS TotalProducts
+    FROM AggSalesByCategory
+    ORDER BY TotalQuantity DESC""")
+def category_volume(df):
+    px = _plotly_express()
+    df = df.assign(Percentage=(df['TotalQuantity'] / df['TotalQuantity'].sum() * 100).round(2))
+    pie = px.pie(
+        df, values='TotalQuantity', names='CategoryName',
+        title='Distribution du Volume de Commandes par Catégorie',
+        hover_data=['TotalSales', 'TotalOrders', 'TotalProducts', 'Percentage'],
+        labels={'TotalQuantity': 'Quantité Totale', 'CategoryName': 'Catégorie'},
+    )
+    pie.update_traces(
+        textposition='inside', textinfo='percent+label',
+        hovertemplate='<b>%{label}</b><br>Quantité: %{value}<br>Pourcentage: %{percent}<br>'
+                      'CA Total: $%{customdata[0]:,.2f}<br>Commandes: %{customdata[1]}<br>'
+                      'Produits: %{customdata[2]}<extra></extra>',
+    )
+    pie.update_layout(template='plotly_white', height=700, showlegend=True)
+    bars = px.bar(
+        df, x='CategoryName', y=['TotalQuantity', 'TotalSales'],
+        title='Comparaison Volume et CA par Catégorie',
+        labels={'value': 'Montant', 'CategoryName': 'Catégorie', 'variable': 'Type'},
+        barmode='group', hover_data=['TotalOrders', 'TotalProducts'],
+    )
+    bars.update_layout(xaxis_title='Catégorie', yaxis_title='Montant', template='plotly_white', height=600)
+    return {'distribution_categories': pie, 'comparaison_categories': bars}
+
+
+@report('verification', """
+    SELECT SUM(OrderCount) AS TotalOrders, SUM(LineCount) AS TotalOrderDetails,
+           SUM(SalesAmount) AS TotalRevenue, SUM(SalesAmount) / SUM(LineCount) AS AvgOrderValue,
+           MIN(FirstOrderDateKey) AS FirstOrderDateKey, MAX(LastOrderDateKey) AS LastOrderDateKey
+    FROM AggSalesByMonth""")
+def verification(df):
+    # Totaux de contrôle : table HTML, sans graphique
+    return {'verification': df}
+
+
+@report('sales_by_country', """
+    SELECT CustomerCountry AS Country, SalesAmount AS TotalSales, OrderCount AS TotalOrders,
+           CustomerCount AS TotalCustomers, SalesAmount / LineCount AS AvgOrderValue
+    FROM AggSalesByCountry
+    WHERE CustomerCountry IS NOT NULL
+    ORDER BY TotalSales DESC""")
+def sales_by_country(df):
+    px = _plotly_express()
+    # Le moteur hors ligne conserve le groupe NULL : même contenu que la requête SQL
+    df = df[df['Country'].notna()]
+    fig = px.bar(
+        df.head(10), x='Country', y='TotalSales',
+        title="Top 10 Pays par Chiffre d'Affaires",
+        labels={'TotalSales': 'CA Total ($)', 'Country': 'Pays'},
+        hover_data=['TotalOrders', 'TotalCustomers', 'AvgOrderValue'],
+        color='TotalSales', color_continuous_scale='Blues',
+    )
+    fig.update_layout(xaxis_title='Pays', yaxis_title="Chiffre d'Affaires ($)", template='plotly_white', height=600)
+    return {'ventes_par_pays': fig}
+
+
+@report('shipping_status', """
+    SELECT CASE WHEN FS.ShippedDateKey IS NULL THEN 'Non Livré' ELSE 'Livré' END AS ShippingStatus,
+           COUNT(*) AS OrderCount, SUM(FS.SalesAmount) AS TotalSales,
+           COUNT(DISTINCT FS.OrderID) AS UniqueOrders
+    FROM FactSales FS
+    GROUP BY CASE WHEN FS.ShippedDateKey IS NULL THEN 'Non Livré' ELSE 'Livré' END""")
+def shipping_status(df):
+    px = _plotly_express()
+    fig = px.pie(
+        df.assign(ShippingStatus=df['ShippingStatus'].astype(str)),
+        values='OrderCount', names='ShippingStatus', title='État des Livraisons',
+        hover_data=['TotalSales', 'UniqueOrders'],
+        color_discrete_map={'Livré': '#66b3ff', 'Non Livré': '#ff9999'},
+    )
+    fig.update_traces(
+        textposition='inside', textinfo='percent+label',
+        hovertemplate='<b>%{label}</b><br>Lignes: %{value}<br>Pourcentage: %{percent}<br>'
+                      'CA Total: $%{customdata[0]:,.2f}<br>Commandes: %{customdata[1]}<extra></extra>',
+    )
+    fig.update_layout(template='plotly_white', height=600)
+    return {'etat_livraisons': fig}
+
+
+@report('top_products', """
+    SELECT DP.ProductName, DP.CategoryName, SUM(A.Quantity) AS TotalQuantity,
+           SUM(A.SalesAmount) AS TotalSales, SUM(A.OrderCount) AS TotalOrders,
+           SUM(A.SumUnitPrice) / SUM(A.LineCount) AS AvgPrice
+    FROM AggSalesByProduct A
+    JOIN DimProducts DP ON A.ProductKey = DP.ProductKey AND DP.IsCurrent = 1
+    GROUP BY DP.ProductName, DP.CategoryName
+    ORDER BY TotalSales DESC""")
+def top_products(df):
+    px = _plotly_express()
+    fig = px.bar(
+        df.head(10), x='TotalSales', y='ProductName', orientation='h',
+        title="Top 10 Produits par Chiffre d'Affaires",
+        labels={'TotalSales': 'CA Total ($)', 'ProductName': 'Produit'},
+        hover_data=['TotalQuantity', 'TotalOrders', 'CategoryName', 'AvgPrice'],
+        color='TotalSales', color_continuous_scale='Greens',
+    )
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'}, template='plotly_white', height=600,
+                      showlegend=False)
+    return {'top_produits': fig}
+
+
+# -----------------------------------------------------------------
+# Sources des données : DW (pool de connexions + cache) ou couche CLEAN
+# -----------------------------------------------------------------
+def sql_query(name, dialect):
+    return REPORTS[name]['sql'].format(concat='+' if dialect == 'mssql' else '||')
+
+
+def dw_reader(dw_engine, cache_dir=query_cache.CACHE_DIR, use_cache=True):
+    """Lecture d'un rapport sur le DW : chaque appel emprunte une connexion du
+    pool de `dw_engine` (sûr depuis plusieurs threads)."""
+    def read(name):
+        sql = sql_query(name, dw_engine.dialect.name)
+        if not use_cache:
+            with dw_engine.connect() as conn:
+                return pd.read_sql(text(sql), conn), False
+        cache = query_cache.QueryCache(dw_engine.connect, directory=cache_dir)
+        try:
+            return cache.read_sql(sql), cache.hits > 0
+        finally:
+            cache.close()
+    return read
+
+
+def offline_reader(clean_dir=analytics.CLEAN_DIR):
+    """Lecture d'un rapport sur la couche CLEAN (moteur en mémoire, mêmes colonnes)."""
+    engine = analytics.AnalyticsEngine(clean_dir)
+    if not engine.available():
+        raise FileNotFoundError(f"couche CLEAN introuvable dans {clean_dir} : exécutez d'abord etl.py")
+    # Dimensions mises en cache par le moteur : une seule lecture à la fois
+    lock = threading.Lock()
+
+    def read(name):
+        with lock:
+            return engine.run(name), False
+    return read
+
+
+# -----------------------------------------------------------------
+# Rendu (processus de rendu) et exécution
+# -----------------------------------------------------------------
+def render_report(name, df, output_dir, formats):
+    """Rend le rapport `name` ; retourne (fichiers écrits, formats ignorés, secondes)."""
+    start = time.perf_counter()
+    written, skipped = [], []
+    for stem, output in REPORTS[name]['render'](df).items():
+        if isinstance(output, pd.DataFrame):
+            path = os.path.join(output_dir, f'{stem}.html')
+            output.to_html(path, index=False)
+            written.append(path)
+            continue
+        for fmt in formats:
+            path = os.path.join(output_dir, f'{stem}.{fmt}')
+            if fmt == 'html':
+                output.write_html(path)
+            else:
+                try:
+                    # Export statique : nécessite kaleido
+                    output.write_image(path)
+                except (ImportError, ValueError, RuntimeError) as e:
+                    skipped.append(f"{stem}.{fmt} ({str(e).strip().splitlines()[0].rstrip(',')})")
+                    continue
+            written.append(path)
+    return written, skipped, time.perf_counter() - start
+
+
+def run_reports(names, read, output_dir=FIGURES_DIR, formats=('html',),
+                query_workers=DEFAULT_QUERY_WORKERS, render_workers=None):
+    """Exécute les rapports `names` ; `read(name)` -> (DataFrame, lu dans le cache ?).
+
+    Les requêtes tournent dans `query_workers` threads ; chaque résultat est
+    rendu dans un pool de `render_workers` processus (0 = dans ce processus)
+    dès son arrivée. Retourne les mesures par rapport (ordre de `names`).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if render_workers is None:
+        render_workers = min(len(names), os.cpu_count() or 1)
+    timings = {name: {'report': name, 'rows': None, 'cache_hit': None, 'query_seconds': None,
+                      'render_seconds': None, 'done_seconds': None, 'files': [], 'skipped': [],
+                      'error': None} for name in names}
+    run_start = time.perf_counter()
+
+    def query(name):
+        start = time.perf_counter()
+        df, cache_hit = read(name)
+        return df, cache_hit, time.perf_counter() - start
+
+    def rendered(name, result):
+        written, skipped, seconds = result
+        timings[name].update(files=written, skipped=skipped, render_seconds=round(seconds, 4),
+                             done_seconds=round(time.perf_counter() - run_start, 4))
+
+    # spawn : processus neufs, plotly importé dans les seuls processus de rendu
+    render_pool = (ProcessPoolExecutor(max_workers=render_workers, mp_context=multiprocessing.get_context('spawn'))
+                   if render_workers else None)
+    renders = {}
+    try:
+        with ThreadPoolExecutor(max_workers=query_workers) as query_pool:
+            queries = {query_pool.submit(query, name): name for name in names}
+            for future in as_completed(queries):
+                name = queries[future]
+                try:
+                    df, cache_hit, seconds = future.result()
+                except Exception as e:
+                    timings[name]['error'] = f"requête : {e}"
+                    continue
+                timings[name].update(rows=len(df), cache_hit=cache_hit, query_seconds=round(seconds, 4))
+                if render_pool is not None:
+                    renders[render_pool.submit(render_report, name, df, output_dir, formats)] = name
+                    continue
+                try:
+                    rendered(name, render_report(name, df, output_dir, formats))
+                except Exception as e:
+                    timings[name]['error'] = f"rendu : {e}"
+        for future in as_completed(renders):
+            name = renders[future]
+            try:
+                rendered(name, future.result())
+            except Exception as e:
+                timings[name]['error'] = f"rendu : {e}"
+    finally:
+        if render_pool is not None:
+            render_pool.shutdown()
+    return {
+        'run_id': pd.Timestamp.now().strftime('%Y%m%dT%H%M%S'),
+        'total_seconds': round(time.perf_counter() - run_start, 4),
+        'query_workers': query_workers,
+        'render_workers': render_workers,
+        'reports': [timings[name] for name in names],
+    }
+
+
+def write_timings(run, directory=REPORTS_STATE_DIR):
+    """Écrit les durées du run et les ajoute à l'historique (suivi du temps de production nocturne)."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"reports_{run['run_id']}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2, ensure_ascii=False)
+    with open(os.path.join(directory, HISTORY_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, ensure_ascii=False) + '\n')
+    return path
+
+
+def print_timings(run):
+    print("\n--- Durées par rapport ---")
+    for r in run['reports']:
+        if r['error']:
+            print(f"  ❌ {r['report']} : {r['error']}")
+            continue
+        source = 'cache' if r['cache_hit'] else 'requête'
+        print(f"  - {r['report']} : {source} {r['query_seconds']:.2f} s, rendu {r['render_seconds']:.2f} s, "
+              f"terminé à {r['done_seconds']:.2f} s, {r['rows']} lignes, {len(r['files'])} fichier(s)")
+        for skipped in r['skipped']:
+            print(f"    ⚠️  Non produit : {skipped}")
+    busy = sum((r['query_seconds'] or 0) + (r['render_seconds'] or 0) for r in run['reports'])
+    print(f"⏱️  {len(run['reports'])} rapport(s) en {run['total_seconds']:.2f} s "
+          f"(somme des durées : {busy:.2f} s ; {run['query_workers']} requêtes et "
+          f"{run['render_workers']} processus de rendu en parallèle)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Production des rapports d'analyse sans notebook")
+    parser.add_argument('reports', nargs='*', metavar='RAPPORT',
+                        help=f"Rapports à produire (défaut : tous) : {', '.join(REPORTS)}")
+    parser.add_argument('--output', default=FIGURES_DIR, help="Dossier des fichiers produits (défaut : %(default)s)")
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['html'],
+                        help="Formats des graphiques (png : nécessite kaleido ; défaut : html)")
+    parser.add_argument('--offline', action='store_true',
+                        help="Requêtes exécutées en mémoire sur la couche CLEAN au lieu du DW")
+    parser.add_argument('--clean-dir', default=analytics.CLEAN_DIR, help="Couche CLEAN pour --offline (défaut : %(default)s)")
+    parser.add_argument('--dw-sqlite', help="Data Warehouse SQLite (défaut : SQL Server)")
+    parser.add_argument('--dw-conn', help="Chaîne de connexion SQLAlchemy du DW")
+    parser.add_argument('--no-cache', action='store_true', help="Ignorer le cache de requêtes (data/cache/notebook/)")
+    parser.add_argument('--query-workers', type=int, default=DEFAULT_QUERY_WORKERS,
+                        help="Requêtes simultanées, et taille du pool de connexions (défaut : %(default)s)")
+    parser.add_argument('--render-workers', type=int,
+                        help="Processus de rendu (défaut : un par CPU ; 0 = rendu dans ce processus)")
+    args = parser.parse_args()
+
+    names = args.reports or list(REPORTS)
+    unknown = [name for name in names if name not in REPORTS]
+    if unknown:
+        parser.error(f"rapport(s) inconnu(s) : {', '.join(unknown)} (disponibles : {', '.join(REPORTS)})")
+    if args.offline:
+        try:
+            read = offline_reader(args.clean_dir)
+        except FileNotFoundError as e:
+            parser.error(str(e))
+        print(f"Rapports hors ligne sur {args.clean_dir} : {', '.join(names)}")
+    else:
+        url = f'sqlite:///{args.dw_sqlite}' if args.dw_sqlite else (args.dw_conn or analytics.DW_CONN_STRING)
+        # Pool partagé par les threads de requêtes : une connexion par requête en cours
+        dw_engine = create_engine(url, pool_size=args.query_workers, max_overflow=0)
+        read = dw_reader(dw_engine, use_cache=not args.no_cache)
+        print(f"Rapports sur le Data Warehouse ({dw_engine.dialect.name}) : {', '.join(names)}")
+
+    run = run_reports(names, read, args.output, args.formats, args.query_workers, args.render_workers)
+    print_timings(run)
+    print(f"📄 Durées enregistrées dans {write_timings(run)}")
+    print(f"✅ Fichiers produits dans {args.output}")
+    if any(r['error'] for r in run['reports']):
+        sys.exit(1)
@@ -0,0 +1,149 @@
+# =================================================================
+# UPSERT DES DIMENSIONS AVEC HISTORIQUE (SCD Type 2)
+# =================================================================
+# Au lieu de réécrire chaque dimension (to_sql if_exists='replace'), on
+# compare une empreinte (hash) de chaque membre à celle de sa version
+# courante dans le Data Warehouse :
+#   - membre nouveau   -> insertion (ValidFrom = run, IsCurrent = 1)
+#   - membre modifié   -> version courante clôturée (ValidTo, IsCurrent = 0)
+#                         + insertion de la nouvelle version
+#   - membre inchangé  -> rien n'est écrit
+#   - membre supprimé  -> version courante clôturée, sans nouvelle version
+#                         (dimensions reçues en entier à chaque run seulement)
+# Un run sans changement dans les dimensions n'écrit donc aucune ligne.
+# Un attribut ajouté à la dimension est ajouté à la table (ALTER TABLE, NULL
+# pour les versions existantes) : l'empreinte de chaque membre change, et
+# tous reçoivent une nouvelle version portant l'attribut.
+
+import pandas as pd
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Numeric, Text, inspect, text
+
+import schema
+
+SCD_COLUMNS = ['RowHash', 'ValidFrom', 'ValidTo', 'IsCurrent']
+
+# Clé (durable) de chaque dimension : identique pour toutes les versions d'un membre
+DIMENSION_KEYS = {
+    'DimDate': 'DateKey',
+    'DimCustomers': 'CustomerKey',
+    'DimProducts': 'ProductKey',
+    'DimEmployees': 'EmployeeKey',
+    'DimShippers': 'ShipperKey',
+    'DimSuppliers': 'SupplierKey',
+}
+
+# Dimensions extraites en entier à chaque run : un membre courant absent du run
+# a été supprimé de sa source. DimDate (calendrier généré, jamais réduit) est exclue.
+SNAPSHOT_DIMENSIONS = {'DimCustomers', 'DimProducts', 'DimEmployees', 'DimShippers', 'DimSuppliers'}
+# Seuls les membres des systèmes sources présents dans le run sont clôturés :
+# une source indisponible (Access absent) ne supprime pas ses membres
+SOURCE_COLUMN = 'SourceSystem'
+
+
+def row_hash(df, columns):
+    """Empreinte 64 bits de chaque ligne, calculée sur les attributs en texte
+    (insensible aux variations de type int/float entre deux extractions)."""
+    hashes = pd.util.hash_pandas_object(df[columns].astype('string'), index=False)
+    return pd.Series(hashes.to_numpy().view('int64'), index=df.index)
+
+
+def _column_type(series, dialect):
+    """Type SQL d'une colonne ajoutée (mêmes familles que DataFrame.to_sql)."""
+    if schema.is_money(series):
+        sql_type = Numeric(19, schema.MONEY_DECIMALS)
+    elif pd.api.types.is_bool_dtype(series):
+        sql_type = Boolean()
+    elif pd.api.types.is_integer_dtype(series):
+        sql_type = BigInteger()
+    elif pd.api.types.is_float_dtype(series):
+        sql_type = Float()
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        sql_type = DateTime()
+    else:
+        sql_type = Text()
+    return sql_type.compile(dialect=dialect)
+
+
+def _versioned(df, run_time):
+    return df.assign(ValidFrom=run_time, ValidTo=pd.NaT, IsCurrent=1)
+
+
+def upsert_dimension(loader, df, table, key_column, run_time=None, close_missing=False):
+    """Applique les changements de `df` à la dimension `table` (SCD Type 2).
+
+    close_missing : `df` contient tous les membres de la source ; les membres
+    courants absents (des systèmes sources présents dans `df`) sont clôturés.
+    Retourne {'inserted', 'changed', 'unchanged', 'closed'}.
+    """
+    engine = loader.engine
+    run_time = run_time or pd.Timestamp.now().floor('s')
+    attributes = [c for c in df.columns if c != key_column]
+    incoming = df.assign(RowHash=row_hash(df, attributes))
+
+    existing_columns = set()
+    if inspect(engine).has_table(table):
+        existing_columns = {col['name'] for col in inspect(engine).get_columns(table)}
+    if not set(SCD_COLUMNS) <= existing_columns:
+        # Premier chargement (ou table créée avant l'historisation) : création complète
+        loader.replace_table(_versioned(incoming, run_time), table)
+        return {'inserted': len(incoming), 'changed': 0, 'unchanged': 0, 'closed': 0}
+
+    q = loader.quote
+    by_source = SOURCE_COLUMN in existing_columns and SOURCE_COLUMN in incoming.columns
+    selected = [key_column, 'RowHash'] + ([SOURCE_COLUMN] if by_source else [])
+    current = pd.read_sql(
+        text(f'SELECT {", ".join(q(c) for c in selected)} FROM {q(table)} WHERE {q("IsCurrent")} = 1'),
+        engine,
+    ).rename(columns={'RowHash': 'RowHash_DW'})
+    # Membres supprimés de la source : courants dans le DW, absents du run
+    removed_keys = current[key_column].iloc[:0]
+    if close_missing:
+        missing = ~current[key_column].isin(incoming[key_column])
+        if by_source:
+            missing &= current[SOURCE_COLUMN].astype('string').isin(incoming[SOURCE_COLUMN].dropna().astype('string'))
+        removed_keys = current.loc[missing, key_column]
+    current = current[[key_column, 'RowHash_DW']]
+    # Int64 (nullable) : un passage par float64 après la jointure tronquerait les hash
+    current['RowHash_DW'] = current['RowHash_DW'].astype('Int64')
+    compared = incoming.merge(current, on=key_column, how='left')
+    is_new = compared['RowHash_DW'].isna().to_numpy()
+    differs = compared['RowHash'].ne(compared['RowHash_DW']).fillna(True).to_numpy(dtype=bool)
+    is_changed = ~is_new & differs
+
+    to_insert = _versioned(incoming[is_new | is_changed], run_time)
+    closed_keys = pd.concat([compared.loc[is_changed, key_column], removed_keys], ignore_index=True)
+    # Attributs absents de la table (ajoutés depuis le chargement précédent)
+    added = [c for c in attributes if c not in existing_columns]
+    if to_insert.empty and closed_keys.empty and not added:
+        return {'inserted': 0, 'changed': 0, 'unchanged': len(incoming), 'closed': 0}
+
+    # Clôture + insertion dans une seule transaction : un membre a toujours une version courante
+    valid_to = loader.to_records(pd.DataFrame({'ValidTo': [run_time]}))[0][0]
+    columns = list(to_insert.columns)
+    params = [f'p{i}' for i in range(len(columns))]
+    insert_sql = text(
+        f'INSERT INTO {q(table)} ({", ".join(q(c) for c in columns)}) '
+        f'VALUES ({", ".join(":" + p for p in params)})'
+    )
+    close_sql = text(
+        f'UPDATE {q(table)} SET {q("ValidTo")} = :valid_to, {q("IsCurrent")} = 0 '
+        f'WHERE {q(key_column)} = :key AND {q("IsCurrent")} = 1'
+    )
+    with engine.begin() as connection:
+        for column in added:
+            connection.execute(text(
+                f'ALTER TABLE {q(table)} ADD {q(column)} {_column_type(incoming[column], engine.dialect)}'
+            ))
+        if len(closed_keys):
+            connection.execute(close_sql, [
+                {'valid_to': valid_to, 'key': int(key)} for key in closed_keys
+            ])
+        if not to_insert.empty:
+            connection.execute(insert_sql, [dict(zip(params, row)) for row in loader.to_records(to_insert)])
+
+    return {
+        'inserted': int(is_new.sum()),
+        'changed': int(is_changed.sum()),
+        'unchanged': len(incoming) - len(to_insert),
+        'closed': len(removed_keys),
+    }
@@ -0,0 +1,238 @@
+# =================================================================
+# REGISTRE DES SCHÉMAS : types compacts pour toutes les tables
+# =================================================================
+# `pd.read_sql` infère des types larges : texte en 'object', int64/float64
+# partout, colonnes nullables élargies en 'object' ou en float. Le registre
+# déclare le type cible de chaque colonne :
+#   - 'category'     : texte à faible cardinalité (pays, villes, catégories...)
+#   - 'string'       : texte libre ou identifiant unique (stockage Arrow si disponible)
+#   - 'Int8'..'Int32': entiers réduits, nullables (NULL conservé sans passer en float)
+#   - 'money'        : montant décimal exact DECIMAL(19, 4), le type money de
+#                      SQL Server (décimal Arrow ; float64 arrondi sans pyarrow)
+#   - 'datetime'     : datetime64
+# Les tables sources sont converties dès l'extraction, les dimensions et
+# FactSales après leur construction ; la mémoire avant/après est rapportée.
+# Les tables Access gardent leurs noms de colonnes jusqu'à la consolidation :
+# une colonne Access (`Unit Price`) reçoit le type de son nom canonique.
+
+import numpy as np
+import pandas as pd
+
+import consolidation
+
+MONEY_DECIMALS = 4
+MONEY_SCALE = 10 ** MONEY_DECIMALS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    STRING_DTYPE = pd.StringDtype('pyarrow')
+    MONEY_DTYPE = pd.ArrowDtype(pa.decimal128(19, MONEY_DECIMALS))
+except ImportError:
+    pa = pc = None
+    STRING_DTYPE = pd.StringDtype()
+    MONEY_DTYPE = None
+
+# Colonnes des tables extraites (noms SQL Server ; les tables Access partagent
+# le schéma de leur équivalent SQL via SOURCE_TABLES). Les colonnes non
+# déclarées (adresses, téléphones, notes...) gardent le type lu.
+SOURCE_SCHEMAS = {
+    'Orders': {
+        'OrderID': 'Int32', 'CustomerID': 'category', 'EmployeeID': 'Int16',
+        'OrderDate': 'datetime', 'RequiredDate': 'datetime', 'ShippedDate': 'datetime',
+        'ShipVia': 'Int8', 'Freight': 'money',
+        'ShipCity': 'category', 'ShipRegion': 'category', 'ShipCountry': 'category',
+    },
+    'OrderDetails': {
+        'OrderID': 'Int32', 'ProductID': 'Int32', 'UnitPrice': 'money',
+        'Quantity': 'Int16', 'Discount': 'money',
+    },
+    'Customers': {
+        'CustomerID': 'string', 'ContactTitle': 'category',
+        'City': 'category', 'Region': 'category', 'Country': 'category',
+    },
+    'Products': {
+        'ProductID': 'Int32', 'SupplierID': 'Int32', 'CategoryID': 'Int16', 'UnitPrice': 'money',
+        'UnitsInStock': 'Int16', 'UnitsOnOrder': 'Int16', 'ReorderLevel': 'Int16', 'Discontinued': 'Int8',
+    },
+    'Categories': {'CategoryID': 'Int16', 'CategoryName': 'category'},
+    'Employees': {
+        'EmployeeID': 'Int16', 'Title': 'category', 'TitleOfCourtesy': 'category',
+        'City': 'category', 'Region': 'category', 'Country': 'category', 'ReportsTo': 'Int16',
+    },
+    'Shippers': {'ShipperID': 'Int8'},
+    'Suppliers': {
+        'SupplierID': 'Int32', 'ContactTitle': 'category',
+        'City': 'category', 'Region': 'category', 'Country': 'category',
+    },
+}
+
+# Table extraite -> schéma source
+SOURCE_TABLES = {
+    'Orders': 'Orders', 'Orders_Access': 'Orders',
+    'OrderDetails': 'OrderDetails', 'OrderDetails_Access': 'OrderDetails',
+    'Customers_SQL': 'Customers', 'Customers_Access': 'Customers',
+    'Products': 'Products', 'Products_Access': 'Products',
+    'Suppliers': 'Suppliers', 'Suppliers_Access': 'Suppliers',
+    'Categories': 'Categories', 'Employees': 'Employees', 'Shippers': 'Shippers',
+}
+
+# Schéma complet des tables du Data Warehouse
+DW_SCHEMAS = {
+    'DimDate': {
+        'DateKey': 'Int32', 'Date': 'datetime', 'Year': 'Int16', 'Quarter': 'Int8',
+        'Month': 'Int8', 'Day': 'Int8', 'DayName': 'category', 'MonthName': 'category',
+    },
+    'DimCustomers': {
+        'CustomerKey': 'Int32', 'CustomerID': 'string', 'SourceSystem': 'category',
+        'CustomerCompanyName': 'string', 'CustomerContactName': 'string',
+        'CustomerCountry': 'category', 'CustomerCity': 'category', 'CustomerNotes': 'string',
+    },
+    'DimProducts': {
+        'ProductKey': 'Int32', 'ProductID': 'Int32', 'SourceSystem': 'category', 'ProductName': 'string',
+        'CategoryName': 'category', 'StandardPrice': 'money', 'UnitsInStock': 'Int16',
+    },
+    'DimEmployees': {
+        'EmployeeKey': 'Int32', 'EmployeeID': 'Int16', 'SourceSystem': 'category',
+        'LastName': 'string', 'FirstName': 'string', 'Title': 'category',
+        'City': 'category', 'Country': 'category',
+    },
+    'DimShippers': {
+        'ShipperKey': 'Int32', 'ShipperID': 'Int8', 'SourceSystem': 'category', 'ShipperCompanyName': 'string',
+    },
+    'DimSuppliers': {
+        'SupplierKey': 'Int32', 'SupplierID': 'Int32', 'SourceSystem': 'category',
+        'SupplierCompanyName': 'string', 'Country': 'category',
+    },
+    'FactSales': {
+        'OrderID': 'Int32', 'CustomerKey': 'Int32', 'EmployeeKey': 'Int32', 'ShipperKey': 'Int32',
+        'ProductKey': 'Int32', 'OrderDateKey': 'Int32', 'ShippedDateKey': 'Int32',
+        'OrderQuantity': 'Int16', 'SaleUnitPrice': 'money', 'Discount': 'money',
+        'SalesAmount': 'money', 'Freight': 'money',
+    },
+}
+
+
+def schema_for(table, columns=()):
+    """Schéma de `table` ; `columns` (colonnes lues) : les variantes Access
+    renommées à la consolidation reçoivent le type de leur nom canonique."""
+    if table in DW_SCHEMAS:
+        return DW_SCHEMAS[table]
+    source_schema = SOURCE_SCHEMAS.get(SOURCE_TABLES.get(table), {})
+    mapping = consolidation.column_mapping(table)
+    if not mapping:
+        return source_schema
+    renames = consolidation.column_renames(columns, mapping)
+    return {**source_schema, **{
+        variant: source_schema[canonical] for variant, canonical in renames.items() if canonical in source_schema
+    }}
+
+
+def is_money(series):
+    """Colonne au type 'money' décimal exact."""
+    return MONEY_DTYPE is not None and series.dtype == MONEY_DTYPE
+
+
+def _rounded(series):
+    return pd.to_numeric(series, errors='coerce').astype('float64').round(MONEY_DECIMALS)
+
+
+def to_money(series):
+    """Montants au type 'money' (arrondis à MONEY_DECIMALS décimales)."""
+    if MONEY_DTYPE is None:
+        return _rounded(series)
+    if is_money(series):
+        return series
+    if series.dtype == object:
+        try:
+            # decimal.Decimal (money lu par pyodbc) : conversion exacte
+            return series.astype(MONEY_DTYPE)
+        except (TypeError, ValueError):
+            pass
+    return _rounded(series).astype(MONEY_DTYPE)
+
+
+def money_units(series):
+    """(montants en entiers int64 de 1/MONEY_SCALE, masque des nulls)."""
+    missing = series.isna().to_numpy()
+    if is_money(series):
+        # DECIMAL(19, 4) x 10^4 : entier exact (la plage money tient dans un int64)
+        scaled = pc.multiply(pa.array(series).cast(pa.decimal128(23, MONEY_DECIMALS)),
+                             pa.scalar(MONEY_SCALE, pa.decimal128(5, 0)))
+        units = scaled.cast(pa.int64()).fill_null(0).to_numpy()
+    else:
+        units = np.rint(_rounded(series).fillna(0).to_numpy() * MONEY_SCALE).astype('int64')
+    return units, missing
+
+
+def from_units(units, missing, index=None):
+    """Série 'money' à partir d'entiers de 1/MONEY_SCALE (inverse de money_units)."""
+    if MONEY_DTYPE is None:
+        return pd.Series(np.where(missing, np.nan, units / MONEY_SCALE), index=index)
+    values = pc.divide(pa.array(units, mask=missing).cast(pa.decimal128(19, 0)),
+                       pa.scalar(MONEY_SCALE, pa.decimal128(5, 0)))
+    return pd.Series(pd.arrays.ArrowExtensionArray(values.cast(MONEY_DTYPE.pyarrow_dtype)), index=index)
+
+
+def line_amount(quantity, unit_price, discount):
+    """Quantité x prix x (1 - remise), calculé en entiers (valeur exacte) et
+    arrondi au 1/MONEY_SCALE le plus proche (au pair en cas d'égalité)."""
+    price, price_missing = money_units(unit_price)
+    remise, discount_missing = money_units(discount)
+    quantity = pd.to_numeric(quantity)
+    missing = price_missing | discount_missing | quantity.isna().to_numpy()
+    exact = quantity.fillna(0).to_numpy(dtype='int64') * price * (MONEY_SCALE - remise)
+    units, remainder = np.divmod(exact, MONEY_SCALE)
+    units += (2 * remainder > MONEY_SCALE) | ((2 * remainder == MONEY_SCALE) & (units % 2 == 1))
+    return from_units(units, missing, index=unit_price.index)
+
+
+def cast_column(series, dtype):
+    """Convertit une colonne vers le type logique `dtype` du registre."""
+    if dtype == 'category':
+        return series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype('category')
+    if dtype == 'string':
+        return series.astype(STRING_DTYPE)
+    if dtype == 'datetime':
+        return pd.to_datetime(series, errors='coerce')
+    if dtype == 'money':
+        return to_money(series)
+    # Entiers nullables : un float entier (1.0) est accepté, une valeur décimale lève une erreur
+    return pd.to_numeric(series, errors='coerce').astype(dtype)
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def enforce(df, table, report=None):
+    """Applique le schéma de `table` ; note la mémoire avant/après dans `report`.
+
+    Une colonne qui ne peut pas être convertie garde son type (avertissement).
+    """
+    schema = schema_for(table, df.columns)
+    columns = [c for c in df.columns if c in schema]
+    if not columns:
+        return df
+    before = memory_mb(df) if report is not None else None
+    df = df.copy(deep=False)
+    for col in columns:
+        try:
+            df[col] = cast_column(df[col], schema[col])
+        except (TypeError, ValueError) as e:
+            print(f"  ⚠️  {table}.{col} : conversion en {schema[col]} impossible ({e}), type conservé.")
+    if report is not None:
+        report[table] = (before, memory_mb(df))
+    return df
+
+
+def print_memory_report(report, title):
+    if not report:
+        return
+    print(f"  📦 Mémoire {title} (avant -> après typage) :")
+    for table, (before, after) in report.items():
+        change = (after / before - 1) if before else 0
+        print(f"    - {table} : {before:.2f} Mo -> {after:.2f} Mo ({change:+.0%})")
+    total_before = sum(b for b, _ in report.values())
+    total_after = sum(a for _, a in report.values())
+    print(f"    = Total : {total_before:.2f} Mo -> {total_after:.2f} Mo")
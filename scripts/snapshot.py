@@ -0,0 +1,111 @@
+# =================================================================
+# INSTANTANÉS VERSIONNÉS DES SOURCES EXTRAITES (rejeu hors ligne)
+# =================================================================
+# La couche RAW contient les tables consolidées : elle ne permet pas de
+# rejouer la consolidation. Un instantané conserve, tel qu'extrait, chaque
+# table de SQL Server (raw_data_sql) et d'Access (data_access), déjà typée :
+#   data/snapshots/<version>/sql/<table>.parquet
+#   data/snapshots/<version>/access/<table>.parquet
+#   data/snapshots/<version>/snapshot.json   (lignes et empreinte par table)
+# Le rejeu (etl.py --replay) relit ces fichiers (Parquet en mémoire mappée,
+# types conservés) dans les mêmes structures, puis exécute consolidation,
+# transformation et chargement sans interroger les sources.
+
+import json
+import os
+import shutil
+
+import pandas as pd
+
+import fingerprints
+import storage
+
+SNAPSHOT_DIR = 'data/snapshots/'
+SNAPSHOT_FILE = 'snapshot.json'
+LATEST_FILE = 'LATEST'
+SOURCES = ('sql', 'access')
+
+
+def _snapshot_path(version, directory):
+    return os.path.join(directory, version)
+
+
+def save(sources, version, directory=SNAPSHOT_DIR):
+    """Écrit {'sql': {table: df}, 'access': {table: df}} sous la version `version`.
+
+    L'instantané est écrit dans un dossier temporaire puis renommé : une
+    version listée est toujours complète.
+    """
+    path = _snapshot_path(version, directory)
+    tmp_path = path + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    fmt = 'parquet' if storage.parquet_available() else 'csv'
+    tables = {}
+    for source, frames in sources.items():
+        os.makedirs(os.path.join(tmp_path, source), exist_ok=True)
+        tables[source] = {}
+        for name, df in frames.items():
+            if fmt == 'parquet':
+                # Sans découpage par mois : l'ordre des lignes extraites est conservé
+                storage.write_parquet(df, os.path.join(tmp_path, source, f'{name}.parquet'))
+            else:
+                storage.write_table(df, os.path.join(tmp_path, source), name, 'csv')
+            tables[source][name] = {'rows': len(df), 'fingerprint': fingerprints.table_fingerprint(df)}
+    with open(os.path.join(tmp_path, SNAPSHOT_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': version,
+            'created_at': pd.Timestamp.now().floor('s').isoformat(),
+            'format': fmt,
+            'tables': tables,
+        }, f, indent=2, ensure_ascii=False)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    with open(os.path.join(directory, LATEST_FILE), 'w', encoding='utf-8') as f:
+        f.write(version)
+    return path
+
+
+def list_versions(directory=SNAPSHOT_DIR):
+    """Versions complètes disponibles (les plus anciennes d'abord)."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name for name in os.listdir(directory)
+        if os.path.exists(os.path.join(directory, name, SNAPSHOT_FILE))
+    )
+
+
+def resolve(version='latest', directory=SNAPSHOT_DIR):
+    """Version demandée ('latest' = dernier instantané écrit) ; ValueError si absente."""
+    if version == 'latest':
+        latest_path = os.path.join(directory, LATEST_FILE)
+        if os.path.exists(latest_path):
+            with open(latest_path, encoding='utf-8') as f:
+                version = f.read().strip()
+        else:
+            versions = list_versions(directory)
+            version = versions[-1] if versions else None
+    if not version or version not in list_versions(directory):
+        available = ', '.join(list_versions(directory)) or 'aucun (lancez etl.py --snapshot)'
+        raise ValueError(f"Instantané introuvable : {version} ; disponibles : {available}")
+    return version
+
+
+def describe(version, directory=SNAPSHOT_DIR):
+    with open(os.path.join(_snapshot_path(version, directory), SNAPSHOT_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load(version, source, directory=SNAPSHOT_DIR):
+    """Tables d'une source de l'instantané : {table: DataFrame} (dans l'ordre d'extraction)."""
+    info = describe(version, directory)
+    source_dir = os.path.join(_snapshot_path(version, directory), source)
+    return {name: storage.read_table(source_dir, name) for name in info['tables'].get(source, {})}
+
+
+def verify(version, source, tables, directory=SNAPSHOT_DIR, fingerprint=fingerprints.table_fingerprint):
+    """RuntimeError si une table relue n'a plus l'empreinte enregistrée dans l'instantané."""
+    expected = describe(version, directory)['tables'].get(source, {})
+    altered = [name for name, df in tables.items() if fingerprint(df) != expected[name]['fingerprint']]
+    if altered:
+        raise RuntimeError(f"Instantané {version} altéré (empreinte différente) : {', '.join(altered)}")
@@ -0,0 +1,127 @@
+# =================================================================
+# STOCKAGE DES COUCHES RAW / CLEAN (Parquet colonnaire ou CSV)
+# =================================================================
+# Parquet conserve les types (dates, entiers, décimaux), compresse chaque
+# colonne et permet de ne relire que les colonnes utiles. Les tables datées
+# sont triées par année/mois de commande et écrites avec UN row group par
+# mois : un filtre sur la période ne lit que les row groups concernés.
+# Le CSV (séparateur ';') reste disponible en export optionnel.
+
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+FORMATS = ('parquet', 'csv', 'both')
+PARQUET_COMPRESSION = 'zstd'
+
+# Colonne servant à découper les row groups par année/mois de commande
+PARTITION_COLUMNS = {
+    'Orders': 'OrderDate',
+    'Orders_Access': 'Order Date',
+    'FactSales': 'OrderDateKey',
+    'DimDate': 'DateKey',
+}
+
+
+def parquet_available():
+    return pq is not None
+
+
+def _year_month(series):
+    """Clé AAAAMM à partir d'une date ou d'une clé entière AAAAMMJJ."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.year * 100 + series.dt.month
+    if pd.api.types.is_numeric_dtype(series):
+        return series // 100
+    dates = pd.to_datetime(series, errors='coerce')
+    return dates.dt.year * 100 + dates.dt.month
+
+
+def _arrow_compatible(df):
+    """Convertit en texte les colonnes 'object' de types mélangés (ex. union
+    des colonnes SQL Server + Access), qu'Arrow ne sait pas typer."""
+    mixed = [
+        col for col in df.columns
+        if df[col].dtype == object
+        and pd.api.types.infer_dtype(df[col], skipna=True) in ('mixed', 'mixed-integer')
+    ]
+    if not mixed:
+        return df
+    df = df.copy()
+    for col in mixed:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def write_parquet(df, file_path, partition_column=None):
+    """Écrit `df` en Parquet compressé, un row group par année/mois si possible."""
+    tmp_path = file_path + '.tmp'
+    df = _arrow_compatible(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(tmp_path, table.schema, compression=PARQUET_COMPRESSION) as writer:
+        if partition_column and partition_column in df.columns and len(df):
+            year_month = _year_month(df[partition_column])
+            # Tri stable par mois (les dates inconnues en dernier) puis un row group par mois
+            year_month = year_month.reset_index(drop=True)
+            order = year_month.sort_values(kind='stable', na_position='last').index
+            df_sorted, year_month = df.iloc[order], year_month.iloc[order]
+            for _, part in df_sorted.groupby(year_month.fillna(-1).values, sort=False):
+                writer.write_table(pa.Table.from_pandas(part, schema=table.schema, preserve_index=False))
+        else:
+            writer.write_table(table)
+    os.replace(tmp_path, file_path)
+
+
+def _decimal_dtype(arrow_type):
+    return pd.ArrowDtype(arrow_type) if pa.types.is_decimal(arrow_type) else None
+
+
+def export_paths(directory, name, fmt='parquet'):
+    """Fichiers produits par `write_table` pour ce format."""
+    extensions = {'parquet': ['parquet'], 'csv': ['csv'], 'both': ['parquet', 'csv']}[fmt]
+    return [os.path.join(directory, f'{name}.{ext}') for ext in extensions]
+
+
+def write_table(df, directory, name, fmt='parquet'):
+    """Exporte une table de la couche RAW ou CLEAN ; retourne les fichiers écrits."""
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for file_path in export_paths(directory, name, fmt):
+        if file_path.endswith('.parquet'):
+            write_parquet(df, file_path, PARTITION_COLUMNS.get(name))
+        else:
+            df.to_csv(file_path, index=False, sep=';', encoding='utf-8')
+        written.append(file_path)
+    return written
+
+
+def read_table(directory, name, columns=None, filters=None):
+    """Relit une table (Parquet en priorité, sinon CSV).
+
+    - columns : colonnes à charger (les autres ne sont pas lues du disque)
+    - filters : filtres pyarrow, ex. [('OrderDateKey', '>=', 19970101)] ;
+      grâce aux statistiques des row groups, seuls les mois utiles sont lus.
+    """
+    parquet_path = os.path.join(directory, f'{name}.parquet')
+    if pq is not None and os.path.exists(parquet_path):
+        table = pq.read_table(parquet_path, columns=columns, filters=filters, memory_map=True)
+        # Montants DECIMAL relus en décimal Arrow (et non en objets decimal.Decimal)
+        return table.to_pandas(types_mapper=_decimal_dtype)
+    csv_path = os.path.join(directory, f'{name}.csv')
+    df = pd.read_csv(csv_path, sep=';', encoding='utf-8', usecols=columns)
+    if filters:
+        for column, op, value in filters:
+            df = df.query(f'`{column}` {op} @value')
+    return df
+
+
+def table_exists(directory, name):
+    return any(
+        os.path.exists(os.path.join(directory, f'{name}.{ext}')) for ext in ('parquet', 'csv')
+    )
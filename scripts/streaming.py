@@ -0,0 +1,103 @@
+# =================================================================
+# EXTRACTION EN FLUX (mémoire bornée) VERS data/raw/
+# =================================================================
+# Chaque requête est lue par blocs (fetchmany) et chaque bloc est écrit
+# immédiatement dans le CSV RAW : la mémoire utilisée dépend de la taille
+# d'un bloc (budget en lignes ou en octets), pas de la taille de la table.
+
+import os
+
+import pandas as pd
+
+try:
+    import psutil  # Optionnel : mesure précise de la RSS (Windows + Linux)
+except ImportError:
+    psutil = None
+
+# Repli sans psutil (Linux) : RSS courante lue dans /proc/self/statm
+STATM_PATH = '/proc/self/statm'
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+def current_rss_mb():
+    """RSS courante du processus en Mo (None si non mesurable).
+
+    Pas de repli sur resource.getrusage : ru_maxrss est le pic depuis le
+    démarrage du processus, pas la mémoire utilisée au moment de la mesure.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    try:
+        with open(STATM_PATH) as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+
+
+def _rows_per_chunk(chunk, chunk_bytes, chunk_rows):
+    """Ajuste la taille des blocs suivants au budget en octets."""
+    if not chunk_bytes or chunk.empty:
+        return chunk_rows
+    bytes_per_row = chunk.memory_usage(deep=True).sum() / len(chunk)
+    return max(1, int(chunk_bytes // max(bytes_per_row, 1)))
+
+
+def stream_query_to_csv(conn, query, file_path, chunk_rows=DEFAULT_CHUNK_ROWS,
+                        chunk_bytes=None, params=None):
+    """Lit `query` par blocs et les écrit au fil de l'eau dans `file_path`.
+
+    Retourne un dictionnaire {'rows', 'chunks', 'peak_rss_mb'}.
+    """
+    cursor = conn.cursor()
+    cursor.execute(query, params or [])
+    columns = [col[0] for col in cursor.description]
+
+    # Écriture dans un fichier temporaire puis rename : pas de CSV tronqué en cas d'échec
+    tmp_path = file_path + '.tmp'
+    rows, chunks = 0, 0
+    peak_rss = current_rss_mb()
+    batch_size = chunk_rows
+    try:
+        with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+            while True:
+                records = cursor.fetchmany(batch_size)
+                if not records:
+                    break
+                chunk = pd.DataFrame.from_records(records, columns=columns)
+                chunk.to_csv(f, index=False, sep=';', header=(chunks == 0))
+                rows += len(chunk)
+                chunks += 1
+                if chunks == 1:
+                    batch_size = _rows_per_chunk(chunk, chunk_bytes, chunk_rows)
+                rss = current_rss_mb()
+                if rss is not None:
+                    peak_rss = max(peak_rss, rss)
+                del chunk, records
+            if chunks == 0:
+                # Table vide : on écrit au moins l'en-tête
+                pd.DataFrame(columns=columns).to_csv(f, index=False, sep=';')
+        os.replace(tmp_path, file_path)
+    finally:
+        cursor.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {'rows': rows, 'chunks': chunks, 'peak_rss_mb': peak_rss}
+
+
+def stream_queries(conn, queries, output_dir, chunk_rows=DEFAULT_CHUNK_ROWS, chunk_bytes=None):
+    """Exporte chaque requête de `queries` dans `output_dir` en flux.
+
+    Affiche et retourne les statistiques par table.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    stats = {}
+    for table, query in queries.items():
+        file_path = os.path.join(output_dir, f'{table}.csv')
+        stats[table] = stream_query_to_csv(conn, query, file_path, chunk_rows, chunk_bytes)
+        peak = stats[table]['peak_rss_mb']
+        peak_txt = f"{peak:.1f} Mo" if peak is not None else "n/d"
+        print(f"  - {table}.csv : {stats[table]['rows']} lignes en {stats[table]['chunks']} blocs (pic RSS : {peak_txt})")
+    return stats
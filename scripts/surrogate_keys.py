@@ -0,0 +1,109 @@
+# =================================================================
+# REGISTRE DES CLÉS DE SUBSTITUTION (surrogate keys)
+# =================================================================
+# Chaque membre de dimension est identifié par (source, clé naturelle), par
+# ex. ('SQL', 'ALFKI') ou ('Access', 'ALFKI') : deux sources qui utilisent le
+# même identifiant ne s'écrasent plus. Le registre attribue à chaque couple
+# une clé entière compacte, stable d'un run à l'autre (persistée sur disque).
+# Les recherches sont vectorisées via un index de hachage (MultiIndex).
+
+import os
+
+import numpy as np
+import pandas as pd
+
+KEYS_DIR = 'data/state/keys/'
+
+# Source prioritaire quand une ligne de faits référence une clé naturelle
+# inconnue dans sa propre source (ex. commande Access -> client SQL Server)
+DEFAULT_SOURCE = 'SQL'
+
+
+def normalize_natural_keys(values):
+    """Clés naturelles en texte ; 1.0 et 1 donnent la même clé '1'."""
+    values = pd.Series(values).reset_index(drop=True)
+    if pd.api.types.is_numeric_dtype(values):
+        as_int = values.astype('Float64').round().astype('Int64')
+        return as_int.astype('string')
+    return values.astype('string').str.strip()
+
+
+class KeyRegistry:
+    """Registre persistant (source, clé naturelle) -> clé entière d'une dimension."""
+
+    def __init__(self, dimension, directory=KEYS_DIR):
+        self.dimension = dimension
+        self.path = os.path.join(directory, f'{dimension}.pkl')
+        if os.path.exists(self.path):
+            self.table = pd.read_pickle(self.path)
+        else:
+            self.table = pd.DataFrame({
+                'SourceSystem': pd.Series(dtype='string'),
+                'NaturalKey': pd.Series(dtype='string'),
+                'SurrogateKey': pd.Series(dtype='int32'),
+            })
+        self._build_index()
+
+    def _build_index(self):
+        self._index = pd.MultiIndex.from_arrays([self.table['SourceSystem'], self.table['NaturalKey']])
+        self._keys = self.table['SurrogateKey'].to_numpy()
+
+    def _positions(self, sources, natural_keys):
+        wanted = pd.MultiIndex.from_arrays([
+            pd.Series(sources).reset_index(drop=True).astype('string'),
+            normalize_natural_keys(natural_keys),
+        ])
+        return self._index.get_indexer(wanted)
+
+    def _to_keys(self, positions):
+        keys = pd.array(np.zeros(len(positions), dtype='int32'), dtype='Int32')
+        found = positions >= 0
+        keys[found] = self._keys[positions[found]]
+        keys[~found] = pd.NA
+        return keys
+
+    def assign(self, sources, natural_keys):
+        """Retourne les clés des couples donnés, en créant celles qui manquent."""
+        sources = pd.Series(sources).reset_index(drop=True).astype('string')
+        naturals = normalize_natural_keys(natural_keys)
+        positions = self._positions(sources, naturals)
+        missing = (positions < 0) & naturals.notna().to_numpy()
+        if missing.any():
+            new_members = pd.DataFrame({
+                'SourceSystem': sources[missing],
+                'NaturalKey': naturals[missing],
+            }).drop_duplicates()
+            next_key = int(self.table['SurrogateKey'].max()) + 1 if len(self.table) else 1
+            new_members['SurrogateKey'] = np.arange(next_key, next_key + len(new_members), dtype='int32')
+            self.table = pd.concat([self.table, new_members], ignore_index=True)
+            self._build_index()
+            positions = self._positions(sources, naturals)
+        return self._to_keys(positions)
+
+    def lookup(self, sources, natural_keys, fallback_source=DEFAULT_SOURCE):
+        """Résout des clés sans en créer (lignes de faits). Si le couple n'existe
+        pas dans la source de la ligne, on essaie la source prioritaire."""
+        positions = self._positions(sources, natural_keys)
+        unresolved = positions < 0
+        if fallback_source and unresolved.any():
+            fallback = self._positions([fallback_source] * len(positions), natural_keys)
+            positions = np.where(unresolved, fallback, positions)
+        return self._to_keys(positions)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        self.table.to_pickle(tmp_path)
+        os.replace(tmp_path, self.path)
+
+
+def add_surrogate_key(df, registry, natural_column, key_column):
+    """Ajoute (en première colonne) la clé de substitution de chaque membre.
+
+    Les lignes sans clé naturelle ne peuvent pas être identifiées : elles sont
+    écartées de la dimension.
+    """
+    df = df[df[natural_column].notna()].copy()
+    keys = registry.assign(df['SourceSystem'], df[natural_column])
+    df.insert(0, key_column, keys)
+    return df
@@ -0,0 +1,264 @@
+# =================================================================
+# GÉNÉRATEUR DE DONNÉES NORTHWIND SYNTHÉTIQUES (tests de montée en charge)
+# =================================================================
+# Produit deux bases SQLite au schéma des sources de l'ETL :
+#   - une base "SQL Server" : Orders, Order Details, Customers, Products,
+#     Categories, Employees, Shippers, Suppliers ;
+#   - une base "Access" qui recouvre en partie la première (mêmes CustomerID,
+#     ProductID, SupplierID, commandes et lignes de détail en double) et
+#     utilise les noms de colonnes Access (`Order ID`, `ID`, `Company`...).
+# Le volume est multiplié par un facteur d'échelle (1x = taille de l'échantillon
+# Northwind). L'intégrité référentielle est respectée : chaque commande
+# référence un client, un employé et un transporteur existants, chaque ligne
+# de détail une commande et un produit existants.
+#
+# Exemple :
+#   python scripts/synthetic_northwind.py --scale 100 --output data/synthetic
+
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# Volumes de l'échantillon Northwind (facteur 1)
+BASE_COUNTS = {
+    'Customers': 91,
+    'Suppliers': 29,
+    'Products': 77,
+    'Orders': 830,
+}
+# Tables de référence : volume fixe quel que soit le facteur
+CATEGORY_NAMES = [
+    'Beverages', 'Condiments', 'Confections', 'Dairy Products',
+    'Grains/Cereals', 'Meat/Poultry', 'Produce', 'Seafood',
+]
+SHIPPER_NAMES = ['Speedy Express', 'United Package', 'Federal Shipping']
+EMPLOYEES = pd.DataFrame({
+    'EmployeeID': np.arange(1, 10),
+    'LastName': ['Davolio', 'Fuller', 'Leverling', 'Peacock', 'Buchanan', 'Suyama', 'King', 'Callahan', 'Dodsworth'],
+    'FirstName': ['Nancy', 'Andrew', 'Janet', 'Margaret', 'Steven', 'Michael', 'Robert', 'Laura', 'Anne'],
+    'Title': ['Sales Representative', 'Vice President, Sales', 'Sales Representative',
+              'Sales Representative', 'Sales Manager', 'Sales Representative',
+              'Sales Representative', 'Inside Sales Coordinator', 'Sales Representative'],
+    'City': ['Seattle', 'Tacoma', 'Kirkland', 'Redmond', 'London', 'London', 'London', 'Seattle', 'London'],
+    'Country': ['USA', 'USA', 'USA', 'USA', 'UK', 'UK', 'UK', 'USA', 'UK'],
+})
+COUNTRIES = np.array([
+    ('Germany', 'Berlin'), ('Mexico', 'México D.F.'), ('UK', 'London'), ('Sweden', 'Luleå'),
+    ('France', 'Paris'), ('Spain', 'Madrid'), ('Canada', 'Montréal'), ('Argentina', 'Buenos Aires'),
+    ('Switzerland', 'Bern'), ('Brazil', 'Rio de Janeiro'), ('Austria', 'Graz'), ('Italy', 'Torino'),
+    ('Portugal', 'Lisboa'), ('USA', 'Seattle'), ('Venezuela', 'Caracas'), ('Ireland', 'Cork'),
+    ('Belgium', 'Bruxelles'), ('Norway', 'Stavern'), ('Denmark', 'København'), ('Finland', 'Oulu'),
+    ('Poland', 'Warszawa'),
+])
+FIRST_ORDER_DATE = pd.Timestamp('1996-07-04')
+LAST_ORDER_DATE = pd.Timestamp('1998-05-06')
+# 1 à 4 lignes de détail par commande : 2,5 en moyenne (2155 / 830 ≈ 2,6 dans Northwind)
+MAX_LINES_PER_ORDER = 4
+
+# Part des données SQL reprises dans la source Access (doublons volontaires)
+ACCESS_OVERLAP = 0.10
+# Commandes propres à Access, en proportion des commandes SQL
+ACCESS_NEW_ORDERS = 0.05
+
+
+def _ids(prefix, n, width):
+    return prefix + pd.Series(np.arange(1, n + 1)).astype(str).str.zfill(width)
+
+
+def _pick(rng, values, n):
+    return np.asarray(values)[rng.integers(0, len(values), n)]
+
+
+def generate_sql_source(scale=1, seed=42):
+    """Tables de la source SQL Server, volume multiplié par `scale`."""
+    rng = np.random.default_rng(seed)
+    n = {table: max(1, int(round(count * scale))) for table, count in BASE_COUNTS.items()}
+
+    places = COUNTRIES[rng.integers(0, len(COUNTRIES), n['Customers'])]
+    customers = pd.DataFrame({
+        'CustomerID': _ids('C', n['Customers'], 7),
+        'CompanyName': _ids('Company ', n['Customers'], 7),
+        'ContactName': _ids('Contact ', n['Customers'], 7),
+        'ContactTitle': _pick(rng, ['Owner', 'Sales Representative', 'Marketing Manager'], n['Customers']),
+        'City': places[:, 1],
+        'Country': places[:, 0],
+        'Phone': _ids('030-', n['Customers'], 7),
+    })
+
+    supplier_places = COUNTRIES[rng.integers(0, len(COUNTRIES), n['Suppliers'])]
+    suppliers = pd.DataFrame({
+        'SupplierID': np.arange(1, n['Suppliers'] + 1),
+        'CompanyName': _ids('Supplier ', n['Suppliers'], 6),
+        'City': supplier_places[:, 1],
+        'Country': supplier_places[:, 0],
+    })
+
+    categories = pd.DataFrame({
+        'CategoryID': np.arange(1, len(CATEGORY_NAMES) + 1),
+        'CategoryName': CATEGORY_NAMES,
+        'Description': [f'{name} products' for name in CATEGORY_NAMES],
+    })
+
+    unit_prices = np.round(rng.gamma(2.0, 14.0, n['Products']) + 2.5, 2)
+    products = pd.DataFrame({
+        'ProductID': np.arange(1, n['Products'] + 1),
+        'ProductName': _ids('Product ', n['Products'], 7),
+        'SupplierID': rng.integers(1, n['Suppliers'] + 1, n['Products']),
+        'CategoryID': rng.integers(1, len(CATEGORY_NAMES) + 1, n['Products']),
+        'UnitPrice': unit_prices,
+        'UnitsInStock': rng.integers(0, 125, n['Products']),
+        'Discontinued': (rng.random(n['Products']) < 0.1).astype(int),
+    })
+
+    shippers = pd.DataFrame({
+        'ShipperID': np.arange(1, len(SHIPPER_NAMES) + 1),
+        'CompanyName': SHIPPER_NAMES,
+        'Phone': ['(503) 555-9831', '(503) 555-3199', '(503) 555-9931'],
+    })
+
+    # Commandes : dates uniformes sur la période Northwind, croissantes avec OrderID
+    span_days = (LAST_ORDER_DATE - FIRST_ORDER_DATE).days
+    order_dates = FIRST_ORDER_DATE + pd.to_timedelta(
+        np.sort(rng.integers(0, span_days + 1, n['Orders'])), unit='D'
+    )
+    shipped_after = rng.integers(1, 36, n['Orders'])
+    shipped = order_dates + pd.to_timedelta(shipped_after, unit='D')
+    # Quelques commandes non encore expédiées (ShippedDate NULL)
+    shipped = shipped.where(rng.random(n['Orders']) >= 0.03)
+    customer_of_order = customers['CustomerID'].to_numpy()[rng.integers(0, n['Customers'], n['Orders'])]
+    ship_places = customers.set_index('CustomerID').loc[customer_of_order, ['City', 'Country']].to_numpy()
+    orders = pd.DataFrame({
+        'OrderID': np.arange(10248, 10248 + n['Orders']),
+        'CustomerID': customer_of_order,
+        'EmployeeID': rng.integers(1, len(EMPLOYEES) + 1, n['Orders']),
+        'OrderDate': order_dates,
+        'RequiredDate': order_dates + pd.Timedelta(days=28),
+        'ShippedDate': shipped,
+        'ShipVia': rng.integers(1, len(SHIPPER_NAMES) + 1, n['Orders']),
+        'Freight': np.round(rng.gamma(1.2, 65.0, n['Orders']), 2),
+        'ShipCity': ship_places[:, 0],
+        'ShipCountry': ship_places[:, 1],
+    })
+
+    # Lignes de détail : 1 à MAX_LINES_PER_ORDER produits distincts par commande
+    lines_per_order = rng.integers(1, MAX_LINES_PER_ORDER + 1, n['Orders'])
+    order_ids = np.repeat(orders['OrderID'].to_numpy(), lines_per_order)
+    # Produits distincts dans une commande : décalage de 1..k à partir d'un produit de départ
+    first_product = np.repeat(rng.integers(0, n['Products'], n['Orders']), lines_per_order)
+    line_number = np.arange(len(order_ids)) - np.repeat(np.cumsum(lines_per_order) - lines_per_order, lines_per_order)
+    product_ids = (first_product + line_number) % n['Products'] + 1
+    order_details = pd.DataFrame({
+        'OrderID': order_ids,
+        'ProductID': product_ids,
+        'UnitPrice': unit_prices[product_ids - 1],
+        'Quantity': rng.integers(1, 121, len(order_ids)),
+        'Discount': _pick(rng, [0.0, 0.0, 0.0, 0.05, 0.1, 0.15, 0.2, 0.25], len(order_ids)),
+    })
+
+    return {
+        'Orders': orders,
+        'Order Details': order_details,
+        'Customers': customers,
+        'Products': products,
+        'Categories': categories,
+        'Employees': EMPLOYEES.copy(),
+        'Shippers': shippers,
+        'Suppliers': suppliers,
+    }
+
+
+def generate_access_source(sql_tables, seed=42):
+    """Source Access recouvrant la source SQL (doublons volontaires) + commandes propres."""
+    rng = np.random.default_rng(seed + 1)
+
+    def overlap(df):
+        return df.sample(frac=ACCESS_OVERLAP, random_state=seed).sort_index()
+
+    customers = overlap(sql_tables['Customers'])
+    customers = pd.DataFrame({
+        'ID': np.arange(1, len(customers) + 1),
+        'Company': customers['CompanyName'].to_numpy(),
+        'CustomerID': customers['CustomerID'].to_numpy(),
+        'Notes': np.where(rng.random(len(customers)) < 0.5, 'This is a customer note.', None),
+    })
+    products = overlap(sql_tables['Products'])[['ProductID', 'ProductName', 'CategoryID', 'UnitPrice', 'UnitsInStock']]
+    suppliers = overlap(sql_tables['Suppliers'])[['SupplierID', 'CompanyName', 'Country']]
+
+    # Commandes en double (déjà présentes côté SQL) + nouvelles commandes Access
+    sql_orders = sql_tables['Orders']
+    duplicated = overlap(sql_orders)
+    n_new = max(1, int(round(len(sql_orders) * ACCESS_NEW_ORDERS)))
+    new_orders = sql_orders.sample(n=n_new, replace=True, random_state=seed + 2).copy()
+    # Les nouvelles commandes reprennent les lignes de détail d'une commande SQL existante
+    copied_from = new_orders['OrderID'].to_numpy()
+    new_orders['OrderID'] = sql_orders['OrderID'].max() + 1 + np.arange(n_new)
+    orders = pd.concat([duplicated, new_orders], ignore_index=True)
+    orders.insert(0, 'Order ID', np.arange(1, len(orders) + 1))
+    orders = orders[['Order ID', 'OrderID', 'CustomerID', 'EmployeeID', 'OrderDate',
+                     'RequiredDate', 'ShippedDate', 'ShipVia', 'Freight']]
+
+    # Détails : ceux des commandes en double (doublons OrderID/ProductID) + ceux des nouvelles commandes
+    sql_details = sql_tables['Order Details']
+    source_ids = np.concatenate([duplicated['OrderID'].to_numpy(), copied_from])
+    details = sql_details.merge(
+        pd.DataFrame({'SourceOrderID': source_ids, 'OrderID_new': orders['OrderID'].to_numpy(),
+                      'Order ID': orders['Order ID'].to_numpy()}),
+        left_on='OrderID', right_on='SourceOrderID',
+    )
+    details = pd.DataFrame({
+        'ID': np.arange(1, len(details) + 1),
+        'Order ID': details['Order ID'].to_numpy(),
+        'OrderID': details['OrderID_new'].to_numpy(),
+        'ProductID': details['ProductID'].to_numpy(),
+        'UnitPrice': details['UnitPrice'].to_numpy(),
+        'Quantity': details['Quantity'].to_numpy(),
+        'Discount': details['Discount'].to_numpy(),
+    })
+
+    return {
+        'Customers': customers,
+        'Products': products,
+        'Suppliers': suppliers,
+        'Orders': orders,
+        'Order Details': details,
+    }
+
+
+def write_sqlite(tables, path):
+    """Écrit les tables dans une base SQLite neuve (dates en TIMESTAMP)."""
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with sqlite3.connect(path) as conn:
+        for name, df in tables.items():
+            df.to_sql(name, conn, index=False, chunksize=50_000)
+    return path
+
+
+def generate(scale, output_dir, seed=42):
+    """Génère les deux bases sources ; retourne (chemin SQL, chemin Access, volumes)."""
+    sql_tables = generate_sql_source(scale, seed)
+    access_tables = generate_access_source(sql_tables, seed)
+    sql_path = write_sqlite(sql_tables, os.path.join(output_dir, 'northwind_sql.db'))
+    access_path = write_sqlite(access_tables, os.path.join(output_dir, 'northwind_access.db'))
+    volumes = {f'SQL.{name}': len(df) for name, df in sql_tables.items()}
+    volumes.update({f'Access.{name}': len(df) for name, df in access_tables.items()})
+    return sql_path, access_path, volumes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Génère des sources Northwind synthétiques (SQLite)")
+    parser.add_argument('--scale', type=float, default=1,
+                        help="Facteur de volume (1 = échantillon Northwind, défaut : %(default)s)")
+    parser.add_argument('--output', default='data/synthetic',
+                        help="Dossier des bases générées (défaut : %(default)s)")
+    parser.add_argument('--seed', type=int, default=42, help="Graine aléatoire (défaut : %(default)s)")
+    args = parser.parse_args()
+
+    sql_path, access_path, volumes = generate(args.scale, args.output, args.seed)
+    print(f"✅ Sources synthétiques (x{args.scale:g}) : {sql_path}, {access_path}")
+    for name, count in volumes.items():
+        print(f"  - {name} : {count} lignes")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules de scripts/ s'importent à plat (import incremental, import fact_builder...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
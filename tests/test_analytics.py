@@ -0,0 +1,85 @@
+# Moteur d'analyse en mémoire : mêmes résultats que les requêtes SQL sur le DW
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+import analytics
+import dim_date
+import schema
+import sketches
+import storage
+
+
+def _tables():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('1997-01-01', '1997-06-30')
+    date_keys = dates.strftime('%Y%m%d').astype(int)
+    n = 600
+    order_ids = rng.integers(10000, 10200, n)
+    order_dates = pd.Series(date_keys[rng.integers(0, len(dates), 200)], index=range(10000, 10200))
+    fact = pd.DataFrame({
+        'OrderID': order_ids,
+        'OrderDateKey': order_dates[order_ids].to_numpy(),
+        'ShippedDateKey': pd.array(np.where(rng.random(n) < 0.1, None, order_dates[order_ids] + 3), dtype='Int64'),
+        'EmployeeKey': rng.integers(1, 6, n),
+        'ProductKey': rng.integers(1, 13, n),
+        'CustomerKey': rng.integers(1, 21, n),
+        'OrderQuantity': rng.integers(1, 40, n),
+        'SaleUnitPrice': schema.to_money(pd.Series(rng.integers(100, 9000, n) / 100)),
+        'SalesAmount': schema.to_money(pd.Series(rng.integers(100, 90000, n) / 100)),
+    })
+    return {
+        'FactSales': fact,
+        'DimDate': pd.DataFrame({
+            'DateKey': date_keys, 'Year': dates.year, 'Month': dates.month,
+            'MonthName': dim_date.MONTH_NAMES[dates.month - 1],
+        }),
+        'DimEmployees': pd.DataFrame({
+            'EmployeeKey': range(1, 6), 'FirstName': [f'Prénom{k}' for k in range(1, 6)],
+            'LastName': [f'Nom{k}' for k in range(1, 6)], 'Title': 'Sales Representative',
+            'City': ['Seattle', 'Tacoma', 'London', 'London', 'Kirkland'],
+            'Country': ['USA', 'USA', 'UK', 'UK', 'USA'],
+        }),
+        'DimProducts': pd.DataFrame({
+            'ProductKey': range(1, 13), 'ProductName': [f'Produit {k}' for k in range(1, 13)],
+            'CategoryName': [['Beverages', 'Condiments', 'Seafood'][k % 3] for k in range(1, 13)],
+        }),
+        'DimCustomers': pd.DataFrame({
+            'CustomerKey': range(1, 21),
+            'CustomerCountry': [['France', 'Germany', 'USA', None][k % 4] for k in range(1, 21)],
+        }),
+    }
+
+
+@pytest.fixture(scope='module')
+def engines(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('analytics')
+    dw_engine = create_engine(f"sqlite:///{directory / 'dw.db'}")
+    for name, df in _tables().items():
+        storage.write_table(df, str(directory / 'clean'), name)
+        # DW : montants en REAL, dimensions avec leur indicateur de version courante
+        dw = df.astype({col: 'float64' for col in df.columns if schema.is_money(df[col])})
+        if name != 'FactSales':
+            dw = dw.assign(IsCurrent=1)
+        dw.to_sql(name, dw_engine, index=False)
+    return analytics.AnalyticsEngine(str(directory / 'clean')), dw_engine
+
+
+@pytest.mark.parametrize('name', sorted(analytics.QUERIES))
+@pytest.mark.parametrize('period', [(None, None), (19970215, 19970420)])
+def test_engine_matches_sql_on_the_dw(engines, name, period):
+    engine, dw_engine = engines
+    result = engine.run(name, *period)
+    assert len(result) > 0
+    assert analytics.same_result(result, analytics.run_sql(dw_engine, name, *period))
+
+
+def test_sketched_distinct_counts_match_exact_counts(engines):
+    engine, _ = engines
+    for by in (['MonthKey', 'CustomerCountry'], ['EmployeeKey'], ['CategoryName'], []):
+        assert sketches.table_for(by) is not None
+        sketched = engine.distinct_counts(by, 19970110, 19970520)
+        exact = engine.distinct_counts(by, 19970110, 19970520, exact=True)
+        # Petites mailles : les esquisses gardent les ensembles exacts
+        pd.testing.assert_frame_equal(sketched, exact, check_dtype=False)
@@ -0,0 +1,50 @@
+# Chargement staging + bascule sur un DW SQLite : le schéma de production est conservé
+import pandas as pd
+from sqlalchemy import create_engine, inspect, text
+
+import bulk_load
+
+DDL = [
+    'CREATE TABLE DimProducts (ProductKey INTEGER PRIMARY KEY, ProductName VARCHAR(40))',
+    '''CREATE TABLE FactSales (
+        OrderID INTEGER NOT NULL,
+        ProductKey INTEGER NOT NULL REFERENCES DimProducts (ProductKey),
+        SalesAmount DECIMAL(18, 4),
+        LoadedAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (OrderID, ProductKey))''',
+    'CREATE INDEX IX_FactSales_ProductKey ON FactSales (ProductKey)',
+]
+
+
+def _dw(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dw.db'}")
+    with engine.begin() as connection:
+        for statement in DDL:
+            connection.execute(text(statement))
+    return engine
+
+
+def test_replace_table_keeps_keys_indexes_and_types(tmp_path):
+    engine = _dw(tmp_path)
+    loader = bulk_load.get_loader(engine)
+    fact = pd.DataFrame({'OrderID': [1, 1, 2], 'ProductKey': [10, 11, 10], 'SalesAmount': [1.5, 2.0, 3.25]})
+    for _ in range(2):  # deux bascules successives : noms d'index et de contraintes réutilisables
+        loader.replace_table(fact, 'FactSales')
+
+    schema = inspect(engine)
+    assert schema.get_pk_constraint('FactSales')['constrained_columns'] == ['OrderID', 'ProductKey']
+    assert [fk['referred_table'] for fk in schema.get_foreign_keys('FactSales')] == ['DimProducts']
+    assert [ix['name'] for ix in schema.get_indexes('FactSales')] == ['IX_FactSales_ProductKey']
+    types = {c['name']: str(c['type']) for c in schema.get_columns('FactSales')}
+    assert types['SalesAmount'] == 'DECIMAL(18, 4)'
+    assert not schema.has_table('FactSales_Staging') and not schema.has_table('FactSales_Old')
+    assert pd.read_sql('SELECT COUNT(*) AS n FROM FactSales', engine)['n'].iloc[0] == 3
+
+
+def test_changed_columns_fall_back_to_dataframe_schema(tmp_path):
+    engine = _dw(tmp_path)
+    loader = bulk_load.get_loader(engine)
+    fact = pd.DataFrame({'OrderID': [1], 'ProductKey': [10], 'SalesAmount': [1.5], 'Discount': [0.1]})
+    loader.replace_table(fact, 'FactSales')
+    columns = [c['name'] for c in inspect(engine).get_columns('FactSales')]
+    assert columns == ['OrderID', 'ProductKey', 'SalesAmount', 'Discount']
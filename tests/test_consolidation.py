@@ -0,0 +1,52 @@
+# Consolidation SQL Server + Access : noms canoniques, doublons et conflits
+import pandas as pd
+
+import consolidation
+import schema
+
+
+def _orders():
+    sql = pd.DataFrame({'OrderID': [10248, 10249, 10250], 'CustomerID': ['VINET', 'TOMSP', 'HANAR'],
+                        'Freight': [32.38, 11.61, 65.83]})
+    # Noms de colonnes Access ; 10249 identique, 10250 en conflit (client et frais de port), 11078 propre à Access
+    access = pd.DataFrame({'Order ID': [10249, 10250, 11078], 'Customer ID': ['TOMSP', 'VICTE', 'ALFKI'],
+                           'Shipping Fee': [11.61, 70.0, 8.5]})
+    return sql, access
+
+
+def test_sql_wins_conflicts_and_duplicates_are_counted():
+    sql, access = _orders()
+    combined, report = consolidation.consolidate_table({'Access': access, 'SQL': sql},
+                                                       consolidation.CONSOLIDATION_SPECS['Orders'])
+    assert list(combined['OrderID']) == [10248, 10249, 10250, 11078]
+    assert list(combined['SourceSystem']) == ['SQL', 'SQL', 'SQL', 'Access']
+    row = combined.set_index('OrderID').loc[10250]
+    assert (row['CustomerID'], row['Freight']) == ('HANAR', 65.83)
+    assert report['duplicates'] == 2
+    assert report['conflicts'] == 1
+    assert report['conflict_columns'] == {'CustomerID': 1, 'Freight': 1}
+    assert (report['rows_in'], report['rows_out']) == (6, 4)
+
+
+def test_missing_value_on_one_side_is_not_a_conflict():
+    sql = pd.DataFrame({'OrderID': [1], 'ProductID': [7], 'UnitPrice': [10.0], 'Quantity': [None]})
+    access = pd.DataFrame({'Order ID': [1], 'Product ID': [7], 'Unit Price': [None], 'Quantity': [3]})
+    combined, report = consolidation.consolidate_table({'SQL': sql, 'Access': access},
+                                                       consolidation.CONSOLIDATION_SPECS['OrderDetails'])
+    assert len(combined) == 1 and report['duplicates'] == 1 and report['conflicts'] == 0
+
+
+def test_dimension_members_are_kept_per_source_with_typed_columns():
+    sql = schema.enforce(pd.DataFrame({'CustomerID': ['ALFKI', 'BONAP'], 'Country': ['Germany', 'France']}),
+                         'Customers_SQL')
+    access = schema.enforce(pd.DataFrame({'ID': [1], 'Company': ['Alfreds'], 'CustomerID': ['ALFKI'],
+                                          'Country': ['Germany']}), 'Customers_Access')
+    tables, reports = consolidation.consolidate({'SQL': {'Customers_SQL': sql}, 'Access': {'Customers_Access': access}})
+    customers = tables['Customers']
+    # Même CustomerID dans les deux sources : deux membres (clé = source + identifiant)
+    assert list(zip(customers['SourceSystem'], customers['CustomerID'])) == [
+        ('SQL', 'ALFKI'), ('SQL', 'BONAP'), ('Access', 'ALFKI')]
+    assert reports['Customers']['duplicates'] == 0
+    # Catégories alignées entre sources : la colonne reste catégorielle après concaténation
+    assert isinstance(customers['Country'].dtype, pd.CategoricalDtype)
+    assert 'CompanyName' in customers.columns
@@ -0,0 +1,36 @@
+# Dimension date : calendrier contigu, clés arithmétiques, prolongation du cache
+import pandas as pd
+
+import dim_date
+
+
+def test_date_keys_are_computed_without_formatting():
+    keys = dim_date.date_keys(pd.Series(pd.to_datetime(['1996-07-04', None, '1998-12-31'])))
+    assert keys.tolist() == [19960704, pd.NA, 19981231]
+    assert str(keys.dtype) == 'Int64'
+
+
+def test_calendar_covers_whole_years_and_attributes():
+    calendar = dim_date.build_calendar('1996-01-01', '1996-12-31')
+    assert len(calendar) == 366
+    assert list(calendar.columns) == dim_date.DIMDATE_COLUMNS
+    row = calendar.set_index('DateKey').loc[19960704]
+    assert (row['Year'], row['Quarter'], row['Month'], row['Day']) == (1996, 3, 7, 4)
+    assert (row['DayName'], row['MonthName']) == ('Thursday', 'July')
+
+
+def test_calendar_is_cached_then_extended_with_missing_years_only(tmp_path):
+    cache = str(tmp_path / 'state' / 'DimDate.pkl')
+    first = dim_date.load_or_extend_calendar([pd.Series(pd.to_datetime(['1997-03-01', '1997-08-15']))], cache)
+    assert (first['Date'].min(), first['Date'].max()) == (pd.Timestamp('1997-01-01'), pd.Timestamp('1997-12-31'))
+
+    # Dates déjà couvertes : calendrier en cache réutilisé tel quel
+    same = dim_date.load_or_extend_calendar([pd.Series(pd.to_datetime(['1997-05-05']))], cache)
+    pd.testing.assert_frame_equal(same, first)
+
+    # Nouvelle date en 1998 et en 1996 : seules ces années sont ajoutées, sans trou ni doublon
+    extended = dim_date.load_or_extend_calendar([pd.Series(pd.to_datetime(['1998-02-01', '1996-12-31']))], cache)
+    assert (extended['Date'].min(), extended['Date'].max()) == (pd.Timestamp('1996-01-01'), pd.Timestamp('1998-12-31'))
+    assert extended['DateKey'].is_unique and extended['Date'].diff().dropna().eq(pd.Timedelta(days=1)).all()
+    pd.testing.assert_frame_equal(extended[extended['Year'] == 1997].reset_index(drop=True), first)
+    pd.testing.assert_frame_equal(pd.read_pickle(cache), extended)
@@ -0,0 +1,56 @@
+# Chemins de construction de FactSales : même résultat, octet pour octet
+import numpy as np
+import pandas as pd
+
+import fact_builder
+import schema
+import surrogate_keys
+
+
+def _sources(orders_count=400):
+    rng = np.random.default_rng(0)
+    order_ids = np.arange(10248, 10248 + orders_count)
+    sources = np.where(order_ids % 10 == 0, 'Access', 'SQL')
+    order_dates = pd.Timestamp('1996-07-04') + pd.to_timedelta(rng.integers(0, 700, orders_count), unit='D')
+    orders = pd.DataFrame({
+        'OrderID': order_ids,
+        'CustomerID': rng.choice(['ALFKI', 'BONAP', 'FRANK', 'QUICK'], orders_count),
+        'EmployeeID': rng.integers(1, 10, orders_count),
+        'OrderDate': order_dates,
+        'ShippedDate': (order_dates + pd.to_timedelta(rng.integers(1, 30, orders_count), unit='D'))
+                       .where(rng.random(orders_count) > 0.05),
+        'ShipVia': rng.integers(1, 4, orders_count),
+        'Freight': rng.random(orders_count).round(2) * 100,
+        'SourceSystem': sources,
+    })
+    lines = rng.integers(1, 6, orders_count)
+    details = pd.DataFrame({
+        'OrderID': np.repeat(order_ids, lines),
+        'ProductID': rng.integers(1, 78, lines.sum()),
+        'UnitPrice': rng.random(lines.sum()).round(2) * 50,
+        'Quantity': rng.integers(1, 50, lines.sum()),
+        'Discount': rng.choice([0.0, 0.05, 0.1], lines.sum()),
+        'SourceSystem': np.repeat(sources, lines),
+    }).sample(frac=1, random_state=1).reset_index(drop=True)
+    return schema.enforce(details, 'OrderDetails'), schema.enforce(orders, 'Orders')
+
+
+def _registries(orders, details, directory):
+    registries = {d: surrogate_keys.KeyRegistry(d, str(directory))
+                  for d in ('DimCustomers', 'DimProducts', 'DimEmployees', 'DimShippers')}
+    registries['DimCustomers'].assign(orders['SourceSystem'], orders['CustomerID'])
+    registries['DimEmployees'].assign(orders['SourceSystem'], orders['EmployeeID'])
+    registries['DimShippers'].assign(orders['SourceSystem'], orders['ShipVia'])
+    registries['DimProducts'].assign(details['SourceSystem'], details['ProductID'])
+    return registries
+
+
+def test_parallel_build_matches_serial(tmp_path):
+    details, orders = _sources()
+    registries = _registries(orders, details, tmp_path / 'keys')
+    serial = fact_builder.build(details, orders, registries)
+    assert len(serial) == len(details)
+    assert serial['CustomerKey'].notna().all() and serial['ProductKey'].notna().all()
+
+    parallel = fact_builder.build_parallel(details, orders, registries, workers=2)
+    assert fact_builder.checksum(parallel) == fact_builder.checksum(serial)
@@ -0,0 +1,27 @@
+# Empreintes de contenu et cache du manifeste
+import gc
+import weakref
+
+import pandas as pd
+
+import fingerprints
+
+
+def test_fingerprint_cache_does_not_keep_tables_alive(tmp_path):
+    manifest = fingerprints.RunManifest(str(tmp_path / 'manifest.json'))
+    df = pd.DataFrame({'OrderID': range(1000), 'Quantity': 1})
+    expected = fingerprints.table_fingerprint(df)
+    assert manifest.fingerprint(df) == expected
+    assert manifest.fingerprint(df) == expected
+
+    ref = weakref.ref(df)
+    del df
+    gc.collect()
+    assert ref() is None
+    assert manifest._fingerprints == {}
+
+
+def test_fingerprint_ignores_row_order_and_physical_types():
+    df = pd.DataFrame({'OrderID': [1, 2, 3], 'Country': ['France', 'Spain', None]})
+    shuffled = df.iloc[[2, 0, 1]].astype({'OrderID': 'Int32'})
+    assert fingerprints.table_fingerprint(df) == fingerprints.table_fingerprint(shuffled)
@@ -0,0 +1,59 @@
+# Mesures par étape et détection des régressions
+import threading
+import time
+import tracemalloc
+
+import metrics
+import streaming
+
+
+def _run(memory_source, **stage):
+    return {'run_id': memory_source, 'memory_source': memory_source,
+            'stages': [{'stage': 'fact_sales', 'wall_seconds': 1.0, 'peak_mb': 100.0, **stage}]}
+
+
+def test_default_measures_rss_without_tracemalloc():
+    run = metrics.RunMetrics()
+    run.start('stage')
+    data = [bytearray(1024) for _ in range(1000)]
+    run.end('stage', rows_out=len(data))
+    assert not tracemalloc.is_tracing()
+    assert run.report()['memory_source'] == 'rss'
+    if streaming.current_rss_mb() is not None:
+        assert run.stages[0]['peak_mb'] > 0
+
+
+def test_peak_memory_compared_only_between_same_source():
+    previous = _run('tracemalloc')
+    assert metrics.find_regressions(_run('rss', peak_mb=400.0), previous) == []
+    regressions = metrics.find_regressions(_run('tracemalloc', peak_mb=400.0), previous)
+    assert [r['metric'] for r in regressions] == ['peak_mb']
+
+
+def test_overlapping_stages_are_flagged_and_memory_not_compared():
+    run = metrics.RunMetrics()
+    run.start('dim_customers')
+    run.start('dim_products')
+    run.end('dim_customers')
+    run.end('dim_products')
+    run.start('fact_sales')
+    run.end('fact_sales')
+    assert {s['stage']: s['overlapped'] for s in run.stages} == {
+        'dim_customers': True, 'dim_products': True, 'fact_sales': False,
+    }
+
+    previous = _run('rss', overlapped=False)
+    assert metrics.find_regressions(_run('rss', peak_mb=400.0, overlapped=True), previous) == []
+    regressions = metrics.find_regressions(_run('rss', peak_mb=400.0, wall_seconds=2.0), previous)
+    assert {r['metric'] for r in regressions} == {'peak_mb', 'wall_seconds'}
+
+
+def test_cpu_time_excludes_other_threads():
+    run = metrics.RunMetrics()
+    run.start('idle')
+    worker = threading.Thread(target=lambda: sum(i * i for i in range(2_000_000)))
+    worker.start()
+    worker.join()
+    time.sleep(0.01)
+    run.end('idle')
+    assert run.stages[0]['cpu_seconds'] < run.stages[0]['wall_seconds'] / 2
@@ -0,0 +1,65 @@
+# Extraction parallèle : une connexion par worker, erreurs isolées par table
+import sqlite3
+import threading
+
+import pandas as pd
+
+import parallel_extract
+
+
+def _source(tmp_path):
+    path = tmp_path / 'source.db'
+    with sqlite3.connect(path) as conn:
+        for name, rows in {'Orders': 30, 'Customers': 12, 'Products': 7, 'Shippers': 3}.items():
+            pd.DataFrame({'ID': range(rows)}).to_sql(name, conn, index=False)
+    return path
+
+
+def test_each_worker_reuses_its_own_connection(tmp_path):
+    path = _source(tmp_path)
+    opened, closed = [], []
+
+    class Connection(sqlite3.Connection):
+        def close(self):
+            closed.append(self)
+            super().close()
+
+    def connect():
+        conn = sqlite3.connect(path, check_same_thread=False, factory=Connection)
+        opened.append((threading.get_ident(), conn))
+        return conn
+
+    def read_table(conn, table, query):
+        assert conn in [c for ident, c in opened if ident == threading.get_ident()]
+        return pd.read_sql(query, conn)
+
+    queries = {name: f'SELECT * FROM {name}' for name in ('Orders', 'Customers', 'Products', 'Shippers')}
+    results, report = parallel_extract.extract_parallel(connect, queries, read_table, workers=2)
+    assert {name: len(df) for name, df in results.items()} == {'Orders': 30, 'Customers': 12, 'Products': 7, 'Shippers': 3}
+    assert all(r['error'] is None and r['rows'] == len(results[t]) for t, r in report.items())
+    # Au plus une connexion par thread worker, toutes fermées en fin d'extraction
+    assert 1 <= len(opened) <= 2
+    assert len({ident for ident, _ in opened}) == len(opened)
+    assert sorted(map(id, closed)) == sorted(id(c) for _, c in opened)
+
+
+def test_failed_table_does_not_cancel_the_others(tmp_path):
+    path = _source(tmp_path)
+    queries = {'Orders': 'SELECT * FROM Orders', 'Missing': 'SELECT * FROM Missing', 'Shippers': 'SELECT * FROM Shippers'}
+    results, report = parallel_extract.extract_parallel(
+        lambda: sqlite3.connect(path, check_same_thread=False), queries,
+        lambda conn, table, query: pd.read_sql(query, conn), workers=3,
+    )
+    assert set(results) == {'Orders', 'Shippers'}
+    assert 'Missing' in report['Missing']['error']
+    assert report['Missing']['rows'] is None and report['Orders']['rows'] == 30
+
+
+def test_tuple_results_report_row_count_of_first_item(tmp_path):
+    path = _source(tmp_path)
+    results, report = parallel_extract.extract_parallel(
+        lambda: sqlite3.connect(path, check_same_thread=False), {'Products': 'SELECT * FROM Products'},
+        lambda conn, table, query: (pd.read_sql(query, conn), None, 'watermark'),
+    )
+    assert report['Products']['rows'] == 7
+    assert results['Products'][2] == 'watermark'
@@ -0,0 +1,43 @@
+# Points de contrôle et reprise du graphe d'étapes
+import os
+
+import pipeline
+
+
+def _pipeline(directory, calls, fail=False):
+    etl = pipeline.Pipeline(str(directory))
+
+    @etl.stage('extract', outputs=['raw'])
+    def extract():
+        calls.append('extract')
+        return {'raw': [1, 2, 3]}
+
+    @etl.stage('load', inputs=['raw'])
+    def load(raw):
+        calls.append('load')
+        if fail:
+            raise RuntimeError('DW indisponible')
+
+    return etl
+
+
+def test_no_checkpoint_written_by_default(tmp_path):
+    calls = []
+    result = _pipeline(tmp_path, calls).run()
+    assert result['done'] == ['extract', 'load']
+    assert not os.path.exists(tmp_path / 'extract.pkl')
+
+
+def test_resume_reuses_checkpoints_only_when_written(tmp_path):
+    calls = []
+    _pipeline(tmp_path, calls, fail=True).run(signature={}, checkpoint=True)
+    assert os.path.exists(tmp_path / 'extract.pkl')
+    _pipeline(tmp_path, calls).run(signature={}, resume=True)
+    assert calls == ['extract', 'load', 'load']
+
+    # Run sans points de contrôle : l'ancien est supprimé, la reprise refait tout
+    calls.clear()
+    _pipeline(tmp_path, calls, fail=True).run(signature={})
+    assert not os.path.exists(tmp_path / 'extract.pkl')
+    _pipeline(tmp_path, calls).run(signature={}, resume=True)
+    assert calls == ['extract', 'load', 'extract', 'load']
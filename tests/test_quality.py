@@ -0,0 +1,75 @@
+# Contrôle qualité avant chargement : rejet, quarantaine, avertissement
+import json
+
+import pandas as pd
+import pytest
+
+import quality
+import storage
+
+RULES = [
+    ('not_null', ['OrderID'], None),
+    ('reference', ['ProductKey'], ('DimProducts', 'ProductKey')),
+    ('reference_nullable', ['ShippedDateKey'], ('DimDate', 'DateKey')),
+    ('unique', ['OrderID', 'ProductKey'], None),
+    ('range', ['Discount'], (0, 1)),
+]
+REFERENCES = {
+    'DimProducts': pd.DataFrame({'ProductKey': [1, 2, 3]}),
+    'DimDate': pd.DataFrame({'DateKey': [19970101, 19970102]}),
+}
+
+
+def _fact():
+    return pd.DataFrame({
+        'OrderID': pd.array([10, 10, 11, 12, 13, 13, None], dtype='Int64'),
+        'ProductKey': [1, 2, 9, 1, 3, 3, 2],
+        'ShippedDateKey': pd.array([19970101, None, 19970102, 19990101, 19970102, 19970102, 19970101],
+                                   dtype='Int64'),
+        'Discount': [0.0, 0.1, 0.0, 0.0, 1.5, 1.5, 0.0],
+    })
+
+
+def _gate(tmp_path, action, df=None):
+    return quality.gate(_fact() if df is None else df, 'FactSales', RULES, REFERENCES, action=action,
+                        run_id='run', quality_dir=str(tmp_path / 'quality'),
+                        quarantine_dir=str(tmp_path / 'quarantine'))
+
+
+def test_violations_are_reported_per_rule(tmp_path):
+    _gate(tmp_path, 'warn')
+    report = json.loads((tmp_path / 'quality' / 'FactSales_run.json').read_text(encoding='utf-8'))
+    violations = {rule['rule']: (rule['violations'], rule['examples']) for rule in report['rules']}
+    assert violations == {
+        'OrderID:not_null': (1, [None]),
+        'ProductKey:reference': (1, [11]),
+        'ShippedDateKey:reference_nullable': (1, [12]),
+        'OrderID+ProductKey:unique': (1, [13]),
+        'Discount:range': (2, [13, 13]),
+    }
+    assert report['invalid_rows'] == 5
+
+
+def test_fail_rejects_the_load(tmp_path):
+    with pytest.raises(RuntimeError, match='5 ligne'):
+        _gate(tmp_path, 'fail')
+    assert not (tmp_path / 'quarantine').exists()
+
+
+def test_quarantine_removes_invalid_rows_and_records_the_rules(tmp_path):
+    loaded = _gate(tmp_path, 'quarantine')
+    assert loaded['OrderID'].tolist() == [10, 10]
+    rejected = storage.read_table(str(tmp_path / 'quarantine'), 'FactSales_run')
+    assert len(rejected) == 5
+    assert sorted(rejected[quality.VIOLATIONS_COLUMN]) == [
+        'Discount:range', 'Discount:range;OrderID+ProductKey:unique', 'OrderID:not_null',
+        'ProductKey:reference', 'ShippedDateKey:reference_nullable',
+    ]
+
+
+def test_clean_table_passes_every_action(tmp_path):
+    clean = _fact().iloc[:2]
+    for action in quality.ACTIONS:
+        pd.testing.assert_frame_equal(_gate(tmp_path, action, clean), clean)
+    with pytest.raises(ValueError):
+        _gate(tmp_path, 'ignore', clean)
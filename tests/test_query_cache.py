@@ -0,0 +1,83 @@
+# Cache disque des requêtes du notebook
+import json
+import os
+import sqlite3
+import threading
+
+import query_cache
+
+
+def _set_version(tmp_path, content_hash):
+    (tmp_path / 'load_version.json').write_text(json.dumps({'content_hash': content_hash}), encoding='utf-8')
+
+
+def _cache(tmp_path, **kwargs):
+    db = tmp_path / 'dw.db'
+    if not db.exists():
+        _set_version(tmp_path, 'a' * 64)
+        with sqlite3.connect(db) as conn:
+            conn.execute('CREATE TABLE FactSales (OrderID INTEGER, SalesAmount REAL)')
+            conn.executemany('INSERT INTO FactSales VALUES (?, ?)', [(i, i * 1.5) for i in range(500)])
+    return query_cache.QueryCache(lambda: sqlite3.connect(db, check_same_thread=False),
+                                  tmp_path / 'cache', version_file=tmp_path / 'load_version.json', **kwargs)
+
+
+def _files(tmp_path):
+    return [name for _, _, files in os.walk(tmp_path / 'cache') for name in files]
+
+
+def test_concurrent_readers_never_see_partial_entries(tmp_path):
+    errors = []
+    _cache(tmp_path)
+
+    def query(worker):
+        cache = _cache(tmp_path)
+        try:
+            for _ in range(20):
+                assert len(cache.read_sql(f'SELECT * FROM FactSales WHERE OrderID % 2 = {worker % 2}')) == 250
+        except Exception as e:  # noqa: BLE001 - remonté au thread principal
+            errors.append(e)
+        finally:
+            cache.close()
+
+    threads = [threading.Thread(target=query, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    files = _files(tmp_path)
+    assert len(files) == 2
+    assert not any(name.endswith(query_cache.TMP_SUFFIX) for name in files)
+
+
+def test_new_load_version_invalidates_previous_results(tmp_path):
+    cache = _cache(tmp_path)
+    sql = 'SELECT COUNT(*) AS n FROM FactSales'
+    cache.read_sql(sql)
+    cache.read_sql('SELECT  COUNT(*) AS n\nFROM FactSales -- même requête\n;')
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    _set_version(tmp_path, 'b' * 64)
+    cache.read_sql(sql)
+    assert cache.misses == 2
+    assert os.listdir(tmp_path / 'cache') == ['b' * 16]
+    cache.close()
+
+
+def test_least_recently_read_entries_are_evicted_first(tmp_path):
+    cache = _cache(tmp_path)
+    queries = [f'SELECT * FROM FactSales WHERE OrderID < {n}' for n in (100, 200, 300)]
+    paths = []
+    for age, sql in enumerate(queries):
+        cache.read_sql(sql)
+        (path,) = [p for p in (tmp_path / 'cache').rglob('*.pkl') if p not in paths]
+        os.utime(path, (1000 + age, 1000 + age))
+        paths.append(path)
+    # La première requête est relue : la deuxième devient la moins récemment lue
+    cache.read_sql(queries[0])
+    assert cache.hits == 1
+    cache.max_bytes = sum(path.stat().st_size for path in paths) - 1
+    cache.evict()
+    assert sorted(_files(tmp_path)) == sorted([paths[0].name, paths[2].name])
+    cache.close()
@@ -0,0 +1,39 @@
+# Rapports sans notebook : une requête ou un rendu en échec n'arrête pas les autres
+import pandas as pd
+import pytest
+
+import reports
+
+VERIFICATION = pd.DataFrame({'TotalOrders': [830], 'TotalOrderDetails': [2155], 'TotalRevenue': [1265793.04]})
+
+
+def _read(name):
+    if name == 'verification':
+        return VERIFICATION, False
+    raise RuntimeError(f'table absente pour {name}')
+
+
+def _errors(run):
+    return {r['report']: r['error'] for r in run['reports']}
+
+
+@pytest.mark.parametrize('render_workers', [0, 1])
+def test_failed_query_is_reported_and_other_reports_are_produced(tmp_path, render_workers):
+    run = reports.run_reports(['sales_trend', 'verification'], _read, str(tmp_path), render_workers=render_workers)
+    assert _errors(run) == {'sales_trend': 'requête : table absente pour sales_trend', 'verification': None}
+    verification = run['reports'][1]
+    assert verification['rows'] == 1
+    assert verification['files'] == [str(tmp_path / 'verification.html')]
+    assert (tmp_path / 'verification.html').exists()
+
+
+def test_failed_render_is_reported(tmp_path, monkeypatch):
+    def broken(df):
+        raise ValueError('colonne manquante')
+    monkeypatch.setitem(reports.REPORTS, 'broken', {'sql': 'SELECT 1', 'render': broken})
+    run = reports.run_reports(['broken', 'verification'], lambda name: (VERIFICATION, True), str(tmp_path),
+                              render_workers=0)
+    assert _errors(run) == {'broken': 'rendu : colonne manquante', 'verification': None}
+    assert run['reports'][0]['rows'] == 1 and run['reports'][0]['files'] == []
+    assert run['reports'][1]['cache_hit'] is True
+    reports.print_timings(run)  # les rapports en échec sont listés sans durées
@@ -0,0 +1,71 @@
+# Upsert SCD Type 2 sur un DW SQLite
+import pandas as pd
+from sqlalchemy import create_engine
+
+import bulk_load
+import scd
+
+
+def _customers(*rows):
+    return pd.DataFrame(rows, columns=['CustomerKey', 'SourceSystem', 'CustomerCountry'])
+
+
+def _current(engine):
+    df = pd.read_sql('SELECT CustomerKey, CustomerCountry FROM DimCustomers WHERE IsCurrent = 1', engine)
+    return dict(zip(df['CustomerKey'], df['CustomerCountry']))
+
+
+def test_upsert_inserts_changes_and_closes_deleted_members(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dw.db'}")
+    loader = bulk_load.get_loader(engine)
+    first = _customers((1, 'SQL', 'France'), (2, 'SQL', 'Spain'), (3, 'Access', 'Italy'))
+    scd.upsert_dimension(loader, first, 'DimCustomers', 'CustomerKey', pd.Timestamp('2026-01-01'), close_missing=True)
+
+    # Client 1 modifié, client 2 supprimé de SQL Server, client 4 nouveau
+    second = _customers((1, 'SQL', 'Germany'), (3, 'Access', 'Italy'), (4, 'SQL', 'Peru'))
+    changes = scd.upsert_dimension(loader, second, 'DimCustomers', 'CustomerKey', pd.Timestamp('2026-02-01'),
+                                   close_missing=True)
+    assert changes == {'inserted': 1, 'changed': 1, 'unchanged': 1, 'closed': 1}
+    assert _current(engine) == {1: 'Germany', 3: 'Italy', 4: 'Peru'}
+    closed = pd.read_sql('SELECT ValidTo FROM DimCustomers WHERE CustomerKey = 2', engine)
+    assert closed['ValidTo'].notna().all()
+
+
+def test_absent_source_system_keeps_its_members(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dw.db'}")
+    loader = bulk_load.get_loader(engine)
+    scd.upsert_dimension(loader, _customers((1, 'SQL', 'France'), (3, 'Access', 'Italy')),
+                         'DimCustomers', 'CustomerKey', close_missing=True)
+    # Access indisponible pendant ce run : aucune ligne Access reçue
+    changes = scd.upsert_dimension(loader, _customers((1, 'SQL', 'France')), 'DimCustomers', 'CustomerKey',
+                                   close_missing=True)
+    assert changes['closed'] == 0
+    assert _current(engine) == {1: 'France', 3: 'Italy'}
+
+
+def test_members_are_kept_without_close_missing(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dw.db'}")
+    loader = bulk_load.get_loader(engine)
+    scd.upsert_dimension(loader, _customers((1, 'SQL', 'France'), (2, 'SQL', 'Spain')), 'DimCustomers', 'CustomerKey')
+    scd.upsert_dimension(loader, _customers((1, 'SQL', 'France')), 'DimCustomers', 'CustomerKey')
+    assert _current(engine) == {1: 'France', 2: 'Spain'}
+
+
+def test_added_attribute_is_added_to_the_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'dw.db'}")
+    loader = bulk_load.get_loader(engine)
+    scd.upsert_dimension(loader, _customers((1, 'SQL', 'France'), (2, 'SQL', 'Spain')), 'DimCustomers', 'CustomerKey',
+                         pd.Timestamp('2026-01-01'))
+    # Nouvel attribut CustomerCity dans l'extraction suivante
+    second = _customers((1, 'SQL', 'France'), (2, 'SQL', 'Spain')).assign(CustomerCity=['Paris', 'Madrid'])
+    changes = scd.upsert_dimension(loader, second, 'DimCustomers', 'CustomerKey', pd.Timestamp('2026-02-01'))
+    assert changes == {'inserted': 0, 'changed': 2, 'unchanged': 0, 'closed': 0}
+    rows = pd.read_sql('SELECT CustomerKey, CustomerCity, IsCurrent FROM DimCustomers ORDER BY CustomerKey, IsCurrent',
+                       engine)
+    assert rows['CustomerCity'].isna().tolist() == [True, False, True, False]
+    assert rows['CustomerCity'].dropna().tolist() == ['Paris', 'Madrid']
+    assert rows['IsCurrent'].tolist() == [0, 1, 0, 1]
+
+    # Run suivant identique : rien n'est réécrit
+    changes = scd.upsert_dimension(loader, second, 'DimCustomers', 'CustomerKey', pd.Timestamp('2026-03-01'))
+    assert changes['unchanged'] == 2
@@ -0,0 +1,63 @@
+# Registre des schémas : montants décimaux exacts et colonnes Access
+from decimal import Decimal
+
+import pandas as pd
+
+import schema
+
+
+def test_money_is_exact_decimal():
+    prices = schema.cast_column(pd.Series([0.1, 0.2, 19.33333, None]), 'money')
+    assert schema.is_money(prices)
+    assert prices.tolist()[:3] == [Decimal('0.1000'), Decimal('0.2000'), Decimal('19.3333')]
+    assert prices.isna().tolist() == [False, False, False, True]
+    # 0.1 + 0.2 == 0.3 exactement (faux en float64)
+    assert prices[:2].sum() == Decimal('0.3')
+
+
+def test_line_amount_rounds_half_to_even():
+    quantity = pd.Series([3, 1, 1, 2, None], dtype='Int16')
+    price = schema.to_money(pd.Series([18.0, 0.0005, 0.0015, 19.3333, 5.0]))
+    discount = schema.to_money(pd.Series([0.05, 0.5, 0.5, 0.15, 0.0]))
+    amount = schema.line_amount(quantity, price, discount)
+    assert schema.is_money(amount)
+    # 0,00025 -> 0,0002 et 0,00075 -> 0,0008 (au pair) ; 2 x 19,3333 x 0,85 = 32,86661
+    assert amount.tolist()[:4] == [Decimal('51.3'), Decimal('0.0002'), Decimal('0.0008'), Decimal('32.8666')]
+    assert amount.isna().tolist()[4]
+
+
+def test_access_columns_get_canonical_types():
+    details = pd.DataFrame({'Order ID': [1.0, 2.0], 'Product ID': [10, 11], 'Unit Price': [18.0, 9.5],
+                            'Quantity': [1, 2], 'Discount': [0.0, 0.1]})
+    typed = schema.enforce(details, 'OrderDetails_Access')
+    assert str(typed['Order ID'].dtype) == 'Int32'
+    assert str(typed['Product ID'].dtype) == 'Int32'
+    assert schema.is_money(typed['Unit Price'])
+    assert str(typed['Quantity'].dtype) == 'Int16'
+
+
+def test_canonical_column_is_not_shadowed_by_access_variant():
+    # `OrderID` déjà présent : `Order ID` (numéro de ligne Access) n'est pas renommé ni typé comme lui
+    orders = pd.DataFrame({'Order ID': [1, 2], 'OrderID': [10248, 10249], 'Shipping Fee': [1.5, 2.25]})
+    declared = schema.schema_for('Orders_Access', orders.columns)
+    assert 'Order ID' not in declared
+    assert declared['Shipping Fee'] == 'money'
+
+
+def test_enforce_reports_memory_and_keeps_unconvertible_columns():
+    orders = pd.DataFrame({
+        'OrderID': [10248.0, 10249.0, None],
+        'ShipCountry': ['France', 'France', 'Germany'],
+        'ShipVia': [1, 2, 2.5],
+        'Comments': ['a', 'b', 'c'],
+    })
+    report = {}
+    typed = schema.enforce(orders, 'Orders', report)
+    assert str(typed['OrderID'].dtype) == 'Int32' and typed['OrderID'].isna().tolist()[2]
+    assert isinstance(typed['ShipCountry'].dtype, pd.CategoricalDtype)
+    # Valeur décimale dans une colonne entière : ShipVia garde son type, les autres sont converties
+    assert typed['ShipVia'].dtype == 'float64'
+    # Colonne non déclarée : type lu conservé
+    assert typed['Comments'].dtype == orders['Comments'].dtype
+    before, after = report['Orders']
+    assert before == schema.memory_mb(orders) and after == schema.memory_mb(typed)
@@ -0,0 +1,69 @@
+# Esquisses des comptages distincts : mailles exactes, esquisses denses, fusion
+import numpy as np
+import pandas as pd
+
+import sketches
+
+
+def _enriched(orders, customers, months=6, countries=('France', 'Spain', 'Peru')):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'OrderID': rng.integers(0, orders, orders * 3),
+        'CustomerKey': rng.integers(0, customers, orders * 3),
+        'OrderDateKey': 19970015 + rng.integers(1, months + 1, orders * 3) * 100,
+        'EmployeeKey': rng.integers(1, 5, orders * 3),
+        'CategoryName': rng.choice(['Beverages', 'Produce'], orders * 3),
+        'CustomerCountry': rng.choice(countries, orders * 3),
+    })
+
+
+def _exact(rows, by):
+    rows = rows.assign(MonthKey=rows['OrderDateKey'] // 100)
+    source = rows.groupby(by) if by else rows
+    counts = {name: source[column].nunique() for name, column in sketches.SKETCHES.items()}
+    return pd.DataFrame(counts).reset_index() if by else pd.DataFrame([counts])
+
+
+def test_small_cells_are_exact_and_one_row_per_cell():
+    rows = _enriched(orders=600, customers=80)
+    built = sketches.build(rows)
+    members = {'SketchSales': 3, 'SketchSalesByEmployee': 4, 'SketchSalesByCategory': 2}
+    for table in sketches.SKETCH_TABLES:
+        assert len(built[table]) == 6 * members[table] * len(sketches.SKETCHES)
+        assert built[table]['Exact'].all()
+    for by in ([], ['MonthKey'], ['CustomerCountry'], ['MonthKey', 'CustomerCountry'],
+               ['EmployeeKey'], ['MonthKey', 'CategoryName']):
+        result = sketches.distinct_counts(built[sketches.table_for(by)], by)
+        expected = _exact(rows, by)
+        pd.testing.assert_frame_equal(result.sort_values(by).reset_index(drop=True) if by else result,
+                                      expected.astype({'Orders': 'int64', 'Customers': 'int64'}),
+                                      check_dtype=False)
+
+
+def test_every_single_axis_rollup_has_a_sketch_table():
+    for column in ['MonthKey', 'EmployeeKey', 'CategoryName', 'CustomerCountry']:
+        assert sketches.table_for([column]) is not None
+        assert sketches.table_for(['MonthKey', column]) is not None
+    # Deux axes croisés : comptage exact
+    assert sketches.table_for(['EmployeeKey', 'CustomerCountry']) is None
+
+
+def test_large_cells_use_dense_registers_within_error():
+    rows = _enriched(orders=60_000, customers=20_000, months=2, countries=('France',))
+    built = sketches.build(rows)['SketchSales']
+    assert len(built) == 2 * len(sketches.SKETCHES)
+    assert not built['Exact'].any()
+    total = sketches.distinct_counts(built, [])
+    expected = _exact(rows, [])
+    for name in sketches.SKETCHES:
+        assert abs(total[name][0] - expected[name][0]) / expected[name][0] < 4 * sketches.error_bound()
+
+
+def test_refresh_matches_full_rebuild():
+    rows = _enriched(orders=600, customers=80)
+    previous = sketches.build(rows[rows['OrderDateKey'] // 100 != 199703])
+    refreshed = sketches.refresh(previous, rows[rows['OrderDateKey'] // 100 == 199703], [199703])
+    rebuilt = sketches.build(rows)
+    for table, grain in sketches.SKETCH_TABLES.items():
+        pd.testing.assert_frame_equal(sketches.distinct_counts(refreshed[table], grain),
+                                      sketches.distinct_counts(rebuilt[table], grain))
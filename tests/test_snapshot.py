@@ -0,0 +1,48 @@
+# Instantanés des sources : relecture à l'identique et détection d'une altération
+import pandas as pd
+import pytest
+
+import schema
+import snapshot
+import storage
+
+
+def _sources():
+    orders = schema.enforce(pd.DataFrame({
+        'OrderID': [10248, 10249, 10250],
+        'CustomerID': ['VINET', 'TOMSP', 'HANAR'],
+        'OrderDate': pd.to_datetime(['1996-07-04', '1996-07-05', '1996-07-08']),
+        'Freight': [32.38, 11.61, 65.83],
+    }), 'Orders')
+    shippers = pd.DataFrame({'ShipperID': [1, 2], 'CompanyName': ['Speedy Express', 'United Package']})
+    return {'sql': {'Orders': orders}, 'access': {'Shippers': shippers}}
+
+
+def test_replay_reads_back_identical_tables(tmp_path):
+    sources = _sources()
+    snapshot.save(sources, 'v1', str(tmp_path))
+    assert snapshot.resolve('latest', str(tmp_path)) == 'v1'
+    for source, frames in sources.items():
+        tables = snapshot.load('v1', source, str(tmp_path))
+        snapshot.verify('v1', source, tables, str(tmp_path))
+        for name, df in frames.items():
+            pd.testing.assert_frame_equal(tables[name], df, check_dtype=False)
+
+
+def test_replay_rejects_an_altered_table(tmp_path):
+    snapshot.save(_sources(), 'v1', str(tmp_path))
+    source_dir = str(tmp_path / 'v1' / 'sql')
+    orders = storage.read_table(source_dir, 'Orders')
+    orders.loc[1, 'Freight'] = 0
+    storage.write_parquet(orders, str(tmp_path / 'v1' / 'sql' / 'Orders.parquet'))
+
+    tables = snapshot.load('v1', 'sql', str(tmp_path))
+    with pytest.raises(RuntimeError, match='Orders'):
+        snapshot.verify('v1', 'sql', tables, str(tmp_path))
+    snapshot.verify('v1', 'access', snapshot.load('v1', 'access', str(tmp_path)), str(tmp_path))
+
+
+def test_unknown_version_is_refused(tmp_path):
+    snapshot.save(_sources(), 'v1', str(tmp_path))
+    with pytest.raises(ValueError, match='v1'):
+        snapshot.resolve('v2', str(tmp_path))
@@ -0,0 +1,49 @@
+# Couches RAW / CLEAN : Parquet (un row group par mois) et CSV
+import pandas as pd
+import pyarrow.parquet as pq
+
+import schema
+import storage
+
+
+def _fact(months=4):
+    keys = [19970100 + m * 100 + d for m in range(months, 0, -1) for d in (1, 15)]
+    return pd.DataFrame({
+        'OrderID': range(len(keys)),
+        'OrderDateKey': keys,
+        'SalesAmount': schema.to_money(pd.Series([10.5] * len(keys))),
+    })
+
+
+def test_parquet_has_one_row_group_per_month_and_filters_read_only_them(tmp_path):
+    storage.write_table(_fact(), str(tmp_path), 'FactSales')
+    metadata = pq.ParquetFile(tmp_path / 'FactSales.parquet').metadata
+    assert metadata.num_row_groups == 4
+    # Row groups triés par mois : le filtre ne lit que les mois demandés
+    march = storage.read_table(str(tmp_path), 'FactSales', columns=['OrderDateKey'],
+                               filters=[('OrderDateKey', '>=', 19970301), ('OrderDateKey', '<=', 19970331)])
+    assert list(march.columns) == ['OrderDateKey']
+    assert sorted(march['OrderDateKey']) == [19970301, 19970315]
+
+
+def test_parquet_round_trip_keeps_types(tmp_path):
+    fact = _fact()
+    storage.write_table(fact, str(tmp_path), 'FactSales')
+    read = storage.read_table(str(tmp_path), 'FactSales')
+    assert schema.is_money(read['SalesAmount'])
+    pd.testing.assert_frame_equal(read.sort_values('OrderID').reset_index(drop=True), fact.sort_values('OrderID').reset_index(drop=True))
+
+
+def test_mixed_object_columns_are_written_as_text(tmp_path):
+    # Union SQL Server (entiers) + Access (texte) dans une même colonne
+    df = pd.DataFrame({'CustomerID': pd.Series([1, 'ALFKI', None], dtype=object)})
+    storage.write_table(df, str(tmp_path), 'Customers')
+    assert storage.read_table(str(tmp_path), 'Customers')['CustomerID'].tolist()[:2] == ['1', 'ALFKI']
+
+
+def test_csv_format_is_read_back_with_filters(tmp_path):
+    written = storage.write_table(_fact(), str(tmp_path), 'FactSales', fmt='csv')
+    assert written == [str(tmp_path / 'FactSales.csv')]
+    assert storage.table_exists(str(tmp_path), 'FactSales')
+    february = storage.read_table(str(tmp_path), 'FactSales', filters=[('OrderDateKey', '<', 19970300)])
+    assert sorted(february['OrderDateKey']) == [19970201, 19970215]
@@ -0,0 +1,41 @@
+# Registre des clés de substitution : stabilité entre runs et réutilisation
+import pandas as pd
+
+import surrogate_keys
+
+
+def test_same_natural_key_in_two_sources_gives_two_members(tmp_path):
+    registry = surrogate_keys.KeyRegistry('DimCustomers', str(tmp_path))
+    keys = registry.assign(['SQL', 'Access', 'SQL', 'SQL'], ['ALFKI', 'ALFKI', 'BONAP', 'ALFKI'])
+    assert keys.tolist() == [1, 2, 3, 1]
+
+
+def test_keys_are_stable_across_runs_and_reused(tmp_path):
+    registry = surrogate_keys.KeyRegistry('DimProducts', str(tmp_path))
+    first = registry.assign(['SQL', 'SQL', 'Access'], [11, 42, 11])
+    registry.save()
+
+    # Run suivant : ordre différent, clés relues en float (1.0 == 1) et un nouveau membre
+    reloaded = surrogate_keys.KeyRegistry('DimProducts', str(tmp_path))
+    second = reloaded.assign(['Access', 'SQL', 'SQL', 'SQL'], pd.Series([11.0, 42.0, 77.0, 11.0]))
+    assert second.tolist() == [first[2], first[1], 4, first[0]]
+    assert len(reloaded.table) == 4
+    # Un membre déjà enregistré ne reçoit jamais de nouvelle clé
+    assert reloaded.assign(['SQL'], ['42']).tolist() == [first[1]]
+
+
+def test_lookup_never_creates_keys_and_falls_back_to_sql(tmp_path):
+    registry = surrogate_keys.KeyRegistry('DimEmployees', str(tmp_path))
+    registry.assign(['SQL', 'Access'], [1, 2])
+    keys = registry.lookup(['Access', 'Access', 'SQL'], [1, 2, 9])
+    # Employé 1 inconnu côté Access : clé du membre SQL ; employé 9 inconnu partout : NULL
+    assert keys.tolist() == [1, 2, pd.NA]
+    assert len(registry.table) == 2
+
+
+def test_add_surrogate_key_drops_members_without_natural_key(tmp_path):
+    registry = surrogate_keys.KeyRegistry('DimShippers', str(tmp_path))
+    shippers = pd.DataFrame({'ShipperID': [1, None, 2], 'SourceSystem': ['SQL', 'SQL', 'SQL']})
+    result = surrogate_keys.add_surrogate_key(shippers, registry, 'ShipperID', 'ShipperKey')
+    assert list(result.columns) == ['ShipperKey', 'ShipperID', 'SourceSystem']
+    assert result['ShipperKey'].tolist() == [1, 2]
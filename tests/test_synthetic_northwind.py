@@ -0,0 +1,49 @@
+# Générateur de sources Northwind synthétiques : volumes, intégrité, recouvrement Access
+import sqlite3
+
+import pandas as pd
+
+import synthetic_northwind
+
+
+def test_volumes_scale_and_referential_integrity_holds():
+    tables = synthetic_northwind.generate_sql_source(scale=2, seed=1)
+    assert len(tables['Orders']) == 2 * synthetic_northwind.BASE_COUNTS['Orders']
+    assert len(tables['Customers']) == 2 * synthetic_northwind.BASE_COUNTS['Customers']
+    orders, details = tables['Orders'], tables['Order Details']
+    assert orders['OrderID'].is_unique
+    assert orders['CustomerID'].isin(tables['Customers']['CustomerID']).all()
+    assert orders['EmployeeID'].isin(tables['Employees']['EmployeeID']).all()
+    assert orders['ShipVia'].isin(tables['Shippers']['ShipperID']).all()
+    assert details['OrderID'].isin(orders['OrderID']).all()
+    assert details['ProductID'].isin(tables['Products']['ProductID']).all()
+    assert not details.duplicated(['OrderID', 'ProductID']).any()
+    assert tables['Products']['SupplierID'].isin(tables['Suppliers']['SupplierID']).all()
+
+
+def test_generation_is_deterministic_for_a_seed():
+    first = synthetic_northwind.generate_sql_source(scale=0.5, seed=7)
+    second = synthetic_northwind.generate_sql_source(scale=0.5, seed=7)
+    for name in first:
+        pd.testing.assert_frame_equal(first[name], second[name])
+
+
+def test_access_source_overlaps_sql_and_uses_access_names():
+    sql_tables = synthetic_northwind.generate_sql_source(scale=1, seed=3)
+    access = synthetic_northwind.generate_access_source(sql_tables, seed=3)
+    assert {'ID', 'Company'} <= set(access['Customers'].columns)
+    assert 'Order ID' in access['Orders'].columns
+    sql_order_ids = set(sql_tables['Orders']['OrderID'])
+    duplicated = access['Orders']['OrderID'].isin(sql_order_ids)
+    # Commandes en double (recouvrement) et commandes propres à Access, aux identifiants nouveaux
+    assert duplicated.sum() == round(len(sql_order_ids) * synthetic_northwind.ACCESS_OVERLAP)
+    assert (~duplicated).sum() == round(len(sql_order_ids) * synthetic_northwind.ACCESS_NEW_ORDERS)
+    assert access['Order Details']['OrderID'].isin(access['Orders']['OrderID']).all()
+
+
+def test_generate_writes_both_sqlite_sources(tmp_path):
+    sql_path, access_path, volumes = synthetic_northwind.generate(0.2, str(tmp_path))
+    with sqlite3.connect(sql_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM "Order Details"').fetchone()[0] == volumes['SQL.Order Details']
+    with sqlite3.connect(access_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM Orders').fetchone()[0] == volumes['Access.Orders']